@@ -0,0 +1,137 @@
+import argparse
+import json
+import os
+import statistics
+import time
+from typing import Dict, List, Optional
+
+from rich.table import Table
+from sqlalchemy import text
+
+import src.console as console
+import src.namespace as namespace
+from src.vector_db import (
+    ann_index_type,
+    get_collection_name,
+    embedding_dimension,
+    ensure_ann_index,
+    get_embeddings,
+    get_engine,
+    vector_backend,
+)
+
+
+def _load_queries(filepath: str, limit: int) -> List[str]:
+    """벤치마크와 동일한 형식의 사건 파일 텍스트를 쿼리로 사용합니다."""
+    with open(filepath, "r", encoding="utf-8") as f:
+        cases = [json.loads(line) for line in f]
+    return [
+        f"원고 주장: {case['plaintiff_statement']}\n피고 주장: {case['defendant_statement']}"
+        for case in cases[:limit]
+    ]
+
+
+def _search_ids(conn, collection_id: str, vector: List[float], k: int, setting: Optional[str]) -> List[str]:
+    literal = "[" + ",".join(f"{value:.7f}" for value in vector) + "]"
+    with conn.begin():
+        if setting:
+            conn.execute(text(setting))
+        rows = conn.execute(
+            text(
+                f"SELECT id FROM langchain_pg_embedding WHERE collection_id = '{collection_id}' "
+                f"ORDER BY embedding <=> CAST(:q AS vector({embedding_dimension})) LIMIT :k"
+            ),
+            {"q": literal, "k": k},
+        ).fetchall()
+    return [row[0] for row in rows]
+
+
+def run_check(filepath: str, k: int, limit: int, values: List[int]):
+    """정확 검색(인덱스 비활성화) 대비 ANN 검색의 recall@k와 지연 시간을 비교합니다."""
+    console.print_header(f"ANN 인덱스 검증 ({ann_index_type}, k={k})")
+    if get_engine() is None:
+        console.console.print(
+            f"[bold red]오류: ANN 인덱스 검증은 VECTOR_BACKEND=pgvector 에서만 사용할 수 있습니다 "
+            f"(현재: {vector_backend}).[/bold red]"
+        )
+        return
+
+    queries = _load_queries(filepath, limit)
+    vectors = get_embeddings().embed_documents(queries)
+
+    with get_engine().connect() as conn:
+        collection_id = conn.execute(
+            text("SELECT uuid FROM langchain_pg_collection WHERE name = :name"),
+            {"name": get_collection_name()},
+        ).scalar()
+        if collection_id is None:
+            console.console.print(f"[bold red]오류: '{get_collection_name()}' 컬렉션이 없습니다.[/bold red]")
+            return
+        total_rows = conn.execute(
+            text("SELECT count(*) FROM langchain_pg_embedding WHERE collection_id = :cid"),
+            {"cid": collection_id},
+        ).scalar()
+        conn.commit()
+        console.console.print(f"컬렉션 문서 수: {total_rows}, 쿼리 수: {len(vectors)}")
+
+        settings: Dict[str, str] = {"exact": "SET LOCAL enable_indexscan = off"}
+        parameter = "hnsw.ef_search" if ann_index_type == "hnsw" else "ivfflat.probes"
+        for value in values:
+            settings[f"{parameter}={value}"] = f"SET LOCAL {parameter} = {int(value)}"
+
+        results: Dict[str, List[List[str]]] = {}
+        latencies: Dict[str, List[float]] = {}
+        for label, setting in settings.items():
+            results[label] = []
+            latencies[label] = []
+            for vector in vectors:
+                start = time.perf_counter()
+                ids = _search_ids(conn, collection_id, vector, k, setting)
+                latencies[label].append((time.perf_counter() - start) * 1000)
+                results[label].append(ids)
+
+    table = Table(title="Recall vs Latency")
+    table.add_column("설정", style="cyan")
+    table.add_column(f"Recall@{k}", justify="center")
+    table.add_column("평균 (ms)", justify="center")
+    table.add_column("p95 (ms)", justify="center")
+
+    exact = results["exact"]
+    for label in settings:
+        recalls = [
+            len(set(found) & set(truth)) / len(truth)
+            for found, truth in zip(results[label], exact)
+            if truth
+        ]
+        recall = statistics.mean(recalls) if recalls else 0.0
+        ordered = sorted(latencies[label])
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] if ordered else 0.0
+        mean = statistics.mean(ordered) if ordered else 0.0
+        table.add_row(label, f"{recall:.4f}", f"{mean:.2f}", f"{p95:.2f}")
+
+    console.console.print(table)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="pgvector ANN 인덱스 마이그레이션 및 검증 도구")
+    namespace.add_experiment_argument(parser)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    migrate_parser = subparsers.add_parser("migrate", help="임베딩 차원 고정 및 컬렉션별 ANN 인덱스 생성")
+    migrate_parser.add_argument("--index-type", choices=["hnsw", "ivfflat"], default=None)
+
+    check_parser = subparsers.add_parser("check", help="정확 검색 대비 recall/지연 시간 측정")
+    check_parser.add_argument("--k", type=int, default=2)
+    check_parser.add_argument("--limit", type=int, default=100, help="사용할 쿼리 수")
+    check_parser.add_argument(
+        "--values", type=int, nargs="+", default=[10, 20, 40, 80, 160],
+        help="비교할 hnsw.ef_search (또는 ivfflat.probes) 값 목록",
+    )
+    args = parser.parse_args()
+    namespace.set_experiment(args.experiment)
+
+    if args.command == "migrate":
+        ensure_ann_index(args.index_type)
+    else:
+        current_dir = os.path.dirname(os.path.abspath(__file__))
+        run_check(os.path.join(current_dir, "data", "test.jsonl"), args.k, args.limit, args.values)
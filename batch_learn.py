@@ -1,21 +1,24 @@
+import argparse
 import json
-import time
 import os
-from src.agents import (
-    redis_client,
-    batch_judge_chain,
-    evaluation_chain,
-    reflection_chain
-)
-from src.vector_db import add_case_to_db
+import src.agents as agents
+import src.namespace as namespace
+import src.profiling as profiling
+from src.lesson_store import record_lesson
+from src.outcome_classifier import outcome_stats
+from src.runtime import warmup
+from src.vector_db import CaseRecord, add_cases_to_db, archive_batch_size
+from src.verdict_analysis import analyze_verdict, opposite_outcome
 import src.console as console
 from rich.rule import Rule
 
-def run_batch_learning(filepath: str):
+def run_batch_learning(filepath: str, batch_size: int = archive_batch_size):
     """
     .jsonl 파일로부터 여러 사건 데이터를 읽어와 일괄 학습을 수행합니다.
+    사건 아카이브는 batch_size 건씩 모아 한 번에 임베딩/저장합니다.
     """
     console.print_header("데이터셋 일괄 학습 시작")
+    profiling.run_stage("warmup", warmup)
 
     try:
         with open(filepath, 'r', encoding='utf-8') as f:
@@ -29,6 +32,9 @@ def run_batch_learning(filepath: str):
     
     console.console.print(f"총 {len(cases)}개의 사건을 학습합니다.\n")
 
+    redis_client = agents.get_redis_client()
+    pending_records = []
+
     for i, case in enumerate(cases):
         case_id = case.get("caseId", "N/A")
         plaintiff_statement = case.get("plaintiff_statement", "")
@@ -38,59 +44,61 @@ def run_batch_learning(filepath: str):
 
         # 1. 모의 판결 생성
         console.console.print("1. 재판장 에이전트가 모의 판결 생성 중...")
-        verdict_response = batch_judge_chain.invoke({
+        verdict_response = profiling.run_stage("batch_judge", agents.get_chain("batch_judge_chain").invoke, {
             "plaintiff_statement": plaintiff_statement,
             "defendant_statement": defendant_statement
         })
         final_verdict = verdict_response.content.strip()
         console.print_final_verdict(final_verdict)
 
-        # 2. 승패 분석
-        console.console.print("2. 평가 에이전트가 승패 분석 중...")
-        evaluation_response = evaluation_chain.invoke({"final_verdict": final_verdict})
-        plaintiff_outcome = evaluation_response.content.strip()
-        defendant_outcome = "승리" if plaintiff_outcome == "패배" else ("패배" if plaintiff_outcome == "승리" else "무승부")
-        
+        # 2. 승패 분석 및 양측 교훈 도출 (한 번의 구조화 호출, 실패 시 평가/회고 에이전트 개별 호출)
+        console.console.print("2. 승패 분석 및 교훈 도출 중...")
+        analysis = profiling.run_stage("post_verdict_analysis", analyze_verdict, final_verdict, plaintiff_statement, defendant_statement)
+        plaintiff_outcome = analysis.plaintiff_outcome
+
         outcomes = {
-            "원고측 변호사": {"outcome": plaintiff_outcome, "db_key_prefix": "plaintiff_lawyer", "speech": plaintiff_statement},
-            "피고측 변호사": {"outcome": defendant_outcome, "db_key_prefix": "defendant_lawyer", "speech": defendant_statement}
+            "원고측 변호사": {"outcome": plaintiff_outcome, "db_key_prefix": "plaintiff_lawyer", "lesson": analysis.plaintiff_lesson},
+            "피고측 변호사": {"outcome": opposite_outcome(plaintiff_outcome), "db_key_prefix": "defendant_lawyer", "lesson": analysis.defendant_lesson}
         }
-        
+
         lessons = {}
-        
-        # 3. 양측 교훈 도출
-        console.console.print("3. 회고 에이전트가 교훈 도출 중...")
         for lawyer_name, info in outcomes.items():
-            reflection_response = reflection_chain.invoke({
-                "outcome": info['outcome'],
-                "my_speeches": info['speech']
-            })
-            lesson = reflection_response.content.strip()
-            lessons[info['db_key_prefix']] = lesson
-            console.print_lesson(lawyer_name, info['outcome'], lesson)
-            
-            # 4. 개인 DB (Redis) 업데이트
-            if info['outcome'] == "승리":
-                redis_client.rpush(f"{info['db_key_prefix']}:successful_strategies", lesson)
-            elif info['outcome'] == "패배":
-                redis_client.rpush(f"{info['db_key_prefix']}:failed_strategies", lesson)
+            lessons[info['db_key_prefix']] = info['lesson']
+            console.print_lesson(lawyer_name, info['outcome'], info['lesson'])
 
-        # 5. 사건 아카이브 (PostgreSQL) 업데이트
+            # 3. 개인 DB (Redis) 업데이트
+            profiling.run_stage("record_lesson", record_lesson, redis_client, info['db_key_prefix'], info['outcome'], info['lesson'])
+
+        # 4. 사건 아카이브 (PostgreSQL) 업데이트 - batch_size 건씩 모아서 저장
         case_summary = f"원고 주장: {plaintiff_statement[:100]}...\n피고 주장: {defendant_statement[:100]}..."
-        add_case_to_db(
+        pending_records.append(CaseRecord(
             case_summary=case_summary,
             verdict=final_verdict,
             plaintiff_lesson=lessons.get("plaintiff_lawyer", ""),
-            defendant_lesson=lessons.get("defendant_lawyer", "")
-        )
-        
-        # API 속도 제한 방지를 위해 잠시 대기
-        time.sleep(1) 
+            defendant_lesson=lessons.get("defendant_lawyer", ""),
+            case_id=case.get("caseId"),
+            plaintiff_outcome=plaintiff_outcome,
+        ))
+        if len(pending_records) >= batch_size:
+            profiling.run_stage("archive", add_cases_to_db, pending_records, batch_size=batch_size)
+            pending_records = []
+
+    if pending_records:
+        profiling.run_stage("archive", add_cases_to_db, pending_records, batch_size=batch_size)
 
     console.print_header("데이터셋 일괄 학습 완료")
+    console.print_rate_limit_stats(agents.llm_rate_limit_stats())
+    console.print_outcome_stats(outcome_stats())
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="데이터셋 일괄 학습")
+    namespace.add_experiment_argument(parser)
+    profiling.add_profile_argument(parser)
+    args = parser.parse_args()
+    namespace.set_experiment(args.experiment)
+
     # 현재 스크립트 파일의 위치를 기준으로 데이터 파일 경로 설정
     current_dir = os.path.dirname(os.path.abspath(__file__))
     dataset_path = os.path.join(current_dir, "data", "train.jsonl")
-    run_batch_learning(dataset_path)
\ No newline at end of file
+    with profiling.profile_run(args.profile, "batch_learn", args.profile_top):
+        run_batch_learning(dataset_path)
\ No newline at end of file
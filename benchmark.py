@@ -1,19 +1,34 @@
 import argparse
+import asyncio
 import csv
 import json
 import os
-import time
 from collections import defaultdict
 from datetime import datetime
-from typing import Dict, List, Tuple
+from typing import Callable, Dict, List, Optional, Tuple
 
 from rich.rule import Rule
 from rich.table import Table
 
+import src.checkpoints as checkpoints
 import src.console as console
-from src.agents import CRITIQUE_CRITERIA, redis_client
-from src.graph import app
-from src.vector_db import ensure_collection, vector_store
+import src.namespace as namespace
+import src.profiling as profiling
+from src.agents import CRITIQUE_CRITERIA, get_redis_client, llm_cache_stats, llm_rate_limit_stats
+import src.metrics as metrics
+from src.graph import compile_graph, workflow
+from src.outcome_classifier import outcome_stats
+from src.runtime import warmup
+from src.trial_context import trial_context_cache
+from src.vector_db import (
+    embedding_cache_stats,
+    get_collection_name,
+    lexical_index_stats,
+    pool_status,
+    reset_collection,
+    retrieval_mode,
+    vector_backend,
+)
 
 CRITERIA_HEADERS: Dict[str, Tuple[str, str]] = {
     "논리적 일관성": ("logical_consistency_score", "logical_consistency_reason"),
@@ -22,19 +37,187 @@ CRITERIA_HEADERS: Dict[str, Tuple[str, str]] = {
 }
 
 
-def run_benchmark(test_filepath: str, is_trained: bool):
-    """주어진 테스트 데이터셋으로 벤치마크를 수행하고, 결과를 CSV로 저장합니다."""
+CSV_HEADER = [
+    "case_id",
+    "expected_outcome",
+    "model_outcome",
+    "is_correct",
+    "logical_consistency_score",
+    "logical_consistency_reason",
+    "legal_validity_score",
+    "legal_validity_reason",
+    "social_consideration_score",
+    "social_consideration_reason",
+]
+
+# 재판별 계측값(src.metrics): 재판 합계 + 노드별 실행 시간
+NODE_NAMES: Tuple[str, ...] = tuple(workflow.nodes)
+METRIC_HEADER = list(metrics.METRIC_FIELDS) + [f"{node}_wall_ms" for node in NODE_NAMES]
+
+
+def _initial_state(case: dict) -> dict:
+    return {
+        "case_file": f"원고 주장: {case['plaintiff_statement']}\n피고 주장: {case['defendant_statement']}",
+        "case_id": case.get("caseId"),
+        "plaintiff_lawyer": "원고측 변호사",
+        "defendant_lawyer": "피고측 변호사",
+    }
+
+
+def _resume_note(case_id: Optional[str], snapshot) -> None:
+    if snapshot.values and snapshot.next:
+        console.console.print(f"[bold green]체크포인트에서 재판을 이어갑니다[/bold green] (ID: {case_id}, 다음 노드: {', '.join(snapshot.next)})")
+    elif snapshot.values:
+        console.console.print(f"[bold green]체크포인트에 완료된 재판이 있어 다시 실행하지 않습니다[/bold green] (ID: {case_id})")
+
+
+def run_trial(graph, initial_state: dict, config: Optional[dict] = None) -> Tuple[dict, metrics.TrialMetrics]:
+    """
+    재판 한 건을 실행하고 최종 상태와 노드별 계측값을 반환합니다.
+    config(체크포인트 thread)가 있으면 마지막으로 완료된 노드 다음부터 이어서 실행하고,
+    이미 끝난 재판은 저장된 최종 상태를 그대로 반환합니다 (계측값은 이번에 실행한 노드만 포함).
+    """
+    final_state: dict = {}
+    case_id = initial_state.get("case_id")
+    with metrics.track_trial(case_id) as trial_metrics:
+        graph_input: Optional[dict] = initial_state
+        if config is not None:
+            snapshot = graph.get_state(config)
+            _resume_note(case_id, snapshot)
+            if checkpoints.is_finished(snapshot):
+                return snapshot.values, trial_metrics
+            graph_input = checkpoints.trial_input(snapshot, initial_state)
+        # stream_mode="values"는 매 단계의 전체 상태를 내보내므로 마지막 값이 최종 상태입니다.
+        for state in graph.stream(graph_input, config, stream_mode="values"):
+            final_state = state
+    return final_state, trial_metrics
+
+
+async def arun_trial(graph, initial_state: dict, config: Optional[dict] = None) -> Tuple[dict, metrics.TrialMetrics]:
+    """run_trial의 비동기 버전입니다 (graph.astream 사용)."""
+    final_state: dict = {}
+    case_id = initial_state.get("case_id")
+    with metrics.track_trial(case_id) as trial_metrics:
+        graph_input: Optional[dict] = initial_state
+        if config is not None:
+            snapshot = await graph.aget_state(config)
+            _resume_note(case_id, snapshot)
+            if checkpoints.is_finished(snapshot):
+                return snapshot.values, trial_metrics
+            graph_input = checkpoints.trial_input(snapshot, initial_state)
+        async for state in graph.astream(graph_input, config, stream_mode="values"):
+            final_state = state
+    return final_state, trial_metrics
+
+
+async def _run_trials_concurrently(test_cases: List[dict], concurrency: int, scope: str,
+                                   on_result: Callable[[dict, dict, metrics.TrialMetrics], None]) -> None:
+    """
+    최대 concurrency개의 재판을 동시에 실행합니다.
+    먼저 끝난 재판도 앞선 사건이 모두 끝날 때까지 기다렸다가 입력 순서대로 on_result에 전달합니다.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    finished: Dict[int, Tuple[dict, metrics.TrialMetrics]] = {}
+    next_index = 0
+
+    # 비동기 체크포인터는 이벤트 루프 안에서 열어야 합니다.
+    async with checkpoints.aopen_checkpointer() as checkpointer:
+        graph = compile_graph(checkpointer)
+
+        async def run_one(i: int, case: dict) -> None:
+            nonlocal next_index
+            async with semaphore:
+                console.console.print(Rule(f"[bold]테스트 케이스 {i + 1}/{len(test_cases)} 실행 (ID: {case.get('caseId', 'N/A')})[/bold]"))
+                config = checkpoints.trial_config(case.get("caseId"), scope)
+                finished[i] = await arun_trial(graph, _initial_state(case), config)
+            while next_index in finished:
+                on_result(test_cases[next_index], *finished.pop(next_index))
+                next_index += 1
+
+        await asyncio.gather(*(run_one(i, case) for i, case in enumerate(test_cases)))
+
+
+def _build_row(case: dict, final_state: dict) -> Tuple[Dict[str, object], Dict[str, int]]:
+    """최종 상태로 CSV 행과 기준별 점수를 만듭니다."""
+    critique_scores = final_state.get("critique_scores", []) or []
+    model_outcome = final_state.get("plaintiff_outcome")
+    expected_outcome = case.get("expected_outcome")
+
+    row_data: Dict[str, object] = {
+        "case_id": case.get("caseId", "N/A"),
+        "expected_outcome": expected_outcome or "N/A",
+        "model_outcome": (model_outcome or ("미예측" if expected_outcome else "N/A")),
+        "is_correct": "N/A",
+    }
+
+    for criteria, (score_key, reason_key) in CRITERIA_HEADERS.items():
+        row_data[score_key] = 0
+        row_data[reason_key] = "평가 결과가 기록되지 않았습니다."
+
+    scores: Dict[str, int] = {}
+    for item in critique_scores:
+        criteria = item.get("criteria")
+        if criteria not in CRITERIA_HEADERS:
+            continue
+        score_key, reason_key = CRITERIA_HEADERS[criteria]
+        score = int(item.get("score", 0))
+        reason = item.get("reason") or "평가 이유가 제공되지 않았습니다."
+        row_data[score_key] = score
+        row_data[reason_key] = reason
+        scores[criteria] = score
+
+    if expected_outcome:
+        if model_outcome:
+            row_data["is_correct"] = "Y" if expected_outcome == model_outcome else "N"
+        else:
+            row_data["is_correct"] = "N"
+    elif model_outcome:
+        row_data["is_correct"] = "정보 부족"
+    return row_data, scores
+
+
+def _metric_columns(trial_metrics: metrics.TrialMetrics) -> Dict[str, object]:
+    """재판 합계와 노드별 실행 시간을 CSV 열로 만듭니다."""
+    record = trial_metrics.to_record()
+    columns: Dict[str, object] = dict(record["total"])
+    for node in NODE_NAMES:
+        columns[f"{node}_wall_ms"] = record["nodes"].get(node, {}).get("wall_ms", 0)
+    return columns
+
+
+def run_benchmark(test_filepath: str, is_trained: bool, concurrency: int = 1, fresh: bool = False):
+    """
+    주어진 테스트 데이터셋으로 벤치마크를 수행하고, 결과를 CSV로 저장합니다.
+    concurrency가 2 이상이면 그 수만큼 재판을 동시에 실행합니다 (CSV는 입력 순서 유지).
+    TRIAL_CHECKPOINT=true이면 중단된 벤치마크를 이어서 실행합니다. fresh이면 이 모드의 체크포인트를 지우고 처음부터 실행합니다.
+    """
     mode = "학습 후 (Trained)" if is_trained else "학습 전 (Untrained)"
+    scope = f"benchmark-{'trained' if is_trained else 'untrained'}"
     console.print_header(f"벤치마크 테스트 시작: {mode}")
+    profiling.run_stage("warmup", warmup)
+
+    if checkpoints.trial_checkpoint_enabled and fresh:
+        cleared = checkpoints.clear_checkpoints(scope)
+        console.console.print(f"🔴 재판 체크포인트 {cleared}건을 삭제했습니다.")
+    resuming = checkpoints.has_checkpoints(scope)
 
-    if not is_trained:
-        console.console.print("[bold yellow]경고: 모든 DB(Redis, PostgreSQL)의 데이터를 초기화합니다.[/bold yellow]")
-        redis_client.flushall()
-        console.console.print("🔴 Redis DB가 초기화되었습니다.")
+    if not is_trained and resuming:
+        # 이어서 실행할 때 DB를 지우면 앞서 끝난 재판이 남긴 교훈/아카이브가 사라지므로 초기화하지 않습니다.
+        console.console.print(
+            "[bold yellow]이전 실행의 재판 체크포인트가 있어 DB를 초기화하지 않고 이어서 실행합니다. "
+            "처음부터 다시 하려면 --fresh를 지정하세요.[/bold yellow]"
+        )
+    elif not is_trained:
+        label = namespace.experiment_id() or "기본"
+        console.console.print(
+            f"[bold yellow]경고: '{label}' 네임스페이스의 DB(Redis, PostgreSQL) 데이터를 초기화합니다.[/bold yellow]"
+        )
+        # 공유 Redis 전체를 지우지 않고 현재 실험의 키만 SCAN/UNLINK로 삭제합니다.
+        deleted = namespace.delete_redis_namespace(get_redis_client())
+        console.console.print(f"🔴 Redis 키 {deleted}개가 삭제되었습니다.")
         try:
-            vector_store.delete_collection()
-            ensure_collection()
-            console.console.print("🔴 PostgreSQL 벡터 DB가 초기화되었습니다.")
+            reset_collection()
+            console.console.print(f"🔴 PostgreSQL 벡터 DB('{get_collection_name()}')가 초기화되었습니다.")
         except Exception as e:
             console.console.print(f"🟡 PostgreSQL 벡터 DB 초기화 중 참고: {e}")
     else:
@@ -49,96 +232,51 @@ def run_benchmark(test_filepath: str, is_trained: bool):
 
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     results_filename = f"benchmark_results_{mode.replace(' ', '_')}_{timestamp}.csv"
+    metrics_filename = f"benchmark_metrics_{mode.replace(' ', '_')}_{timestamp}.jsonl"
+    trace_writer = metrics.MetricsTraceWriter(metrics_filename)
+    trial_metrics_list: List[metrics.TrialMetrics] = []
+
+    total_scores = defaultdict(float)
+    total_runs = 0
+    paired_outcomes: List[Tuple[str, str]] = []
 
     with open(results_filename, "w", newline="", encoding="utf-8-sig") as f:
         writer = csv.writer(f)
-        header = [
-            "case_id",
-            "expected_outcome",
-            "model_outcome",
-            "is_correct",
-            "logical_consistency_score",
-            "logical_consistency_reason",
-            "legal_validity_score",
-            "legal_validity_reason",
-            "social_consideration_score",
-            "social_consideration_reason",
-        ]
-        writer.writerow(header)
-
-        total_scores = defaultdict(float)
-        total_runs = 0
-        paired_outcomes: List[Tuple[str, str]] = []
-
-        for i, case in enumerate(test_cases):
-            case_id = case.get("caseId", "N/A")
-            console.console.print(Rule(f"[bold]테스트 케이스 {i + 1}/{len(test_cases)} 실행 (ID: {case_id})[/bold]"))
-
-            initial_state = {
-                "case_file": f"원고 주장: {case['plaintiff_statement']}\n피고 주장: {case['defendant_statement']}",
-                "plaintiff_lawyer": "원고측 변호사",
-                "defendant_lawyer": "피고측 변호사",
-            }
-
-            final_event = None
-            for event in app.stream(initial_state):
-                if "__end__" in event:
-                    final_event = event["__end__"]
-
-            # LangGraph의 최종 이벤트는 {"state": {...}} 혹은 {"return": {...}} 형태로
-            # 래핑되어 전달될 수 있으므로, 실제 상태 딕셔너리를 안전하게 추출합니다.
-            final_state_data = final_event or {}
-            if isinstance(final_state_data, dict):
-                if "state" in final_state_data and isinstance(final_state_data["state"], dict):
-                    final_state = final_state_data["state"]
-                elif "return" in final_state_data and isinstance(final_state_data["return"], dict):
-                    final_state = final_state_data["return"]
-                else:
-                    final_state = final_state_data
-            else:
-                final_state = {}
-            critique_scores = final_state.get("critique_scores", []) or []
-            model_outcome = final_state.get("plaintiff_outcome")
-            expected_outcome = case.get("expected_outcome")
+        writer.writerow(CSV_HEADER + METRIC_HEADER)
 
-            row_data: Dict[str, object] = {
-                "case_id": case_id,
-                "expected_outcome": expected_outcome or "N/A",
-                "model_outcome": (model_outcome or ("미예측" if expected_outcome else "N/A")),
-                "is_correct": "N/A",
-            }
-
-            for criteria, (score_key, reason_key) in CRITERIA_HEADERS.items():
-                row_data[score_key] = 0
-                row_data[reason_key] = "평가 결과가 기록되지 않았습니다."
-
-            for item in critique_scores:
-                criteria = item.get("criteria")
-                if criteria not in CRITERIA_HEADERS:
-                    continue
-                score_key, reason_key = CRITERIA_HEADERS[criteria]
-                score = int(item.get("score", 0))
-                reason = item.get("reason") or "평가 이유가 제공되지 않았습니다."
-                row_data[score_key] = score
-                row_data[reason_key] = reason
+        def record(case: dict, final_state: dict, trial_metrics: metrics.TrialMetrics) -> None:
+            """재판 결과 한 건을 CSV 행으로 쓰고 집계에 반영합니다 (입력 순서대로 호출됩니다)."""
+            nonlocal total_runs
+            row_data, scores = _build_row(case, final_state)
+            for criteria, score in scores.items():
                 total_scores[criteria] += score
 
+            expected_outcome = case.get("expected_outcome")
             if expected_outcome:
-                predicted_label = model_outcome or "미예측"
-                paired_outcomes.append((expected_outcome, predicted_label))
-                if model_outcome:
-                    row_data["is_correct"] = "Y" if expected_outcome == model_outcome else "N"
-                else:
-                    row_data["is_correct"] = "N"
-            elif model_outcome:
-                row_data["is_correct"] = "정보 부족"
-
-            writer.writerow([row_data.get(h, "N/A") for h in header])
+                paired_outcomes.append((expected_outcome, final_state.get("plaintiff_outcome") or "미예측"))
+
+            row_data.update(_metric_columns(trial_metrics))
+            writer.writerow([row_data.get(h, "N/A") for h in CSV_HEADER + METRIC_HEADER])
+            f.flush()
+            trace_writer.write(trial_metrics)
+            trial_metrics_list.append(trial_metrics)
             total_runs += 1
-            time.sleep(1)
+
+        if concurrency > 1:
+            asyncio.run(_run_trials_concurrently(test_cases, concurrency, scope, record))
+        else:
+            with checkpoints.open_checkpointer() as checkpointer:
+                graph = compile_graph(checkpointer)
+                for i, case in enumerate(test_cases):
+                    console.console.print(Rule(f"[bold]테스트 케이스 {i + 1}/{len(test_cases)} 실행 (ID: {case.get('caseId', 'N/A')})[/bold]"))
+                    # API 속도 제한은 공유 속도 제한기(LLM_REQUESTS_PER_MINUTE 등)와 재시도가 처리합니다.
+                    config = checkpoints.trial_config(case.get("caseId"), scope)
+                    record(case, *run_trial(graph, _initial_state(case), config))
+    trace_writer.close()
 
     console.print_header(f"벤치마크 테스트 완료: {mode}")
     console.console.print(f"결과가 [bold cyan]{results_filename}[/bold cyan] 파일에 저장되었습니다.")
+    console.console.print(f"노드별 계측 트레이스: [bold cyan]{metrics_filename}[/bold cyan]")
 
     table = Table(title="평균 점수 (Pass 비율)")
     table.add_column("평가 항목", justify="right", style="cyan", no_wrap=True)
@@ -196,17 +334,60 @@ def run_benchmark(test_filepath: str, is_trained: bool):
             label_table.add_row(label, f"{precision:.2f}", f"{recall:.2f}", f"{f1:.2f}")
         console.console.print(label_table)
 
+    cache_stats = embedding_cache_stats()
+    console.console.print(
+        f"임베딩 캐시: 메모리 적중 {cache_stats['memory_hits']}회, "
+        f"디스크 적중 {cache_stats['disk_hits']}회, 미스 {cache_stats['misses']}회"
+    )
+    if retrieval_mode == "hybrid":
+        lexical_stats = lexical_index_stats()
+        console.console.print(
+            f"하이브리드 검색: 질의 {lexical_stats['queries']}회, 질의 n-gram {lexical_stats['query_grams']}개 중 "
+            f"흔한 n-gram 제외 {lexical_stats['common_grams']}개(LEXICAL_MAX_DF_RATIO), "
+            f"상한 초과 {lexical_stats['truncated_grams']}개, 후보 없음 {lexical_stats['empty_queries']}회"
+        )
+    llm_stats = llm_cache_stats()
+    if llm_stats is not None:
+        console.console.print(
+            f"LLM 응답 캐시: 적중 {llm_stats['hits']}회, 미스 {llm_stats['misses']}회, "
+            f"저장 {llm_stats['entries']}건 ({llm_stats['bytes'] / 1024 / 1024:.1f}MB)"
+        )
+    console.print_rate_limit_stats(llm_rate_limit_stats())
+    console.print_outcome_stats(outcome_stats())
+    console.print_node_metrics(metrics.summarize_nodes(trial_metrics_list), len(trial_metrics_list))
+    context_stats = trial_context_cache.stats()
+    console.console.print(
+        f"재판 컨텍스트 캐시: 적중 {context_stats['hits']}회, 조회 {context_stats['misses']}회"
+    )
+
+    if vector_backend == "pgvector":
+        for name, stats in pool_status().items():
+            if not stats["checkouts"]:
+                continue
+            console.console.print(
+                f"PostgreSQL 커넥션 풀({name}): checkout {stats['checkouts']}회, "
+                f"평균 대기 {stats['avg_wait_ms']:.2f}ms, 최대 대기 {stats['max_wait_ms']:.2f}ms"
+            )
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="모의 법정 시스템 벤치마크 테스트")
     parser.add_argument("--mode", type=str, required=True, choices=["trained", "untrained"],
                         help="'trained' 또는 'untrained' 모드를 선택하세요.")
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="동시에 실행할 재판 수 (기본값 1: 순차 실행)")
+    parser.add_argument("--fresh", action="store_true",
+                        help="TRIAL_CHECKPOINT=true일 때 이 모드의 재판 체크포인트를 지우고 처음부터 실행")
+    namespace.add_experiment_argument(parser)
+    profiling.add_profile_argument(parser)
     args = parser.parse_args()
+    namespace.set_experiment(args.experiment)
 
     current_dir = os.path.dirname(os.path.abspath(__file__))
     test_dataset_path = os.path.join(current_dir, "data", "test.jsonl")
 
-    if args.mode == "untrained":
-        run_benchmark(test_dataset_path, is_trained=False)
-    else:
-        run_benchmark(test_dataset_path, is_trained=True)
+    with profiling.profile_run(args.profile, "benchmark", args.profile_top):
+        if args.mode == "untrained":
+            run_benchmark(test_dataset_path, is_trained=False, concurrency=args.concurrency, fresh=args.fresh)
+        else:
+            run_benchmark(test_dataset_path, is_trained=True, concurrency=args.concurrency, fresh=args.fresh)
@@ -0,0 +1,111 @@
+import argparse
+import json
+import os
+import time
+from typing import List, Tuple
+
+import numpy as np
+from rich.table import Table
+
+import src.console as console
+from src.embedding_backends import SentenceTransformerEmbeddings
+from src.vector_db import model_name
+
+# 이름: (backend, quantize)
+VARIANTS = {
+    "torch-fp32": ("torch", "none"),
+    "torch-int8": ("torch", "int8"),
+    "onnx": ("onnx", "none"),
+}
+
+
+def _load_texts(filepath: str, limit: int) -> List[str]:
+    """batch_learn.py / benchmark.py와 같은 형식의 사건 텍스트를 만듭니다."""
+    with open(filepath, "r", encoding="utf-8") as f:
+        cases = [json.loads(line) for line in f][:limit]
+    return [
+        f"원고 주장: {case['plaintiff_statement']}\n피고 주장: {case['defendant_statement']}"
+        for case in cases
+    ]
+
+
+def _measure(backend: SentenceTransformerEmbeddings, texts: List[str]) -> Tuple[np.ndarray, float]:
+    backend.embed_documents(texts[:2])  # 첫 호출의 초기화 비용은 제외합니다.
+    start = time.perf_counter()
+    vectors = np.asarray(backend.embed_documents(texts), dtype=np.float32)
+    elapsed = time.perf_counter() - start
+    return vectors, len(texts) / elapsed if elapsed > 0 else float("inf")
+
+
+def run_embedding_bench(filepath: str, variants: List[str], batch_sizes: List[int], threads: List[int],
+                        limit: int, max_seq_length: int = None, onnx_file: str = None):
+    """각 임베딩 설정의 처리량(docs/sec)과 fp32 기준 대비 코사인 일치도를 출력합니다."""
+    console.print_header("임베딩 백엔드 벤치마크")
+    texts = _load_texts(filepath, limit)
+    console.console.print(f"모델: {model_name}, 문서 수: {len(texts)}")
+
+    import torch
+
+    default_threads = torch.get_num_threads()
+    baseline_backend = SentenceTransformerEmbeddings(model_name, batch_size=32)
+    baseline, baseline_rate = _measure(baseline_backend, texts)
+    del baseline_backend
+
+    table = Table(title="임베딩 처리량 및 fp32 기준 일치도")
+    table.add_column("설정", style="cyan")
+    table.add_column("배치", justify="right")
+    table.add_column("스레드", justify="right")
+    table.add_column("docs/sec", justify="right")
+    table.add_column("평균 코사인", justify="right")
+    table.add_column("최소 코사인", justify="right")
+    table.add_row("torch-fp32 (기준)", "32", "기본", f"{baseline_rate:.1f}", "1.0000", "1.0000")
+
+    for variant in variants:
+        backend_name, quantize = VARIANTS[variant]
+        for num_threads in threads:
+            for batch_size in batch_sizes:
+                backend = SentenceTransformerEmbeddings(
+                    model_name,
+                    backend=backend_name,
+                    quantize=quantize,
+                    batch_size=batch_size,
+                    num_threads=num_threads or default_threads,
+                    max_seq_length=max_seq_length,
+                    onnx_file=onnx_file if backend_name == "onnx" else None,
+                )
+                vectors, rate = _measure(backend, texts)
+                # 두 쪽 모두 정규화된 벡터이므로 행별 내적이 곧 코사인 유사도입니다.
+                agreement = np.sum(vectors * baseline, axis=1)
+                table.add_row(
+                    variant,
+                    str(batch_size),
+                    str(num_threads or "기본"),
+                    f"{rate:.1f}",
+                    f"{agreement.mean():.4f}",
+                    f"{agreement.min():.4f}",
+                )
+                del backend
+
+    console.console.print(table)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="임베딩 백엔드 처리량/정확도 비교")
+    parser.add_argument("--variants", nargs="+", choices=list(VARIANTS), default=["torch-fp32", "torch-int8"])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[32])
+    parser.add_argument("--threads", type=int, nargs="+", default=[0], help="0은 torch 기본 스레드 수")
+    parser.add_argument("--limit", type=int, default=200, help="사용할 사건 수")
+    parser.add_argument("--max-seq-length", type=int, default=None)
+    parser.add_argument("--onnx-file", default=None, help="onnx 변형에서 사용할 onnx 파일 (예: onnx/model_qint8_avx2.onnx)")
+    args = parser.parse_args()
+
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    run_embedding_bench(
+        os.path.join(current_dir, "data", "train.jsonl"),
+        args.variants,
+        args.batch_sizes,
+        args.threads,
+        args.limit,
+        args.max_seq_length,
+        args.onnx_file,
+    )
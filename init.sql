@@ -15,7 +15,8 @@ CREATE TABLE IF NOT EXISTS langchain_pg_collection (
 CREATE TABLE IF NOT EXISTS langchain_pg_embedding (
     id VARCHAR PRIMARY KEY,
     collection_id UUID REFERENCES langchain_pg_collection (uuid) ON DELETE CASCADE,
-    embedding VECTOR,
+    -- jhgan/ko-sbert-nli 차원(768)으로 고정해야 HNSW/IVFFlat 인덱스를 만들 수 있습니다.
+    embedding VECTOR(768),
     document VARCHAR,
     cmetadata JSONB
 );
@@ -27,3 +28,6 @@ CREATE INDEX IF NOT EXISTS ix_cmetadata_gin
 -- Optional helper index to speed up joins on collection references.
 CREATE INDEX IF NOT EXISTS ix_langchain_pg_embedding_collection_id
     ON langchain_pg_embedding (collection_id);
+
+-- 컬렉션별 코사인 HNSW 인덱스는 컬렉션 UUID가 생성된 뒤
+-- `python ann_index.py migrate` 로 만듭니다 (src/vector_db.py의 ensure_ann_index 참고).
@@ -1,19 +1,38 @@
+import argparse
+
+import src.console as console
+import src.namespace as namespace
+import src.profiling as profiling
 from src.graph import app
+from src.runtime import warmup
 
 if __name__ == "__main__":
-    print("🚀 모의 법정 시뮬레이션을 시작합니다.")
+    parser = argparse.ArgumentParser(description="모의 법정 시뮬레이션")
+    namespace.add_experiment_argument(parser)
+    parser.add_argument("--no-stream", action="store_true", help="발언/판결을 완성된 뒤 한 번에 출력")
+    profiling.add_profile_argument(parser)
+    args = parser.parse_args()
+    namespace.set_experiment(args.experiment)
+    # 터미널에서 실행할 때는 변론과 최종 판결을 토큰이 생성되는 대로 표시합니다.
+    console.set_streaming(console.console.is_terminal and not args.no_stream)
+
+    with profiling.profile_run(args.profile, "main", args.profile_top):
+        print("🚀 모의 법정 시뮬레이션을 시작합니다.")
+
+        # LLM, Redis, 임베딩 모델, 벡터 DB를 병렬로 미리 초기화합니다.
+        profiling.run_stage("warmup", warmup)
 
-    # 초기 재판 정보 설정
-    initial_state = {
-        "case_file": "아파트 층간소음으로 인한 손해배상 청구",
-        "plaintiff_lawyer": "원고측 변호사",
-        "defendant_lawyer": "피고측 변호사",
-    }
+        # 초기 재판 정보 설정
+        initial_state = {
+            "case_file": "아파트 층간소음으로 인한 손해배상 청구",
+            "plaintiff_lawyer": "원고측 변호사",
+            "defendant_lawyer": "피고측 변호사",
+        }
 
-    # 그래프 실행 및 결과 스트리밍
-    for event in app.stream(initial_state):
-        for key, value in event.items():
-            print(f"\n--- Node '{key}' 완료 ---")
-            # 각 단계의 상세 결과를 보려면 아래 주석을 해제하세요.
-            # print(value) 
-            print("-" * 25)
\ No newline at end of file
+        # 그래프 실행 및 결과 스트리밍
+        for event in app.stream(initial_state):
+            for key, value in event.items():
+                print(f"\n--- Node '{key}' 완료 ---")
+                # 각 단계의 상세 결과를 보려면 아래 주석을 해제하세요.
+                # print(value) 
+                print("-" * 25)
\ No newline at end of file
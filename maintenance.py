@@ -0,0 +1,121 @@
+import argparse
+
+import src.console as console
+from rich.table import Table
+
+import src.agents as agents
+import src.checkpoints as checkpoints
+import src.namespace as namespace
+from src.lesson_store import LESSON_COMPACTION_THRESHOLD, compact_lessons
+from src.vector_db import dedupe_archive, get_collection_name, rebuild_lexical_index, reset_collection
+
+
+def run_rebuild_lexical_index():
+    """사건 아카이브 전체를 다시 읽어 n-gram 역색인을 새로 만듭니다."""
+    console.print_header("n-gram 역색인 재생성")
+    total = rebuild_lexical_index()
+    console.console.print(f"✅ '{get_collection_name()}' 컬렉션의 사건 {total}건을 색인했습니다.")
+
+
+def run_dedupe(dry_run: bool = False):
+    """중복 저장된 사건을 하나로 합치고 남은 문서를 결정적 id로 다시 지정합니다."""
+    console.print_header("사건 아카이브 중복 정리" + (" (dry-run)" if dry_run else ""))
+    stats = dedupe_archive(dry_run=dry_run)
+
+    table = Table(title=f"'{get_collection_name()}' 중복 정리 결과")
+    table.add_column("항목", style="cyan")
+    table.add_column("건수", justify="right")
+    table.add_row("전체 문서", str(stats["documents"]))
+    table.add_row("고유 사건", str(stats["unique"]))
+    table.add_row("삭제된 중복", str(stats["removed"]))
+    table.add_row("id 재지정", str(stats["rekeyed"]))
+    console.console.print(table)
+
+
+def run_compact_lessons(threshold: float, dry_run: bool = False):
+    """변호사 교훈 리스트의 비슷한 교훈을 대표 교훈 하나와 빈도로 합칩니다."""
+    console.print_header("변호사 교훈 정리" + (" (dry-run)" if dry_run else ""))
+    results = compact_lessons(agents.get_redis_client(), threshold=threshold, dry_run=dry_run)
+
+    table = Table(title=f"교훈 정리 결과 (코사인 유사도 ≥ {threshold})")
+    table.add_column("리스트", style="cyan")
+    table.add_column("정리 전", justify="right")
+    table.add_column("정리 후", justify="right")
+    for key, (before, after) in results.items():
+        table.add_row(key, str(before), str(after))
+    console.console.print(table)
+
+
+def run_reset_namespace():
+    """현재 실험 네임스페이스의 Redis 키와 사건 아카이브 컬렉션만 초기화합니다."""
+    label = namespace.experiment_id() or "기본"
+    console.print_header(f"'{label}' 네임스페이스 초기화")
+    deleted = namespace.delete_redis_namespace(agents.get_redis_client())
+    console.console.print(f"🔴 Redis 키 {deleted}개를 삭제했습니다.")
+    reset_collection()
+    console.console.print(f"🔴 '{get_collection_name()}' 컬렉션을 초기화했습니다.")
+
+
+def run_llm_cache(clear: bool = False):
+    """LLM 응답 캐시의 크기를 출력하거나 비웁니다."""
+    console.print_header("LLM 응답 캐시")
+    cache = agents.get_llm_cache()
+    if cache is None:
+        console.console.print("LLM_CACHE가 꺼져 있습니다. .env에서 LLM_CACHE=true로 설정하세요.")
+        return
+    if clear:
+        cache.clear()
+        console.console.print("🔴 LLM 응답 캐시를 비웠습니다.")
+    stats = cache.stats()
+    console.console.print(f"{cache.path}: {stats['entries']}건, {stats['bytes'] / 1024 / 1024:.1f}MB")
+
+
+def run_checkpoints(clear: bool = False):
+    """재판 체크포인트 DB의 크기를 출력하거나 현재 실험 네임스페이스의 체크포인트를 지웁니다."""
+    console.print_header("재판 체크포인트")
+    if clear:
+        cleared = checkpoints.clear_checkpoints()
+        console.console.print(f"🔴 재판 체크포인트 {cleared}건을 삭제했습니다.")
+    stats = checkpoints.checkpoint_stats()
+    console.console.print(
+        f"{checkpoints.trial_checkpoint_path}: 재판 {stats['threads']}건, "
+        f"체크포인트 {stats['checkpoints']}개, {stats['bytes'] / 1024 / 1024:.1f}MB"
+    )
+    if not checkpoints.trial_checkpoint_enabled:
+        console.console.print("TRIAL_CHECKPOINT가 꺼져 있습니다. .env에서 TRIAL_CHECKPOINT=true로 설정하세요.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="사건 아카이브 유지보수 도구")
+    namespace.add_experiment_argument(parser)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("rebuild-lexical-index", help="아카이브 전체로 하이브리드 검색용 n-gram 역색인을 다시 만듭니다.")
+    dedupe_parser = subparsers.add_parser("dedupe", help="중복 저장된 사건을 하나로 합치고 결정적 id로 다시 지정합니다.")
+    dedupe_parser.add_argument("--dry-run", action="store_true", help="변경 없이 정리 대상 건수만 출력합니다.")
+
+    compact_parser = subparsers.add_parser("compact-lessons", help="비슷한 변호사 교훈을 대표 교훈 하나와 빈도로 합칩니다.")
+    compact_parser.add_argument("--threshold", type=float, default=LESSON_COMPACTION_THRESHOLD,
+                                help="같은 교훈으로 볼 코사인 유사도 기준")
+    compact_parser.add_argument("--dry-run", action="store_true", help="변경 없이 정리 전/후 교훈 수만 출력합니다.")
+    subparsers.add_parser("reset-namespace", help="현재 실험 네임스페이스의 Redis 키와 컬렉션만 초기화합니다.")
+    llm_cache_parser = subparsers.add_parser("llm-cache", help="LLM 응답 캐시 크기를 확인하거나 비웁니다.")
+    llm_cache_parser.add_argument("--clear", action="store_true", help="캐시를 모두 삭제합니다.")
+    checkpoints_parser = subparsers.add_parser("checkpoints", help="재판 체크포인트 크기를 확인하거나 비웁니다.")
+    checkpoints_parser.add_argument("--clear", action="store_true",
+                                    help="현재 실험 네임스페이스의 체크포인트를 삭제합니다.")
+    args = parser.parse_args()
+    namespace.set_experiment(args.experiment)
+
+    if args.command == "rebuild-lexical-index":
+        run_rebuild_lexical_index()
+    elif args.command == "dedupe":
+        run_dedupe(args.dry_run)
+    elif args.command == "compact-lessons":
+        run_compact_lessons(args.threshold, args.dry_run)
+    elif args.command == "reset-namespace":
+        run_reset_namespace()
+    elif args.command == "llm-cache":
+        run_llm_cache(args.clear)
+    elif args.command == "checkpoints":
+        run_checkpoints(args.clear)
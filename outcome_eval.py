@@ -0,0 +1,161 @@
+import argparse
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+from rich.table import Table
+
+import src.agents as agents
+import src.console as console
+import src.namespace as namespace
+from src.outcome_classifier import (
+    OUTCOMES,
+    OutcomeModel,
+    classify_locally,
+    collect_training_data,
+    outcome_classifier_path,
+    outcome_classifier_threshold,
+    reload_model,
+    train_model,
+)
+from src.vector_db import iter_archive_documents
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_LABELS = os.path.join(current_dir, "data", "test.jsonl")
+
+
+def _load_cases(path: str) -> List[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _labels(paths: List[str]) -> Dict[str, str]:
+    labels: Dict[str, str] = {}
+    for path in paths:
+        for case in _load_cases(path):
+            if case.get("caseId") and case.get("expected_outcome") in OUTCOMES:
+                labels[case["caseId"]] = case["expected_outcome"]
+    return labels
+
+
+def run_train(label_paths: List[str], exclude_paths: List[str]) -> None:
+    """
+    사건 아카이브의 판결문으로 승패 분류기를 학습해 저장합니다.
+    기본값으로 평가 사건(data/test.jsonl)을 제외하므로 eval 결과가 학습 데이터로 부풀려지지 않습니다.
+    """
+    exclude = [case.get("caseId") for path in exclude_paths for case in _load_cases(path)]
+    verdicts, targets, case_ids = collect_training_data(_labels(label_paths), exclude)
+    if len(set(targets)) < 2:
+        console.console.print("[bold red]학습할 라벨이 부족합니다. batch_learn.py나 benchmark.py를 먼저 실행하세요.[/bold red]")
+        return
+
+    model = train_model(verdicts, targets, case_ids)
+    model.save(outcome_classifier_path)
+    reload_model()
+    counts = {outcome: targets.count(outcome) for outcome in OUTCOMES}
+    console.console.print(f"판결문 {len(verdicts)}건으로 학습했습니다 {counts} -> {outcome_classifier_path}")
+    if not exclude:
+        console.console.print("[bold yellow]경고: 제외한 사건이 없어 평가 사건도 학습에 포함되었을 수 있습니다.[/bold yellow]")
+
+
+def _warn_overlap(cases: List[dict]) -> None:
+    """저장된 분류기의 학습 caseId와 평가 사건이 겹치면 경고합니다."""
+    model = OutcomeModel.load(outcome_classifier_path)
+    if model is None:
+        return
+    overlap = {case.get("caseId") for case in cases} & set(filter(None, model.case_ids))
+    if overlap:
+        console.console.print(
+            f"[bold yellow]경고: 평가 사건 {len(overlap)}건이 분류기 학습 데이터에 포함되어 있어 일치율이 부풀려집니다. "
+            "평가 사건을 제외하는 기본 설정('outcome_eval.py train')으로 다시 학습하세요.[/bold yellow]"
+        )
+
+
+def _test_verdicts(cases: List[dict], generate: bool) -> List[Tuple[dict, str]]:
+    """평가할 (사건, 판결문) 목록. 아카이브에 저장된 판결문을 쓰고, 없으면 generate일 때만 새로 생성합니다."""
+    archived = {
+        metadata["case_id"]: metadata["verdict"]
+        for _, _, metadata in iter_archive_documents()
+        if metadata.get("case_id") and metadata.get("verdict")
+    }
+    pairs = []
+    for case in cases:
+        verdict = archived.get(case.get("caseId"))
+        if verdict is None and generate:
+            verdict = agents.get_chain("batch_judge_chain").invoke({
+                "plaintiff_statement": case["plaintiff_statement"],
+                "defendant_statement": case["defendant_statement"],
+            }).content.strip()
+        if verdict:
+            pairs.append((case, verdict))
+    return pairs
+
+
+def _rate(hits: int, total: int) -> str:
+    return f"{hits / total:.1%} ({hits}/{total})" if total else "-"
+
+
+def run_eval(path: str, generate: bool, thresholds: List[float]) -> None:
+    """
+    테스트 사건의 판결문마다 로컬 분류기와 evaluation_chain(LLM)의 판단을 비교합니다.
+    임계치별로 로컬에서 처리되는 비율(=절약되는 LLM 호출)과 그 구간의 LLM 일치율을 출력합니다.
+    """
+    cases = _load_cases(path)
+    _warn_overlap(cases)
+    pairs = _test_verdicts(cases, generate)
+    if not pairs:
+        console.console.print("[bold red]평가할 판결문이 없습니다. benchmark.py를 먼저 실행하거나 --generate를 지정하세요.[/bold red]")
+        return
+
+    rows: List[Tuple[Optional[str], float, str, Optional[str]]] = []
+    for case, verdict in pairs:
+        local = classify_locally(verdict)
+        llm_outcome = agents.get_chain("evaluation_chain").invoke({"final_verdict": verdict}).content.strip()
+        rows.append((local.outcome, local.confidence, llm_outcome, case.get("expected_outcome")))
+    source = classify_locally(pairs[0][1]).source
+
+    console.print_header(f"승패 분류기 평가 ({len(rows)}건, {'학습 모델' if source == 'model' else '주문 규칙'})")
+    table = Table(title="임계치별 로컬 처리율과 LLM 일치율")
+    table.add_column("임계치", justify="right", style="cyan")
+    table.add_column("로컬 처리율", justify="right")
+    table.add_column("LLM 일치율(로컬 처리분)", justify="right")
+    table.add_column("정답 일치율(최종)", justify="right")
+    for threshold in sorted(set(thresholds + [outcome_classifier_threshold])):
+        covered = [row for row in rows if row[0] is not None and row[1] >= threshold]
+        agree = sum(1 for local, _, llm, _ in covered if local == llm)
+        # 최종 결과: 로컬 처리분은 로컬 판단, 나머지는 LLM 판단
+        final = [(local if local is not None and conf >= threshold else llm, expected) for local, conf, llm, expected in rows]
+        labeled = [(outcome, expected) for outcome, expected in final if expected]
+        correct = sum(1 for outcome, expected in labeled if outcome == expected)
+        marker = " *" if threshold == outcome_classifier_threshold else ""
+        table.add_row(f"{threshold:.2f}{marker}", _rate(len(covered), len(rows)), _rate(agree, len(covered)),
+                      _rate(correct, len(labeled)))
+    console.console.print(table)
+
+    labeled = [row for row in rows if row[3]]
+    llm_correct = sum(1 for _, _, llm, expected in labeled if llm == expected)
+    console.console.print(f"LLM 단독 정답 일치율: {_rate(llm_correct, len(labeled))}  (* 현재 OUTCOME_CLASSIFIER_THRESHOLD)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="판결문 승패 분류기 학습/평가")
+    namespace.add_experiment_argument(parser)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    train_parser = subparsers.add_parser("train", help="사건 아카이브의 판결문으로 분류기 학습")
+    train_parser.add_argument("--labels", nargs="*", default=[],
+                              help="caseId별 expected_outcome 라벨 파일 (없는 사건은 기록된 승패 사용)")
+    train_parser.add_argument("--exclude", nargs="*", default=[DEFAULT_LABELS],
+                              help="학습에서 제외할 사건 파일 (기본값: 평가용 data/test.jsonl, 인자 없이 주면 제외하지 않음)")
+
+    eval_parser = subparsers.add_parser("eval", help="테스트 사건에서 LLM 판단과의 일치율 평가")
+    eval_parser.add_argument("--data", default=DEFAULT_LABELS)
+    eval_parser.add_argument("--generate", action="store_true", help="아카이브에 판결문이 없는 사건은 새로 생성")
+    eval_parser.add_argument("--thresholds", type=float, nargs="+", default=[0.5, 0.6, 0.7, 0.8, 0.9, 0.95])
+
+    args = parser.parse_args()
+    namespace.set_experiment(args.experiment)
+    if args.command == "train":
+        run_train(args.labels, args.exclude)
+    else:
+        run_eval(args.data, args.generate, args.thresholds)
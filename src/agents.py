@@ -1,22 +1,34 @@
 import os
-from typing import List, Literal, Optional
+from typing import Any, Dict, List, Literal, Optional
 
-import redis
 from dotenv import load_dotenv
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.language_models import BaseChatModel
-from langchain_openai import ChatOpenAI
 
 from pydantic import BaseModel, Field
+
+import src.metrics as metrics
+from src.lazy import Lazy
+from src.metrics import MetricsCallbackHandler
+
 __all__ = (
     "llm",
     "redis_client",
+    "get_llm",
+    "get_redis_client",
+    "get_chain",
+    "get_llm_cache",
+    "llm_cache_stats",
+    "get_rate_limiter",
+    "llm_rate_limit_stats",
     "lawyer_chain",
     "judge_chain",
     "presiding_judge_chain",
     "batch_judge_chain",
     "evaluation_chain",
     "reflection_chain",
+    "post_verdict_chain",
+    "transcript_summary_chain",
     "critic_chain",
     "CRITIQUE_CRITERIA",
     "JUDGE_PERSONALITY_POOL",
@@ -26,11 +38,117 @@ __all__ = (
 load_dotenv()
 
 
+# LLM 응답 캐시 (LLM_CACHE=true 일 때만 사용)
+# 렌더링된 프롬프트와 모델 호출 파라미터가 같으면 저장된 응답을 재사용합니다.
+_project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+llm_cache_enabled = os.getenv("LLM_CACHE", "false").lower() in ("1", "true", "yes", "on")
+llm_cache_path = os.getenv("LLM_CACHE_PATH", os.path.join(_project_root, ".cache", "llm_cache.sqlite3"))
+llm_cache_max_mb = float(os.getenv("LLM_CACHE_MAX_MB", "256"))
+
+
+# 설정 시 모든 LLM 호출의 프롬프트와 응답을 JSONL로 기록합니다 (LLM_PROVIDER=replay의 입력).
+llm_trace_path: Optional[str] = os.getenv("LLM_TRACE_PATH") or None
+
+
+# 클라이언트 측 속도 제한/재시도 (LLM_RATE_LIMIT=false로 끌 수 있습니다)
+llm_rate_limit_enabled = os.getenv("LLM_RATE_LIMIT", "true").lower() in ("1", "true", "yes", "on")
+
+
+def _init_rate_limiter():
+    from src.rate_limit import AdaptiveRateLimiter
+
+    return AdaptiveRateLimiter.from_env()
+
+
+_rate_limiter = Lazy(_init_rate_limiter)
+
+
+def get_rate_limiter():
+    """모든 LLM 호출이 공유하는 속도 제한기를 반환합니다."""
+    return _rate_limiter.get()
+
+
+def llm_rate_limit_stats() -> Optional[Dict[str, Any]]:
+    """요청/재시도/429 횟수, 대기 시간, 현재 적용 중인 한도를 반환합니다. 속도 제한을 끄면 None입니다."""
+    return _rate_limiter.get().stats() if llm_rate_limit_enabled else None
+
+
+def _init_llm_cache():
+    from src.llm_cache import SQLiteLLMCache
+
+    return SQLiteLLMCache(llm_cache_path, max_bytes=int(llm_cache_max_mb * 1024 * 1024))
+
+
+_llm_cache = Lazy(_init_llm_cache)
+
+
+def get_llm_cache():
+    """LLM 응답 캐시를 반환합니다. LLM_CACHE가 꺼져 있으면 None입니다."""
+    return _llm_cache.get() if llm_cache_enabled else None
+
+
+def llm_cache_stats() -> Optional[Dict[str, Any]]:
+    """LLM 응답 캐시의 적중/미스/삭제 통계를 반환합니다. 캐시를 쓰지 않으면 None입니다."""
+    return _llm_cache.get().stats() if llm_cache_enabled else None
+
+
 def _init_llm() -> BaseChatModel:
     """환경 변수에 따라 사용할 LLM 클라이언트를 초기화합니다."""
 
     llm_provider = os.getenv("LLM_PROVIDER", "openai").lower()
     temperature = float(os.getenv("LLM_TEMPERATURE", "0.7"))
+    # 캐시 키의 llm_string에는 제공자 종류, 모델 이름, temperature 등 호출 파라미터가 모두 포함됩니다.
+    # 노드별 LLM 시간/토큰 계측 콜백은 항상 붙입니다 (벤치마크 재판 밖에서는 기록하지 않음).
+    common_kwargs: Dict[str, Any] = {"callbacks": [MetricsCallbackHandler()]}
+    if llm_cache_enabled:
+        common_kwargs["cache"] = get_llm_cache()
+    if llm_trace_path and llm_provider != "replay":
+        from src.fake_llm import TraceRecorder
+
+        # 실제 실행의 프롬프트/응답을 기록해 두면 LLM_PROVIDER=replay로 다시 돌려볼 수 있습니다.
+        common_kwargs["callbacks"].append(TraceRecorder(llm_trace_path))
+
+    if not llm_rate_limit_enabled:
+        return _init_provider_llm(llm_provider, temperature, common_kwargs)
+
+    from src.rate_limit import RateLimitedChatModel, RetryPolicy
+
+    # 캐시와 기록 콜백은 바깥 모델에 붙여, 캐시 적중 시에는 속도 제한 한도를 소모하지 않게 합니다.
+    return RateLimitedChatModel(
+        inner=_init_provider_llm(llm_provider, temperature, {}),
+        limiter=get_rate_limiter(),
+        retry=RetryPolicy.from_env(),
+        expected_output_tokens=int(os.getenv("LLM_EXPECTED_OUTPUT_TOKENS", "512")),
+        **common_kwargs,
+    )
+
+
+def _init_provider_llm(llm_provider: str, temperature: float, common_kwargs: Dict[str, Any]) -> BaseChatModel:
+    """공급자별 채팅 모델을 만듭니다."""
+    if llm_provider == "fake":
+        from src.fake_llm import FakeCourtChatModel
+
+        return FakeCourtChatModel(
+            seed=int(os.getenv("LLM_FAKE_SEED", "0")),
+            latency_ms=float(os.getenv("LLM_FAKE_LATENCY_MS", "0")),
+            jitter_ms=float(os.getenv("LLM_FAKE_LATENCY_JITTER_MS", "0")),
+            **common_kwargs,
+        )
+
+    if llm_provider == "replay":
+        from src.fake_llm import ReplayChatModel
+
+        replay_path = os.getenv("LLM_REPLAY_PATH") or llm_trace_path
+        if not replay_path or not os.path.exists(replay_path):
+            raise ValueError(
+                "LLM_PROVIDER=replay에는 기록 파일이 필요합니다. LLM_REPLAY_PATH를 확인해주세요."
+            )
+        return ReplayChatModel(
+            trace_path=replay_path,
+            latency=os.getenv("LLM_REPLAY_LATENCY", "0"),
+            miss_policy=os.getenv("LLM_REPLAY_MISS", "role"),
+            **common_kwargs,
+        )
 
     if llm_provider == "openai":
         from langchain_openai import ChatOpenAI
@@ -41,7 +159,10 @@ def _init_llm() -> BaseChatModel:
             )
 
         openai_model = os.getenv("OPENAI_MODEL", "gpt-4o")
-        return ChatOpenAI(model=openai_model, temperature=temperature)
+        if llm_rate_limit_enabled:
+            # 재시도는 RateLimitedChatModel이 백오프와 함께 처리하므로 SDK 자체 재시도는 끕니다.
+            common_kwargs = {**common_kwargs, "max_retries": 0}
+        return ChatOpenAI(model=openai_model, temperature=temperature, **common_kwargs)
 
     if llm_provider == "nvidia":
         try:
@@ -59,19 +180,25 @@ def _init_llm() -> BaseChatModel:
         nvidia_model = os.getenv("NVIDIA_NIM_MODEL", "meta/llama3-70b-instruct")
         base_url: Optional[str] = os.getenv("NVIDIA_NIM_BASE_URL")
 
-        llm_kwargs = {"model": nvidia_model, "temperature": temperature}
+        llm_kwargs = {"model": nvidia_model, "temperature": temperature, **common_kwargs}
         if base_url:
             llm_kwargs["base_url"] = base_url
 
         return ChatNVIDIA(**llm_kwargs)
 
     raise ValueError(
-        "지원하지 않는 LLM_PROVIDER 값입니다. openai 또는 nvidia 중 하나를 사용해주세요."
+        "지원하지 않는 LLM_PROVIDER 값입니다. openai, nvidia, fake, replay 중 하나를 사용해주세요."
     )
 
 
 # 사용할 LLM 모델 설정
-llm = _init_llm()
+# 모델 클라이언트는 처음 사용할 때 생성합니다. (get_llm 참고)
+_llm: Lazy[BaseChatModel] = Lazy(_init_llm)
+
+
+def get_llm() -> BaseChatModel:
+    """지연 생성된 LLM 클라이언트를 반환합니다."""
+    return _llm.get()
 
 
 class CritiqueItem(BaseModel):
@@ -142,8 +269,86 @@ CRITIQUE_CRITERIA: List[str] = [
 ]
 
 
+class PostVerdictAnalysis(BaseModel):
+    """판결 이후 분석(원고측 승패와 양측 변호사의 교훈)을 한 번에 받는 스키마."""
+
+    plaintiff_outcome: Literal["승리", "패배", "무승부"] = Field(
+        ...,
+        description="원고 입장에서의 승패",
+    )
+    plaintiff_lesson: str = Field(
+        ...,
+        min_length=1,
+        description="원고측 변호사의 핵심 전략 및 교훈 (한 문장)",
+    )
+    defendant_lesson: str = Field(
+        ...,
+        min_length=1,
+        description="피고측 변호사의 핵심 전략 및 교훈 (한 문장)",
+    )
+
+
 # ------------------- 데이터베이스 클라이언트 -------------------
-redis_client = redis.Redis(host='localhost', port=6379, db=0, decode_responses=True)
+def _instrumented_redis_class():
+    """명령/파이프라인 실행 시간을 현재 재판의 노드 계측값(redis_ms)에 더하는 Redis 클라이언트 클래스를 만듭니다."""
+    import redis
+    from redis.client import Pipeline
+
+    class InstrumentedPipeline(Pipeline):
+        def execute(self, raise_on_error: bool = True):
+            with metrics.timed("redis_ms"):
+                return super().execute(raise_on_error)
+
+    class InstrumentedRedis(redis.Redis):
+        def execute_command(self, *args, **options):
+            with metrics.timed("redis_ms"):
+                return super().execute_command(*args, **options)
+
+        def pipeline(self, transaction=True, shard_hint=None):
+            return InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+    return InstrumentedRedis
+
+
+def _init_redis_client():
+    return _instrumented_redis_class()(
+        host=os.getenv("REDIS_HOST", "localhost"),
+        port=int(os.getenv("REDIS_PORT", "6379")),
+        db=int(os.getenv("REDIS_DB", "0")),
+        decode_responses=True,
+    )
+
+
+_redis_client = Lazy(_init_redis_client)
+
+
+def get_redis_client():
+    """지연 생성된 Redis 클라이언트를 반환합니다."""
+    return _redis_client.get()
+
+
+# 체인도 LLM이 필요할 때 처음 조립합니다. 이름으로 get_chain()을 호출하거나
+# 기존처럼 `agents.lawyer_chain` 속성으로 접근할 수 있습니다.
+_chains: Dict[str, Lazy] = {}
+
+
+def _register_chain(name: str, factory) -> None:
+    _chains[name] = Lazy(factory)
+
+
+def get_chain(name: str):
+    """이름에 해당하는 체인을 (필요하면 생성해서) 반환합니다."""
+    return _chains[name].get()
+
+
+def __getattr__(name: str) -> Any:
+    if name == "llm":
+        return get_llm()
+    if name == "redis_client":
+        return get_redis_client()
+    if name in _chains:
+        return get_chain(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # ------------------- 변호사 에이전트 -------------------
 lawyer_prompt_template = """
@@ -178,7 +383,7 @@ lawyer_prompt_template = """
 위 정보를 바탕으로, 이제 당신의 차례입니다. 의뢰인을 위해 최고의 변론을 펼치세요.
 """
 lawyer_prompt = ChatPromptTemplate.from_template(lawyer_prompt_template)
-lawyer_chain = lawyer_prompt | llm
+_register_chain("lawyer_chain", lambda: lawyer_prompt | get_llm())
 
 # ------------------- 서브 판사 에이전트 -------------------
 judge_prompt_template = """
@@ -195,7 +400,7 @@ judge_prompt_template = """
 [당신의 의견]
 """
 judge_prompt = ChatPromptTemplate.from_template(judge_prompt_template)
-judge_chain = judge_prompt | llm
+_register_chain("judge_chain", lambda: judge_prompt | get_llm())
 
 # ------------------- 재판장 에이전트 -------------------
 presiding_judge_prompt_template = """
@@ -213,7 +418,7 @@ presiding_judge_prompt_template = """
 [최종 판결문]
 """
 presiding_judge_prompt = ChatPromptTemplate.from_template(presiding_judge_prompt_template)
-presiding_judge_chain = presiding_judge_prompt | llm
+_register_chain("presiding_judge_chain", lambda: presiding_judge_prompt | get_llm())
 
 # ------------------- 일괄 판결 생성 에이전트 -------------------
 batch_judge_prompt_template = """
@@ -232,7 +437,7 @@ batch_judge_prompt_template = """
 [최종 판결문]
 """
 batch_judge_prompt = ChatPromptTemplate.from_template(batch_judge_prompt_template)
-batch_judge_chain = batch_judge_prompt | llm
+_register_chain("batch_judge_chain", lambda: batch_judge_prompt | get_llm())
 
 # ------------------- 학습/진화 에이전트 -------------------
 evaluation_prompt_template = """
@@ -251,7 +456,7 @@ evaluation_prompt_template = """
 [원고측 승패 여부]
 """
 evaluation_prompt = ChatPromptTemplate.from_template(evaluation_prompt_template)
-evaluation_chain = evaluation_prompt | llm
+_register_chain("evaluation_chain", lambda: evaluation_prompt | get_llm())
 
 reflection_prompt_template = """
 # 역할(Role)
@@ -267,7 +472,52 @@ reflection_prompt_template = """
 [핵심 전략 및 교훈]
 """
 reflection_prompt = ChatPromptTemplate.from_template(reflection_prompt_template)
-reflection_chain = reflection_prompt | llm
+_register_chain("reflection_chain", lambda: reflection_prompt | get_llm())
+
+# 승패 판단과 양측 회고를 한 번의 호출로 처리합니다 (실패하면 위의 두 체인으로 대체).
+post_verdict_prompt_template = """
+# 역할(Role)
+당신은 재판을 복기하는 사후 분석가이자 변론 전략 코치입니다.
+# 임무(Mission)
+아래의 '최종 판결문'과 양측 변호사의 '변론 내용'을 읽고 다음을 작성하세요.
+1. plaintiff_outcome: '원고' 입장에서의 승패. {outcome_instruction}
+2. plaintiff_lesson: 원고측 변론에서 가장 유효했거나 가장 아쉬웠던 핵심 전략을 한 문장으로 요약한 '교훈'
+3. defendant_lesson: 피고측 변론에서 가장 유효했거나 가장 아쉬웠던 핵심 전략을 한 문장으로 요약한 '교훈'
+교훈은 각 변호사 입장에서의 재판 결과(원고가 승리하면 피고는 패배)를 반영해야 합니다.
+---
+[최종 판결문]
+{final_verdict}
+[원고측 변론 내용]
+{plaintiff_speeches}
+[피고측 변론 내용]
+{defendant_speeches}
+---
+"""
+post_verdict_prompt = ChatPromptTemplate.from_template(post_verdict_prompt_template)
+_register_chain(
+    "post_verdict_chain",
+    lambda: post_verdict_prompt | get_llm().with_structured_output(PostVerdictAnalysis),
+)
+
+# ------------------- 토론 기록 요약 에이전트 -------------------
+transcript_summary_prompt_template = """
+# 역할(Role)
+당신은 법정의 토론 기록을 정리하는 서기입니다.
+# 임무(Mission)
+아래의 '기존 요약'에 '새 발언'의 내용을 합쳐, 하나의 갱신된 요약을 작성하세요.
+- 양측이 제시한 사실관계, 증거, 핵심 주장과 반박, 인정하거나 양보한 내용은 빠짐없이 남기세요.
+- 발언자(원고측/피고측)를 구분하고, 수사적 표현은 생략하세요.
+- 요약만 출력하세요.
+---
+[기존 요약]
+{previous_summary}
+[새 발언]
+{new_turns}
+---
+[갱신된 요약]
+"""
+transcript_summary_prompt = ChatPromptTemplate.from_template(transcript_summary_prompt_template)
+_register_chain("transcript_summary_chain", lambda: transcript_summary_prompt | get_llm())
 
 # ------------------- 비평가 에이전트 (논문 방식 적용) -------------------
 critic_prompt_template = """
@@ -297,7 +547,10 @@ critic_prompt_template = """
 ---
 """
 critic_prompt = ChatPromptTemplate.from_template(critic_prompt_template)
-critic_chain = critic_prompt | llm.with_structured_output(CritiqueEvaluation)
+_register_chain(
+    "critic_chain",
+    lambda: critic_prompt | get_llm().with_structured_output(CritiqueEvaluation),
+)
 
 # ------------------- 데이터 및 설정 -------------------
 JUDGE_PERSONALITY_POOL = [
@@ -0,0 +1,134 @@
+import os
+import sqlite3
+from contextlib import asynccontextmanager, closing, contextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, Optional
+
+import src.namespace as namespace
+
+# 재판 체크포인트 (TRIAL_CHECKPOINT=true 일 때만 사용)
+# LangGraph의 SQLite 체크포인터로 노드가 끝날 때마다 재판 상태를 저장합니다.
+# thread_id는 "실험 네임스페이스:범위:caseId"이므로 같은 사건을 다시 실행하면
+# 마지막으로 완료된 노드 다음부터 이어서 실행하고, 이미 끝난 재판은 저장된 최종 상태를 그대로 사용합니다.
+trial_checkpoint_enabled = os.getenv("TRIAL_CHECKPOINT", "false").lower() in ("1", "true", "yes", "on")
+_project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+trial_checkpoint_path = os.getenv(
+    "TRIAL_CHECKPOINT_PATH", os.path.join(_project_root, ".cache", "trial_checkpoints.sqlite3")
+)
+
+
+def thread_id(case_id: str, scope: str) -> str:
+    return f"{namespace.experiment_id() or 'default'}:{scope}:{case_id}"
+
+
+def trial_config(case_id: Optional[str], scope: str) -> Optional[Dict[str, Any]]:
+    """사건의 체크포인트 설정. 체크포인트를 쓰지 않거나 caseId가 없으면 None입니다."""
+    if not trial_checkpoint_enabled or not case_id:
+        return None
+    return {"configurable": {"thread_id": thread_id(case_id, scope)}}
+
+
+def _ensure_directory() -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(trial_checkpoint_path)), exist_ok=True)
+
+
+@contextmanager
+def open_checkpointer() -> Iterator[Optional[Any]]:
+    """동기 그래프용 SqliteSaver. 체크포인트를 쓰지 않으면 None을 돌려줍니다."""
+    if not trial_checkpoint_enabled:
+        yield None
+        return
+    from langgraph.checkpoint.sqlite import SqliteSaver
+
+    _ensure_directory()
+    with SqliteSaver.from_conn_string(trial_checkpoint_path) as saver:
+        yield saver
+
+
+@asynccontextmanager
+async def aopen_checkpointer() -> AsyncIterator[Optional[Any]]:
+    """비동기 그래프(app.astream)용 AsyncSqliteSaver. 체크포인트를 쓰지 않으면 None을 돌려줍니다."""
+    if not trial_checkpoint_enabled:
+        yield None
+        return
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+    _ensure_directory()
+    async with AsyncSqliteSaver.from_conn_string(trial_checkpoint_path) as saver:
+        yield saver
+
+
+def is_finished(snapshot) -> bool:
+    """체크포인트가 있고 더 실행할 노드가 없으면 끝난 재판입니다."""
+    return bool(snapshot.values) and not snapshot.next
+
+
+def trial_input(snapshot, initial_state: dict) -> Optional[dict]:
+    """
+    그래프에 넘길 입력. 중간에 멈춘 재판이면 None(마지막 체크포인트에서 이어서 실행),
+    체크포인트가 없으면 initial_state로 새로 시작합니다.
+    """
+    if snapshot is not None and snapshot.values and snapshot.next:
+        return None
+    return initial_state
+
+
+def checkpoint_stats() -> Dict[str, Any]:
+    """저장된 재판(thread) 수, 체크포인트 수, 파일 크기를 반환합니다."""
+    if not os.path.exists(trial_checkpoint_path):
+        return {"threads": 0, "checkpoints": 0, "bytes": 0}
+    with closing(sqlite3.connect(trial_checkpoint_path)) as conn, conn:
+        try:
+            threads, checkpoints = conn.execute(
+                "SELECT COUNT(DISTINCT thread_id), COUNT(*) FROM checkpoints"
+            ).fetchone()
+        except sqlite3.OperationalError:
+            threads, checkpoints = 0, 0
+    return {"threads": threads, "checkpoints": checkpoints, "bytes": os.path.getsize(trial_checkpoint_path)}
+
+
+def _scope_prefix(scope: Optional[str]) -> str:
+    return f"{namespace.experiment_id() or 'default'}:{scope + ':' if scope else ''}"
+
+
+def _scope_pattern(scope: Optional[str]) -> str:
+    prefix = _scope_prefix(scope)
+    return prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def has_checkpoints(scope: Optional[str] = None) -> bool:
+    """현재 실험 네임스페이스(와 scope)에 저장된 재판 체크포인트가 있는지 확인합니다."""
+    if not trial_checkpoint_enabled or not os.path.exists(trial_checkpoint_path):
+        return False
+    with closing(sqlite3.connect(trial_checkpoint_path)) as conn, conn:
+        try:
+            row = conn.execute(
+                "SELECT 1 FROM checkpoints WHERE thread_id LIKE ? ESCAPE '\\' LIMIT 1", (_scope_pattern(scope),)
+            ).fetchone()
+        except sqlite3.OperationalError:
+            return False
+    return row is not None
+
+
+def clear_checkpoints(scope: Optional[str] = None) -> int:
+    """
+    현재 실험 네임스페이스의 체크포인트를 지우고 지운 재판 수를 반환합니다.
+    scope를 주면 그 범위(예: benchmark-trained)만 지웁니다.
+    지운 재판의 교훈 기록 표시(Redis)도 함께 지워, 처음부터 다시 실행하는 재판이 교훈을 다시 기록하게 합니다.
+    """
+    from src.agents import get_redis_client
+    from src.lesson_store import forget_recorded_trials
+
+    forget_recorded_trials(get_redis_client(), _scope_prefix(scope))
+    if not os.path.exists(trial_checkpoint_path):
+        return 0
+    pattern = _scope_pattern(scope)
+    with closing(sqlite3.connect(trial_checkpoint_path)) as conn, conn:
+        try:
+            (count,) = conn.execute(
+                "SELECT COUNT(DISTINCT thread_id) FROM checkpoints WHERE thread_id LIKE ? ESCAPE '\\'", (pattern,)
+            ).fetchone()
+            for table in ("checkpoints", "writes"):
+                conn.execute(f"DELETE FROM {table} WHERE thread_id LIKE ? ESCAPE '\\'", (pattern,))
+        except sqlite3.OperationalError:
+            return 0
+    return count
@@ -1,11 +1,24 @@
+from typing import AsyncIterable, Callable, Iterable
+
 from rich.console import Console
+from rich.live import Live
 from rich.panel import Panel
 from rich.rule import Rule
+from rich.table import Table
 from rich.text import Text
 
 # 콘솔 객체 생성
 console = Console()
 
+# 발언/판결을 토큰 단위로 표시할지 여부 (대화형 실행인 main.py에서만 켭니다)
+streaming = False
+
+
+def set_streaming(enabled: bool):
+    """LLM 응답을 생성되는 대로 Live 패널에 표시할지 설정합니다."""
+    global streaming
+    streaming = enabled
+
 def print_header(title: str):
     """프로그램 시작 헤더를 출력합니다."""
     console.print(Rule(f"[bold cyan]⚖️ {title} ⚖️[/bold cyan]"))
@@ -26,34 +39,67 @@ def print_turn_header(turn_count: int):
     """토론 턴 헤더를 출력합니다."""
     console.print(Rule(f"[bold]변호사 토론 (턴 {turn_count})[/bold]"))
 
-def print_speech(speaker: str, speech: str):
-    """에이전트의 발언을 패널로 출력합니다."""
+def _speech_panel(speaker: str, speech: str) -> Panel:
     title = f"[bold magenta]{speaker}[/bold magenta]"
     if "판사" in speaker:
         title = f"[bold green]{speaker}[/bold green]"
-    
-    console.print(
-        Panel(
-            speech,
-            title=title,
-            border_style="white",
-            padding=(1, 2)
-        )
+
+    return Panel(
+        speech,
+        title=title,
+        border_style="white",
+        padding=(1, 2)
     )
 
+def print_speech(speaker: str, speech: str):
+    """에이전트의 발언을 패널로 출력합니다."""
+    console.print(_speech_panel(speaker, speech))
+
+def _stream_panel(render: Callable[[str], Panel], chunks: Iterable[str]) -> str:
+    """조각이 도착할 때마다 Live 패널을 갱신하고, 이어 붙인 전체 텍스트를 반환합니다."""
+    text = ""
+    with Live(render(text), console=console, refresh_per_second=15) as live:
+        for chunk in chunks:
+            text += chunk
+            live.update(render(text))
+    return text
+
+async def _astream_panel(render: Callable[[str], Panel], chunks: AsyncIterable[str]) -> str:
+    text = ""
+    with Live(render(text), console=console, refresh_per_second=15) as live:
+        async for chunk in chunks:
+            text += chunk
+            live.update(render(text))
+    return text
+
+def stream_speech(speaker: str, chunks: Iterable[str]) -> str:
+    """에이전트의 발언을 생성되는 대로 패널에 표시하고 전체 발언을 반환합니다."""
+    return _stream_panel(lambda speech: _speech_panel(speaker, speech), chunks)
+
+async def astream_speech(speaker: str, chunks: AsyncIterable[str]) -> str:
+    return await _astream_panel(lambda speech: _speech_panel(speaker, speech), chunks)
+
 def print_verdict_header(title: str):
     """판결 헤더를 출력합니다."""
     console.print(Rule(f"[bold red]{title}[/bold red]"))
 
+def _final_verdict_panel(verdict: str) -> Panel:
+    return Panel(
+        Text(verdict, justify="center"),
+        title="[bold red]최종 판결[/bold red]",
+        border_style="red"
+    )
+
 def print_final_verdict(verdict: str):
     """최종 판결문을 패널로 출력합니다."""
-    console.print(
-        Panel(
-            Text(verdict, justify="center"),
-            title="[bold red]최종 판결[/bold red]",
-            border_style="red"
-        )
-    )
+    console.print(_final_verdict_panel(verdict))
+
+def stream_final_verdict(chunks: Iterable[str]) -> str:
+    """최종 판결문을 생성되는 대로 패널에 표시하고 전체 판결문을 반환합니다."""
+    return _stream_panel(_final_verdict_panel, chunks)
+
+async def astream_final_verdict(chunks: AsyncIterable[str]) -> str:
+    return await _astream_panel(_final_verdict_panel, chunks)
 
 def print_update_header():
     """DB 업데이트 헤더를 출력합니다."""
@@ -62,4 +108,80 @@ def print_update_header():
 def print_lesson(lawyer: str, outcome: str, lesson: str):
     """학습된 교훈을 출력합니다."""
     emoji = "✅" if outcome == "승리" else ("❌" if outcome == "패배" else "🟡")
-    console.print(f"{emoji} [bold]{lawyer} ({outcome})[/bold] -> 학습된 교훈: {lesson}")
\ No newline at end of file
+    console.print(f"{emoji} [bold]{lawyer} ({outcome})[/bold] -> 학습된 교훈: {lesson}")
+
+def print_rate_limit_stats(stats):
+    """LLM 속도 제한기 통계를 한 줄로 출력합니다. 속도 제한을 쓰지 않으면(None) 출력하지 않습니다."""
+    if stats is None:
+        return
+    limits = ", ".join(
+        f"{name} {value}" for name, value in (("RPM", stats["effective_rpm"]), ("TPM", stats["effective_tpm"]))
+        if value is not None
+    ) or "한도 없음"
+    console.print(
+        f"LLM 속도 제한: 요청 {stats['requests']}회, 재시도 {stats['retries']}회 (429 {stats['rate_limited']}회), "
+        f"대기 {stats['wait_seconds']:.1f}초, 현재 한도 {limits}"
+    )
+
+def print_outcome_stats(stats):
+    """승패 판단을 로컬 분류기와 LLM이 각각 몇 번 처리했는지 출력합니다."""
+    local = stats["rule"] + stats["model"]
+    total = local + stats["llm"]
+    if not total:
+        return
+    console.print(
+        f"승패 판단: 로컬 {local}회 (규칙 {stats['rule']}, 모델 {stats['model']}), "
+        f"LLM {stats['llm']}회 (로컬 판단 {local / total:.0%})"
+    )
+
+def print_node_metrics(summary, trial_count: int):
+    """노드별 재판당 평균 시간/토큰을 표로 출력합니다."""
+    if not summary or not trial_count:
+        return
+    table = Table(title=f"노드별 평균 (재판 {trial_count}건 기준, 시간은 ms)")
+    table.add_column("노드", style="cyan")
+    for header in ("실행", "전체", "LLM", "LLM 대기", "LLM 호출", "입력 토큰", "출력 토큰", "임베딩", "Redis", "PostgreSQL"):
+        table.add_column(header, justify="right")
+    for name, values in summary.items():
+        table.add_row(name, *(
+            f"{values[field] / trial_count:.1f}"
+            for field in ("runs", "wall_ms", "llm_ms", "llm_wait_ms", "llm_calls", "prompt_tokens",
+                          "completion_tokens", "embedding_ms", "redis_ms", "postgres_ms")
+        ))
+    console.print(table)
+
+def print_profile_report(report, paths):
+    """--profile 실행 결과(단계별 시간/메모리, 함수/패키지별 샘플 상위 N개)를 출력합니다."""
+    samples = report["samples"] or 1
+    print_header(f"프로파일 요약: {report['label']} ({report['elapsed']:.1f}초, 샘플 {report['samples']}개)")
+
+    stage_table = Table(title="단계별 시간/메모리 (샘플 %는 대기 스레드 제외)")
+    stage_table.add_column("단계", style="cyan")
+    for header in ("실행", "시간(s)", "샘플 %", "메모리 피크 증가(MB)"):
+        stage_table.add_column(header, justify="right")
+    for name, runs, seconds, stage_samples, peak in report["stages"]:
+        stage_table.add_row(name, str(runs), f"{seconds:.2f}", f"{stage_samples / samples:.1%}", f"{peak / 1024 / 1024:.1f}")
+    console.print(stage_table)
+
+    hotspot_table = Table(title="함수별 상위 (self = 스택 맨 안쪽, total = 스택에 포함)")
+    hotspot_table.add_column("함수", style="cyan", overflow="fold")
+    hotspot_table.add_column("self %", justify="right")
+    hotspot_table.add_column("total %", justify="right")
+    for label, self_count, total_count in report["hotspots"]:
+        hotspot_table.add_row(label, f"{self_count / samples:.1%}", f"{total_count / samples:.1%}")
+    console.print(hotspot_table)
+
+    console.print("패키지별 self 샘플: " + ", ".join(
+        f"{package} {count / samples:.1%}" for package, count in report["packages"]
+    ))
+
+    allocation_table = Table(title=f"메모리 할당 상위 위치 (종료 시점, 전체 피크 {report['peak'] / 1024 / 1024:.1f}MB)")
+    allocation_table.add_column("위치", style="cyan", overflow="fold")
+    allocation_table.add_column("크기(KB)", justify="right")
+    allocation_table.add_column("블록 수", justify="right")
+    for location, size, count in report["allocations"]:
+        allocation_table.add_row(location, f"{size / 1024:.1f}", str(count))
+    console.print(allocation_table)
+
+    console.print(f"collapsed stack: [bold cyan]{paths['collapsed']}[/bold cyan] (flamegraph.pl, speedscope 등)")
+    console.print(f"cProfile(메인 스레드): [bold cyan]{paths['pstats']}[/bold cyan] (python -m pstats, snakeviz 등)")
@@ -0,0 +1,112 @@
+import importlib.util
+import os
+from typing import List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+EMBEDDING_BACKENDS = ("torch", "onnx")
+EMBEDDING_QUANTIZATIONS = ("none", "int8")
+
+
+class SentenceTransformerEmbeddings(Embeddings):
+    """
+    sentence-transformers 모델을 직접 감싼 CPU 임베딩 백엔드입니다.
+    배치 크기, torch 스레드 수, 최대 시퀀스 길이를 조절할 수 있고,
+    torch 동적 int8 양자화 또는 ONNX Runtime 실행을 선택할 수 있습니다.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        device: str = "cpu",
+        backend: str = "torch",
+        quantize: str = "none",
+        batch_size: int = 32,
+        num_threads: Optional[int] = None,
+        max_seq_length: Optional[int] = None,
+        onnx_file: Optional[str] = None,
+        normalize_embeddings: bool = True,
+    ):
+        if backend not in EMBEDDING_BACKENDS:
+            raise ValueError("EMBEDDING_BACKEND는 torch 또는 onnx 중 하나여야 합니다.")
+        if quantize not in EMBEDDING_QUANTIZATIONS:
+            raise ValueError("EMBEDDING_QUANTIZE는 none 또는 int8 중 하나여야 합니다.")
+        if backend == "onnx" and quantize != "none":
+            raise ValueError(
+                "ONNX 백엔드의 int8 모델은 EMBEDDING_ONNX_FILE로 양자화된 onnx 파일을 지정해 사용하세요."
+            )
+
+        if backend == "onnx" and importlib.util.find_spec("onnxruntime") is None:
+            raise ValueError(
+                "EMBEDDING_BACKEND=onnx에는 onnxruntime/optimum이 필요합니다. pip install -r requirements-onnx.txt로 설치해주세요."
+            )
+
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        if num_threads:
+            torch.set_num_threads(num_threads)
+
+        model_kwargs = {"device": device}
+        if backend == "onnx":
+            model_kwargs["backend"] = "onnx"
+            if onnx_file:
+                model_kwargs["model_kwargs"] = {"file_name": onnx_file}
+
+        self.model = SentenceTransformer(model_name, **model_kwargs)
+        if max_seq_length:
+            self.model.max_seq_length = max_seq_length
+        if quantize == "int8":
+            torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+        self.batch_size = batch_size
+        self.normalize_embeddings = normalize_embeddings
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        vectors = self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            normalize_embeddings=self.normalize_embeddings,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        )
+        return vectors.tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def _optional_int(name: str) -> Optional[int]:
+    value = os.getenv(name)
+    return int(value) if value else None
+
+
+def embedding_settings() -> dict:
+    """환경 변수에서 임베딩 백엔드 설정을 읽습니다."""
+    return {
+        "backend": os.getenv("EMBEDDING_BACKEND", "torch").lower(),
+        "quantize": os.getenv("EMBEDDING_QUANTIZE", "none").lower(),
+        "batch_size": int(os.getenv("EMBEDDING_BATCH_SIZE", "32")),
+        "num_threads": _optional_int("EMBEDDING_THREADS"),
+        "max_seq_length": _optional_int("EMBEDDING_MAX_SEQ_LENGTH"),
+        "onnx_file": os.getenv("EMBEDDING_ONNX_FILE") or None,
+    }
+
+
+def embedding_model_id(model_name: str, settings: dict) -> str:
+    """
+    캐시 키에 쓰는 모델 식별자입니다. 실행 방식이나 정밀도가 달라지면 벡터도 달라지므로
+    기본 설정(torch fp32, 기본 시퀀스 길이)이 아닐 때는 그 차이를 식별자에 포함합니다.
+    """
+    parts = [model_name]
+    if settings.get("backend", "torch") != "torch":
+        parts.append(settings["backend"])
+        if settings.get("onnx_file"):
+            parts.append(settings["onnx_file"])
+    if settings.get("quantize", "none") != "none":
+        parts.append(settings["quantize"])
+    if settings.get("max_seq_length"):
+        parts.append(f"seq{settings['max_seq_length']}")
+    return "|".join(parts)
@@ -0,0 +1,156 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import unicodedata
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional, Union
+
+from langchain_core.embeddings import Embeddings
+
+import src.metrics as metrics
+from src.lazy import Lazy
+
+
+def normalize_text(text: str) -> str:
+    """캐시 키 계산을 위해 유니코드 정규화와 공백 정리를 수행합니다."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    임베딩 모델 앞에 메모리 LRU와 디스크(SQLite) 캐시를 두는 래퍼입니다.
+    캐시 키는 모델 이름과 정규화된 텍스트의 SHA-256 해시이므로,
+    같은 문장은 프로세스가 바뀌어도 다시 인코딩하지 않습니다.
+    ko-sbert처럼 쿼리/문서 인코딩이 동일한 대칭형 모델을 전제로 두 경로가 같은 키를 공유합니다.
+    base에 Lazy를 넘기면 캐시 미스가 처음 발생할 때 모델을 로드합니다.
+    """
+
+    def __init__(
+        self,
+        base: Union[Embeddings, Lazy[Embeddings]],
+        model_name: str,
+        cache_dir: Optional[str] = None,
+        max_memory_items: int = 2048,
+    ):
+        self._base = base
+        self.model_name = model_name
+        self.max_memory_items = max_memory_items
+        self._memory: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._db: Optional[sqlite3.Connection] = None
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            self._db = sqlite3.connect(
+                os.path.join(cache_dir, "embeddings.sqlite3"),
+                check_same_thread=False,
+                isolation_level=None,
+            )
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+            )
+
+    @property
+    def base(self) -> Embeddings:
+        if isinstance(self._base, Lazy):
+            return self._base.get()
+        return self._base
+
+    def cache_key(self, text: str) -> str:
+        payload = f"{self.model_name}\x00{normalize_text(text)}".encode("utf-8")
+        return hashlib.sha256(payload).hexdigest()
+
+    def _remember(self, key: str, vector: List[float]) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def _lookup(self, keys: List[str]) -> Dict[str, List[float]]:
+        found: Dict[str, List[float]] = {}
+        with self._lock:
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+            self.memory_hits += len(found)
+
+            pending = [key for key in dict.fromkeys(keys) if key not in found]
+            if pending and self._db is not None:
+                placeholders = ",".join("?" * len(pending))
+                rows = self._db.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    pending,
+                ).fetchall()
+                for key, blob in rows:
+                    vector = array("f", blob).tolist()
+                    found[key] = vector
+                    self._remember(key, vector)
+                self.disk_hits += len(rows)
+        return found
+
+    def _store(self, items: Dict[str, List[float]]) -> None:
+        with self._lock:
+            for key, vector in items.items():
+                self._remember(key, vector)
+            if self._db is not None and items:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                    [(key, array("f", vector).tobytes()) for key, vector in items.items()],
+                )
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with metrics.timed("embedding_ms"):
+            return self._embed_documents(texts)
+
+    def _embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self.cache_key(text) for text in texts]
+        found = self._lookup(keys)
+
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+
+        if missing:
+            with self._lock:
+                self.misses += len(missing)
+            vectors = self.base.embed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            self._store(computed)
+            found.update(computed)
+
+        return [found[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        with metrics.timed("embedding_ms"):
+            return self._embed_query(text)
+
+    def _embed_query(self, text: str) -> List[float]:
+        key = self.cache_key(text)
+        found = self._lookup([key])
+        if key in found:
+            return found[key]
+
+        with self._lock:
+            self.misses += 1
+        vector = self.base.embed_query(text)
+        self._store({key: vector})
+        return vector
+
+    def stats(self) -> Dict[str, int]:
+        """메모리/디스크 적중 수와 미스 수를 반환합니다."""
+        with self._lock:
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "memory_items": len(self._memory),
+            }
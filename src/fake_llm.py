@@ -0,0 +1,409 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from abc import abstractmethod
+from collections import deque
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult, LLMResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from src.tokens import estimate_tokens
+
+# 오프라인 LLM 제공자
+# - LLM_PROVIDER=fake   : 프롬프트로 역할을 판별해 결정적인 합성 응답(판결문, 승패, 비평 JSON 등)을 만듭니다.
+# - LLM_PROVIDER=replay : LLM_TRACE_PATH로 기록해 둔 실제 실행의 응답을 다시 돌려줍니다.
+# 두 제공자 모두 API 키와 네트워크 없이 그래프, 검색, Redis, 콘솔 출력의 성능을 측정하는 용도입니다.
+
+# 프롬프트에 포함된 문구로 체인(역할)을 구분합니다.
+ROLE_MARKERS = (
+    ("post_verdict", "재판을 복기하는 사후 분석가"),
+    ("lawyer", "대리하는 유능한 변호사"),
+    ("judge", "합의부의 서브 판사"),
+    ("presiding_judge", "재판을 총괄하는 재판장"),
+    ("batch_judge", "재판을 주재하는 판사"),
+    ("evaluation", "재판 분석가"),
+    ("reflection", "변론 전략 코치"),
+    ("summary", "토론 기록을 정리하는 서기"),
+    ("critic", "법률 분석가"),
+)
+
+_VERDICTS = (
+    ("승리", "주문: 원고의 청구를 인용한다. 피고는 원고에게 청구 금액 전액을 지급하라."),
+    ("패배", "주문: 원고의 청구를 기각한다. 소송비용은 원고가 부담한다."),
+    ("무승부", "주문: 원고의 청구를 일부 인용한다. 피고는 원고에게 청구 금액의 절반을 지급하라."),
+)
+
+
+def _message_text(messages: Sequence[BaseMessage]) -> str:
+    return "\n".join(
+        message.content if isinstance(message.content, str) else json.dumps(message.content, ensure_ascii=False)
+        for message in messages
+    )
+
+
+def detect_role(messages: Sequence[BaseMessage]) -> str:
+    text = _message_text(messages)
+    for role, marker in ROLE_MARKERS:
+        if marker in text:
+            return role
+    return "unknown"
+
+
+def _tool_names(tools: Optional[Sequence[Dict[str, Any]]]) -> List[str]:
+    return [tool.get("function", {}).get("name", "") for tool in tools or []]
+
+
+def _output_names(params: Dict[str, Any]) -> List[str]:
+    """
+    구조화 출력의 스키마 이름. 도구 호출 방식이면 도구 이름, json_schema 방식이면 response_format의 이름입니다.
+    두 방식 모두 스키마 이름이 같으므로 OpenAI(json_schema)로 기록한 호출을 오프라인 모델(도구 호출)로 재생할 수 있습니다.
+    """
+    if params.get("tools"):
+        return _tool_names(params["tools"])
+    response_format = params.get("response_format")
+    if response_format is None:
+        return []
+    if isinstance(response_format, dict):
+        schema = response_format.get("json_schema") or {}
+        return [schema.get("name") or response_format.get("type", "")]
+    return [getattr(response_format, "__name__", str(response_format))]
+
+
+def trace_key(messages: Sequence[BaseMessage], tool_names: Sequence[str] = ()) -> str:
+    """기록/재생에 쓰는 키: 메시지 종류와 내용, 구조화 출력 스키마(도구) 이름의 해시입니다."""
+    payload = json.dumps(
+        {"messages": [[message.type, message.content] for message in messages], "tools": list(tool_names)},
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _usage(messages: Sequence[BaseMessage], message: AIMessage) -> Dict[str, int]:
+    input_tokens = estimate_tokens(_message_text(messages))
+    output_text = message.content if isinstance(message.content, str) else ""
+    if message.tool_calls:
+        output_text += json.dumps([call["args"] for call in message.tool_calls], ensure_ascii=False)
+    output_tokens = estimate_tokens(output_text)
+    return {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+
+
+class _OfflineChatModel(BaseChatModel):
+    """fake/replay 제공자의 공통 부분: 도구 바인딩(구조화 출력)과 지연 시간 흉내."""
+
+    def bind_tools(self, tools: Sequence[Any], *, tool_choice: Optional[Any] = None, **kwargs: Any):
+        formatted = [convert_to_openai_tool(tool) for tool in tools]
+        return self.bind(tools=formatted, **kwargs)
+
+    @abstractmethod
+    def _respond(self, messages: List[BaseMessage], tools: Optional[List[Dict[str, Any]]]) -> AIMessage:
+        """메시지(와 바인딩된 도구)에 대한 응답을 만듭니다. 제공자별로 구현합니다."""
+
+    def _latency_seconds(self, messages: List[BaseMessage], message: AIMessage) -> float:
+        return 0.0
+
+    def _result(self, messages: List[BaseMessage], message: AIMessage) -> ChatResult:
+        if message.usage_metadata is None:
+            message.usage_metadata = _usage(messages, message)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        message = self._respond(messages, kwargs.get("tools"))
+        delay = self._latency_seconds(messages, message)
+        if delay > 0:
+            time.sleep(delay)
+        return self._result(messages, message)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        message = self._respond(messages, kwargs.get("tools"))
+        delay = self._latency_seconds(messages, message)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return self._result(messages, message)
+
+    # 스트리밍: 지연 시간의 20%를 첫 토큰까지의 시간으로, 나머지를 어절 단위 조각에 고르게 나눠 흉내 냅니다.
+    def _stream_plan(self, messages: List[BaseMessage], kwargs: Dict[str, Any]) -> Tuple[List[AIMessageChunk], float, float]:
+        message = self._respond(messages, kwargs.get("tools"))
+        delay = self._latency_seconds(messages, message)
+        usage = message.usage_metadata or _usage(messages, message)
+        if message.tool_calls or not message.content:
+            chunk = AIMessageChunk(
+                content=message.content,
+                tool_call_chunks=[
+                    {"name": call["name"], "args": json.dumps(call["args"], ensure_ascii=False), "id": call["id"], "index": i}
+                    for i, call in enumerate(message.tool_calls)
+                ],
+                usage_metadata=usage,
+            )
+            return [chunk], delay, 0.0
+        pieces = [piece + " " for piece in message.content.split(" ")]
+        pieces[-1] = pieces[-1][:-1]
+        chunks = [AIMessageChunk(content=piece) for piece in pieces]
+        chunks[-1].usage_metadata = usage
+        return chunks, delay * 0.2, delay * 0.8 / len(chunks)
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Any = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        chunks, first_delay, chunk_delay = self._stream_plan(messages, kwargs)
+        if first_delay > 0:
+            time.sleep(first_delay)
+        for i, chunk in enumerate(chunks):
+            if i and chunk_delay > 0:
+                time.sleep(chunk_delay)
+            if run_manager and isinstance(chunk.content, str):
+                run_manager.on_llm_new_token(chunk.content)
+            yield ChatGenerationChunk(message=chunk)
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Any = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        chunks, first_delay, chunk_delay = self._stream_plan(messages, kwargs)
+        if first_delay > 0:
+            await asyncio.sleep(first_delay)
+        for i, chunk in enumerate(chunks):
+            if i and chunk_delay > 0:
+                await asyncio.sleep(chunk_delay)
+            if run_manager and isinstance(chunk.content, str):
+                await run_manager.on_llm_new_token(chunk.content)
+            yield ChatGenerationChunk(message=chunk)
+
+
+class FakeCourtChatModel(_OfflineChatModel):
+    """
+    역할별로 그럴듯한 합성 응답을 돌려주는 오프라인 모델입니다.
+    같은 프롬프트에는 항상 같은 응답을 주며(seed 고정), latency_ms ± jitter_ms 만큼 지연합니다.
+    """
+
+    seed: int = 0
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-court"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"seed": self.seed}
+
+    def _rng(self, messages: Sequence[BaseMessage]) -> random.Random:
+        digest = hashlib.sha256(f"{self.seed}\x00{_message_text(messages)}".encode("utf-8")).digest()
+        return random.Random(int.from_bytes(digest[:8], "big"))
+
+    def _latency_seconds(self, messages: List[BaseMessage], message: AIMessage) -> float:
+        jitter = self._rng(messages).uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+        return max(0.0, self.latency_ms + jitter) / 1000
+
+    def _respond(self, messages: List[BaseMessage], tools: Optional[List[Dict[str, Any]]]) -> AIMessage:
+        rng = self._rng(messages)
+        if tools:
+            tool = tools[0]["function"]
+            args = _synthesize(tool.get("parameters", {}), rng)
+            if "plaintiff_outcome" in args:
+                # 사후 분석의 승패는 합성 판결문의 주문과 맞추고, 교훈은 회고 응답에서 고릅니다.
+                prompt = _message_text(messages)
+                args["plaintiff_outcome"] = self._text("evaluation", prompt.split("[원고측 변론 내용]")[0], rng)
+                args["plaintiff_lesson"] = self._text("reflection", prompt, rng)
+                args["defendant_lesson"] = self._text("reflection", prompt, rng)
+            return AIMessage(content="", tool_calls=[{"name": tool["name"], "args": args, "id": f"call_{uuid.uuid4().hex[:12]}"}])
+        return AIMessage(content=self._text(detect_role(messages), _message_text(messages), rng))
+
+    @staticmethod
+    def _text(role: str, prompt: str, rng: random.Random) -> str:
+        if role == "lawyer":
+            client = "원고" if "원고을(를) 대리" in prompt else "피고"
+            return (
+                f"존경하는 재판부, {client}측 대리인입니다. 상대방 주장의 핵심은 사실관계와 맞지 않습니다. "
+                f"사건 파일의 증거에 따르면 {client}의 책임은 제한적이며, 손해의 범위 또한 과장되어 있습니다. "
+                "따라서 재판부께서는 이 점을 고려하여 합리적인 판단을 내려 주시기 바랍니다."
+            )
+        if role == "judge":
+            return rng.choice((
+                "제출된 증거를 종합하면 원고의 주장이 더 설득력이 있다고 판단됩니다.",
+                "피고의 반박이 타당하며 원고의 청구는 근거가 부족하다고 봅니다.",
+                "양측 모두 일부 책임이 있으므로 손해를 나누어 부담하는 것이 공평합니다.",
+            ))
+        if role in ("presiding_judge", "batch_judge"):
+            return rng.choice(_VERDICTS)[1] + " 이유: 제출된 증거와 양측 주장을 종합하여 위와 같이 판단한다."
+        if role == "evaluation":
+            verdict = prompt.split("[최종 판결문]")[-1]
+            for outcome, text in _VERDICTS:
+                if text.split(".")[0] in verdict:
+                    return outcome
+            return rng.choice(("승리", "패배", "무승부"))
+        if role == "reflection":
+            return rng.choice((
+                "증거에 기반한 구체적인 반박이 재판부의 신뢰를 얻는 데 효과적이었다.",
+                "상대방 주장의 사실관계 오류를 초기에 지적하지 못한 것이 아쉬웠다.",
+                "책임을 전면 부인하기보다 손해 범위를 줄이는 전략이 유효했다.",
+            ))
+        if role == "summary":
+            previous = prompt.split("[기존 요약]")[-1].split("[새 발언]")[0].strip()
+            previous = "" if previous == "(없음)" else previous + " "
+            return previous + "양측은 사건 파일의 사실관계와 손해 범위를 두고 공방을 이어갔다."
+        if role == "critic":
+            return json.dumps({"evaluations": [
+                {"criteria": criteria, "score": rng.choice((0, 1)), "reason": "합성 평가 이유입니다."}
+                for criteria in ("논리적 일관성", "법률적 타당성", "사회적 가치 고려")
+            ]}, ensure_ascii=False)
+        return "합성 응답입니다."
+
+
+def _synthesize(schema: Dict[str, Any], rng: random.Random, position: Optional[int] = None) -> Any:
+    """JSON 스키마를 만족하는 결정적인 합성 값을 만듭니다 (구조화 출력 흉내)."""
+    if "enum" in schema:
+        values = schema["enum"]
+        # 배열 안의 문자열 enum(예: 평가 기준)은 항목마다 다른 값을 골라 모든 값을 한 번씩 채웁니다.
+        if position is not None and all(isinstance(value, str) for value in values):
+            return values[position % len(values)]
+        return rng.choice(values)
+    if "const" in schema:
+        return schema["const"]
+    if "anyOf" in schema:
+        return _synthesize(schema["anyOf"][0], rng, position)
+    schema_type = schema.get("type", "string")
+    if schema_type == "object":
+        properties = schema.get("properties", {})
+        return {name: _synthesize(prop, rng, position) for name, prop in properties.items()}
+    if schema_type == "array":
+        count = max(schema.get("minItems", 1), 1)
+        return [_synthesize(schema.get("items", {}), rng, i) for i in range(count)]
+    if schema_type == "integer":
+        return rng.randint(schema.get("minimum", 0), schema.get("maximum", 1))
+    if schema_type == "number":
+        return round(rng.uniform(schema.get("minimum", 0.0), schema.get("maximum", 1.0)), 3)
+    if schema_type == "boolean":
+        return rng.choice((True, False))
+    return "합성 응답입니다."
+
+
+class ReplayChatModel(_OfflineChatModel):
+    """
+    TraceRecorder가 남긴 JSONL 기록에서 같은 프롬프트의 응답을 찾아 돌려줍니다.
+    기록에 없는 프롬프트(무작위로 고른 판사 등)는 같은 역할의 기록을 순서대로 돌려쓰고,
+    miss_policy="error"이면 예외를 냅니다. latency는 "recorded"(기록된 지연) 또는 밀리초 값입니다.
+    """
+
+    trace_path: str
+    latency: str = "0"
+    miss_policy: str = "role"
+
+    _by_key: Dict[str, deque]
+    _by_role: Dict[str, List[Dict[str, Any]]]
+    _role_cursor: Dict[str, int]
+    _lock: Any
+
+    def __init__(self, **kwargs: Any):
+        super().__init__(**kwargs)
+        self._by_key, self._by_role, self._role_cursor = {}, {}, {}
+        self._lock = threading.Lock()
+        with open(self.trace_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                self._by_key.setdefault(record["key"], deque()).append(record)
+                self._by_role.setdefault(record.get("role", "unknown"), []).append(record)
+
+    @property
+    def _llm_type(self) -> str:
+        return "replay"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"trace_path": self.trace_path}
+
+    def _lookup(self, messages: List[BaseMessage], tools: Optional[List[Dict[str, Any]]]) -> Dict[str, Any]:
+        key = trace_key(messages, _tool_names(tools))
+        with self._lock:
+            queue = self._by_key.get(key)
+            if queue:
+                record = queue[0]
+                # 같은 프롬프트가 여러 번 기록되었다면 기록된 순서대로 돌아가며 사용합니다.
+                queue.rotate(-1)
+                return record
+            if self.miss_policy == "error":
+                raise KeyError(f"재생 기록에 없는 프롬프트입니다 (key={key[:12]}).")
+            role = detect_role(messages)
+            candidates = [
+                record for record in self._by_role.get(role, [])
+                if bool(record.get("tools")) == bool(tools)
+            ]
+            if not candidates:
+                raise KeyError(f"재생 기록에 '{role}' 역할의 응답이 없습니다.")
+            cursor = self._role_cursor.get(role, 0)
+            self._role_cursor[role] = cursor + 1
+            return candidates[cursor % len(candidates)]
+
+    def _respond(self, messages: List[BaseMessage], tools: Optional[List[Dict[str, Any]]]) -> AIMessage:
+        record = self._lookup(messages, tools)
+        message = messages_from_dict([record["response"]])[0]
+        content, tool_calls = message.content, getattr(message, "tool_calls", [])
+        if tools and not tool_calls:
+            # json_schema 방식으로 기록된 구조화 응답은 본문의 JSON을 도구 호출 인자로 바꿔 돌려줍니다.
+            tool_calls = [{"name": tools[0]["function"]["name"], "args": json.loads(content),
+                           "id": f"call_{uuid.uuid4().hex[:12]}"}]
+            content = ""
+        message = AIMessage(
+            content=content,
+            tool_calls=tool_calls,
+            usage_metadata=getattr(message, "usage_metadata", None),
+            additional_kwargs={"replay_latency_ms": record.get("latency_ms", 0.0)},
+        )
+        return message
+
+    def _latency_seconds(self, messages: List[BaseMessage], message: AIMessage) -> float:
+        if self.latency == "recorded":
+            return float(message.additional_kwargs.get("replay_latency_ms", 0.0)) / 1000
+        return float(self.latency) / 1000
+
+
+class TraceRecorder(BaseCallbackHandler):
+    """채팅 모델의 프롬프트와 응답을 JSONL로 기록합니다 (LLM_PROVIDER=replay의 입력)."""
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._pending: Dict[Any, Dict[str, Any]] = {}
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[BaseMessage]], *,
+                            run_id: Any, **kwargs: Any) -> None:
+        self._pending[run_id] = {
+            "messages": messages[0],
+            "tools": _output_names(kwargs.get("invocation_params") or {}),
+            "start": time.perf_counter(),
+        }
+
+    def on_llm_end(self, response: LLMResult, *, run_id: Any, **kwargs: Any) -> None:
+        pending = self._pending.pop(run_id, None)
+        if pending is None or not response.generations or not response.generations[0]:
+            return
+        generation = response.generations[0][0]
+        if not isinstance(generation, ChatGeneration):
+            return
+        record = {
+            "key": trace_key(pending["messages"], pending["tools"]),
+            "role": detect_role(pending["messages"]),
+            "tools": pending["tools"],
+            "latency_ms": round((time.perf_counter() - pending["start"]) * 1000, 1),
+            "prompt": _message_text(pending["messages"]),
+            "response": message_to_dict(generation.message),
+        }
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def on_llm_error(self, error: BaseException, *, run_id: Any, **kwargs: Any) -> None:
+        self._pending.pop(run_id, None)
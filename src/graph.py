@@ -1,14 +1,33 @@
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph, END
+from src.metrics import instrument_node
+from src.profiling import stage_function
 from src.state import TrialState
 from src.nodes import (
     start_trial,
     lawyer_debate_node,
+    alawyer_debate_node,
     associate_judge_deliberation_node,
+    aassociate_judge_deliberation_node,
     final_judgment_node,
+    afinal_judgment_node,
     update_knowledge_base_node,
+    aupdate_knowledge_base_node,
     critique_node,
+    acritique_node,
 )
 
+
+def _node(name, func, afunc=None):
+    # app.stream/invoke에서는 func, app.astream/ainvoke에서는 afunc가 실행됩니다.
+    # 노드 실행 시간과 노드 안의 LLM/임베딩/Redis/PostgreSQL 시간은 src.metrics로 집계됩니다.
+    # --profile 실행에서는 노드 이름이 프로파일 단계가 됩니다.
+    return RunnableLambda(
+        instrument_node(name, stage_function(name, func)),
+        afunc=instrument_node(name, stage_function(name, afunc)),
+        name=name,
+    )
+
 # 조건부 엣지를 위한 함수
 def should_continue_debate(state: TrialState):
     return "continue_debate" if state['turn_count'] < state['max_turns'] else "end_debate"
@@ -17,12 +36,16 @@ def should_continue_debate(state: TrialState):
 workflow = StateGraph(TrialState)
 
 # 노드 추가
-workflow.add_node("start_trial", start_trial)
-workflow.add_node("lawyer_debate", lawyer_debate_node)
-workflow.add_node("associate_judge_deliberation", associate_judge_deliberation_node)
-workflow.add_node("final_judgment", final_judgment_node)
-workflow.add_node("update_knowledge_base", update_knowledge_base_node)
-workflow.add_node("critique", critique_node)
+workflow.add_node("start_trial", _node("start_trial", start_trial))
+workflow.add_node("lawyer_debate", _node("lawyer_debate", lawyer_debate_node, alawyer_debate_node))
+workflow.add_node("associate_judge_deliberation", _node(
+    "associate_judge_deliberation", associate_judge_deliberation_node, aassociate_judge_deliberation_node
+))
+workflow.add_node("final_judgment", _node("final_judgment", final_judgment_node, afinal_judgment_node))
+workflow.add_node("update_knowledge_base", _node(
+    "update_knowledge_base", update_knowledge_base_node, aupdate_knowledge_base_node
+))
+workflow.add_node("critique", _node("critique", critique_node, acritique_node))
 
 # 엣지(흐름) 연결
 workflow.set_entry_point("start_trial")
@@ -38,4 +61,9 @@ workflow.add_edge("update_knowledge_base", "critique")
 workflow.add_edge("critique", END)
 
 # 그래프 컴파일
-app = workflow.compile()
\ No newline at end of file
+app = workflow.compile()
+
+
+def compile_graph(checkpointer=None):
+    """체크포인터(src.checkpoints)를 붙인 그래프. checkpointer가 없으면 기본 app을 그대로 씁니다."""
+    return app if checkpointer is None else workflow.compile(checkpointer=checkpointer)
\ No newline at end of file
@@ -0,0 +1,33 @@
+import threading
+from typing import Callable, Generic, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class Lazy(Generic[T]):
+    """첫 접근 시 한 번만 생성되는 스레드 안전 지연 초기화 객체입니다."""
+
+    def __init__(self, factory: Callable[[], T]):
+        self._factory = factory
+        self._lock = threading.Lock()
+        self._value: Optional[T] = None
+        self._loaded = False
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def get(self) -> T:
+        if self._loaded:
+            return self._value  # type: ignore[return-value]
+        with self._lock:
+            if not self._loaded:
+                self._value = self._factory()
+                self._loaded = True
+        return self._value  # type: ignore[return-value]
+
+    def reset(self) -> None:
+        """다음 get() 호출 때 객체를 다시 생성하도록 캐시를 비웁니다."""
+        with self._lock:
+            self._value = None
+            self._loaded = False
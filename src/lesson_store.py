@@ -0,0 +1,344 @@
+import base64
+import hashlib
+import os
+import threading
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+import src.namespace as namespace
+from src.embedding_cache import normalize_text
+from src.tokens import estimate_tokens
+from src.vector_db import get_embeddings
+
+# 변호사 교훈 저장소
+# - Redis 리스트 `{prefix}:successful_strategies` / `{prefix}:failed_strategies`가 원본입니다.
+# - 각 리스트 옆의 해시 `{리스트 키}:embeddings`에 교훈별 임베딩을 보관합니다 (원본에서 언제든 다시 계산 가능).
+# - 정리(compact) 후에는 `{리스트 키}:counts` 해시에 대표 교훈별로 합쳐진 교훈 수를 기록합니다.
+# - 체크포인트를 쓰는 재판은 교훈을 기록한 재판의 thread_id를 `{prefix}:recorded_trials` 집합에 남겨,
+#   이어서 실행한 재판이 같은 교훈을 다시 추가하지 않게 합니다 (체크포인트를 지우면 함께 지워집니다).
+# - 변론 시에는 현재 사건과 관련 높은 교훈만 top-k, 토큰 예산 안에서 골라 프롬프트에 넣습니다.
+LESSON_TOP_K = int(os.getenv("LESSON_TOP_K", "5"))
+LESSON_TOKEN_BUDGET = int(os.getenv("LESSON_TOKEN_BUDGET", "800"))
+LESSON_RETENTION_CAP = int(os.getenv("LESSON_RETENTION_CAP", "200"))
+LESSON_COMPACTION_THRESHOLD = float(os.getenv("LESSON_COMPACTION_THRESHOLD", "0.9"))
+
+LAWYER_KEY_PREFIXES = ("plaintiff_lawyer", "defendant_lawyer")
+
+LESSON_KINDS = ("successful_strategies", "failed_strategies")
+OUTCOME_TO_KIND = {"승리": "successful_strategies", "패배": "failed_strategies"}
+NO_LESSONS_MESSAGE = "아직 재판 경험이 없습니다."
+
+# 교훈이 기록될 때마다 증가하는 프로세스 내 세대 번호 (재판 컨텍스트 캐시 무효화용)
+_generation = 0
+_generation_lock = threading.Lock()
+
+
+def lesson_generation() -> int:
+    return _generation
+
+
+def bump_lesson_generation() -> None:
+    global _generation
+    with _generation_lock:
+        _generation += 1
+
+
+namespace.on_change(bump_lesson_generation)
+
+
+def lesson_key(db_key_prefix: str, kind: str) -> str:
+    """현재 실험 네임스페이스가 적용된 교훈 리스트 키를 반환합니다."""
+    return namespace.redis_key(f"{db_key_prefix}:{kind}")
+
+
+def embeddings_key(list_key: str) -> str:
+    return f"{list_key}:embeddings"
+
+
+def counts_key(list_key: str) -> str:
+    return f"{list_key}:counts"
+
+
+def recorded_trials_key(db_key_prefix: str) -> str:
+    return namespace.redis_key(f"{db_key_prefix}:recorded_trials")
+
+
+def lesson_hash(lesson: str) -> str:
+    return hashlib.sha1(normalize_text(lesson).encode("utf-8")).hexdigest()
+
+
+def _encode_vector(vector: Sequence[float]) -> str:
+    # Redis 클라이언트가 decode_responses=True이므로 float32 바이트를 base64 문자열로 저장합니다.
+    return base64.b64encode(np.asarray(vector, dtype=np.float32).tobytes()).decode("ascii")
+
+
+def _decode_vector(value: str) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(value), dtype=np.float32)
+
+
+def record_lesson(redis_client, db_key_prefix: str, outcome: str, lesson: str,
+                  retention_cap: Optional[int] = None, trial_id: Optional[str] = None) -> Optional[str]:
+    """
+    결과(승리/패배)에 맞는 리스트에 교훈을 추가하고 임베딩을 함께 저장합니다.
+    리스트는 최근 retention_cap개만 유지합니다. 저장한 리스트 키를 반환합니다 (무승부는 저장하지 않음).
+    trial_id(체크포인트 thread_id)가 주어지면 그 재판의 교훈은 한 번만 기록합니다. 기록 여부 집합을 WATCH하고
+    교훈 추가와 같은 트랜잭션에서 표시하므로, 이어서 실행한 재판이나 같은 재판의 동시 실행에서도 중복되거나 빠지지 않습니다.
+    """
+    from redis.exceptions import WatchError
+
+    kind = OUTCOME_TO_KIND.get(outcome)
+    if kind is None or not lesson:
+        return None
+    cap = retention_cap or LESSON_RETENTION_CAP
+    key = lesson_key(db_key_prefix, kind)
+    recorded_key = recorded_trials_key(db_key_prefix)
+    if trial_id and redis_client.sismember(recorded_key, trial_id):
+        return key
+    vector = get_embeddings().embed_documents([lesson])[0]
+
+    with redis_client.pipeline() as pipe:
+        while True:
+            try:
+                if trial_id:
+                    pipe.watch(recorded_key)
+                    if pipe.sismember(recorded_key, trial_id):
+                        pipe.unwatch()
+                        return key
+                pipe.multi()
+                pipe.rpush(key, lesson)
+                pipe.ltrim(key, -cap, -1)
+                pipe.hset(embeddings_key(key), lesson_hash(lesson), _encode_vector(vector))
+                if trial_id:
+                    pipe.sadd(recorded_key, trial_id)
+                pipe.hlen(embeddings_key(key))
+                *_, embedding_count = pipe.execute()
+                break
+            except WatchError:
+                continue
+    bump_lesson_generation()
+
+    # 잘려 나간 교훈의 임베딩은 해시가 리스트보다 충분히 커졌을 때 한꺼번에 정리합니다.
+    if embedding_count > cap * 1.5:
+        prune_embeddings(redis_client, key)
+    return key
+
+
+def forget_recorded_trials(redis_client, thread_prefix: str,
+                           db_key_prefixes: Sequence[str] = LAWYER_KEY_PREFIXES) -> int:
+    """thread_id가 thread_prefix로 시작하는 재판의 교훈 기록 표시를 지우고 지운 개수를 반환합니다."""
+    removed = 0
+    for prefix in db_key_prefixes:
+        recorded_key = recorded_trials_key(prefix)
+        stale = [trial for trial in redis_client.sscan_iter(recorded_key) if trial.startswith(thread_prefix)]
+        if stale:
+            removed += redis_client.srem(recorded_key, *stale)
+    return removed
+
+
+def prune_embeddings(redis_client, list_key: str) -> int:
+    """리스트에 더 이상 없는 교훈의 임베딩과 빈도를 삭제합니다. 삭제한 임베딩 개수를 반환합니다."""
+    live = {lesson_hash(lesson) for lesson in redis_client.lrange(list_key, 0, -1)}
+    stale = [h for h in redis_client.hkeys(embeddings_key(list_key)) if h not in live]
+    stale_counts = [h for h in redis_client.hkeys(counts_key(list_key)) if h not in live]
+    if stale:
+        redis_client.hdel(embeddings_key(list_key), *stale)
+    if stale_counts:
+        redis_client.hdel(counts_key(list_key), *stale_counts)
+    return len(stale)
+
+
+def _lesson_vectors(redis_client, list_key: str, lessons: List[str],
+                    stored: Dict[str, str]) -> Dict[str, np.ndarray]:
+    """저장된 임베딩을 읽고, 없는 교훈(이전 버전에서 쌓인 교훈 등)은 임베딩해 채워 둡니다."""
+    vectors = {h: _decode_vector(value) for h, value in stored.items()}
+    missing = {lesson_hash(lesson): lesson for lesson in lessons if lesson_hash(lesson) not in vectors}
+    if missing:
+        computed = get_embeddings().embed_documents(list(missing.values()))
+        backfill = {}
+        for h, vector in zip(missing, computed):
+            vectors[h] = np.asarray(vector, dtype=np.float32)
+            backfill[h] = _encode_vector(vector)
+        redis_client.hset(embeddings_key(list_key), mapping=backfill)
+    return vectors
+
+
+def select_lessons(candidates: List[Tuple[str, str, float]], top_k: int, token_budget: int) -> Dict[str, List[str]]:
+    """
+    (종류, 교훈, 점수) 후보를 점수 순으로 보며 종류별 top_k개, 전체 token_budget 이하로 고릅니다.
+    """
+    selected: Dict[str, List[str]] = {kind: [] for kind in LESSON_KINDS}
+    used = 0
+    for kind, lesson, _ in sorted(candidates, key=lambda item: item[2], reverse=True):
+        if len(selected[kind]) >= top_k:
+            continue
+        cost = estimate_tokens(lesson)
+        if used + cost > token_budget:
+            continue
+        selected[kind].append(lesson)
+        used += cost
+    return selected
+
+
+class RawLessons(NamedTuple):
+    """Redis에서 읽은 교훈 리스트 하나의 원본 데이터."""
+    lessons: List[str]
+    embeddings: Dict[str, str]
+    counts: Dict[str, str]
+
+
+def _with_count(lesson: str, count: int) -> str:
+    return f"{lesson} (유사 교훈 {count}회)" if count > 1 else lesson
+
+
+def rank_lessons(redis_client, db_key_prefix: str, query: str,
+                 raw: Optional[Dict[str, RawLessons]] = None,
+                 top_k: Optional[int] = None, token_budget: Optional[int] = None) -> Dict[str, List[str]]:
+    """
+    현재 사건(query)과 관련 높은 교훈을 종류별로 골라 반환합니다.
+    raw에 fetch_raw_lessons()의 결과를 넘기면 Redis를 다시 읽지 않습니다.
+    """
+    top_k = top_k or LESSON_TOP_K
+    token_budget = token_budget or LESSON_TOKEN_BUDGET
+    if raw is None:
+        raw = fetch_raw_lessons(redis_client, [db_key_prefix])[db_key_prefix]
+
+    if not any(entry.lessons for entry in raw.values()):
+        return {kind: [] for kind in LESSON_KINDS}
+
+    query_vector = np.asarray(get_embeddings().embed_query(query), dtype=np.float32)
+    query_vector /= np.linalg.norm(query_vector) or 1.0
+
+    candidates: List[Tuple[str, str, float]] = []
+    for kind, entry in raw.items():
+        # 같은 교훈이 여러 번 기록되었으면 한 번만 후보로 쓰고 빈도를 함께 표시합니다.
+        occurrences: Dict[str, int] = {}
+        for lesson in entry.lessons:
+            occurrences[lesson] = occurrences.get(lesson, 0) + 1
+        if not occurrences:
+            continue
+        vectors = _lesson_vectors(redis_client, lesson_key(db_key_prefix, kind), list(occurrences), entry.embeddings)
+        for lesson, seen in occurrences.items():
+            h = lesson_hash(lesson)
+            vector = vectors[h]
+            score = float(vector @ query_vector / (np.linalg.norm(vector) or 1.0))
+            # 정리된 교훈의 빈도는 리스트의 한 항목이 대표하고, 정리 후 다시 기록된 같은 교훈은 하나씩 더합니다.
+            count = int(entry.counts.get(h, 1)) + seen - 1
+            candidates.append((kind, _with_count(lesson, count), score))
+    return select_lessons(candidates, top_k, token_budget)
+
+
+def fetch_raw_lessons(redis_client, db_key_prefixes: Sequence[str]) -> Dict[str, Dict[str, RawLessons]]:
+    """여러 변호사의 교훈 리스트, 임베딩, 빈도를 한 번의 파이프라인으로 읽습니다."""
+    pipe = redis_client.pipeline(transaction=False)
+    order = []
+    for prefix in db_key_prefixes:
+        for kind in LESSON_KINDS:
+            key = lesson_key(prefix, kind)
+            pipe.lrange(key, 0, -1)
+            pipe.hgetall(embeddings_key(key))
+            pipe.hgetall(counts_key(key))
+            order.append((prefix, kind))
+    results = pipe.execute()
+
+    raw: Dict[str, Dict[str, RawLessons]] = {prefix: {} for prefix in db_key_prefixes}
+    for i, (prefix, kind) in enumerate(order):
+        raw[prefix][kind] = RawLessons(*results[3 * i:3 * i + 3])
+    return raw
+
+
+def _cluster(lessons: List[str], vectors: Dict[str, np.ndarray], counts: Dict[str, str],
+             threshold: float) -> List[Tuple[str, int]]:
+    """
+    최신 교훈부터 보며 대표 교훈과의 코사인 유사도가 threshold 이상이면 같은 묶음으로 합칩니다.
+    (대표 교훈, 묶음 빈도) 목록을 원래 리스트의 시간 순서로 반환합니다.
+    """
+    leaders: List[int] = []
+    leader_matrix = np.empty((0, 0), dtype=np.float32)
+    frequency: Dict[int, int] = {}
+    counted = set()
+    for i in range(len(lessons) - 1, -1, -1):
+        h = lesson_hash(lessons[i])
+        vector = vectors[h] / (np.linalg.norm(vectors[h]) or 1.0)
+        # 같은 교훈이 여러 번 있으면 정리된 빈도는 한 번만 더하고 나머지는 1씩 셉니다.
+        count = 1 if h in counted else int(counts.get(h, 1))
+        counted.add(h)
+        if leaders:
+            sims = leader_matrix @ vector
+            best = int(np.argmax(sims))
+            if sims[best] >= threshold:
+                frequency[leaders[best]] += count
+                continue
+        leaders.append(i)
+        frequency[i] = count
+        leader_matrix = vector[None, :] if leader_matrix.size == 0 else np.vstack([leader_matrix, vector])
+    return [(lessons[i], frequency[i]) for i in sorted(leaders)]
+
+
+def compact_lesson_list(redis_client, list_key: str, threshold: Optional[float] = None,
+                        dry_run: bool = False) -> Tuple[int, int]:
+    """
+    리스트 하나의 비슷한 교훈들을 대표 교훈 하나와 빈도로 합쳐 원자적으로 다시 씁니다.
+    WATCH로 감시하므로 정리 도중 새 교훈이 추가되면 처음부터 다시 계산합니다.
+    (정리 전 교훈 수, 정리 후 교훈 수)를 반환합니다.
+    """
+    from redis.exceptions import WatchError
+
+    threshold = threshold or LESSON_COMPACTION_THRESHOLD
+    with redis_client.pipeline() as pipe:
+        while True:
+            try:
+                pipe.watch(list_key, counts_key(list_key))
+                lessons = pipe.lrange(list_key, 0, -1)
+                counts = pipe.hgetall(counts_key(list_key))
+                stored = pipe.hgetall(embeddings_key(list_key))
+                if not lessons:
+                    pipe.unwatch()
+                    return 0, 0
+
+                vectors = _lesson_vectors(redis_client, list_key, list(dict.fromkeys(lessons)), stored)
+                clusters = _cluster(lessons, vectors, counts, threshold)
+                if dry_run:
+                    pipe.unwatch()
+                    return len(lessons), len(clusters)
+
+                kept = {lesson_hash(lesson) for lesson, _ in clusters}
+                stale = [h for h in vectors if h not in kept]
+                pipe.multi()
+                pipe.delete(list_key, counts_key(list_key))
+                pipe.rpush(list_key, *[lesson for lesson, _ in clusters])
+                frequencies = {lesson_hash(lesson): count for lesson, count in clusters if count > 1}
+                if frequencies:
+                    pipe.hset(counts_key(list_key), mapping=frequencies)
+                if stale:
+                    pipe.hdel(embeddings_key(list_key), *stale)
+                pipe.execute()
+                bump_lesson_generation()
+                return len(lessons), len(clusters)
+            except WatchError:
+                continue
+
+
+def compact_lessons(redis_client, threshold: Optional[float] = None, dry_run: bool = False,
+                    db_key_prefixes: Sequence[str] = LAWYER_KEY_PREFIXES) -> Dict[str, Tuple[int, int]]:
+    """모든 변호사의 성공/실패 전략 리스트를 정리하고 리스트별 (정리 전, 정리 후) 교훈 수를 반환합니다."""
+    return {
+        lesson_key(prefix, kind): compact_lesson_list(redis_client, lesson_key(prefix, kind), threshold, dry_run)
+        for prefix in db_key_prefixes
+        for kind in LESSON_KINDS
+    }
+
+
+def format_lessons(selected: Dict[str, List[str]]) -> str:
+    """변론 프롬프트의 past_lessons 형식으로 만듭니다."""
+    successful = "\n".join(selected.get("successful_strategies", []))
+    failed = "\n".join(selected.get("failed_strategies", []))
+    if not successful and not failed:
+        return NO_LESSONS_MESSAGE
+    return f"성공 전략:\n{successful}\n\n실패 전략:\n{failed}"
+
+
+def retrieve_lessons(redis_client, db_key_prefix: str, query: str,
+                     top_k: Optional[int] = None, token_budget: Optional[int] = None) -> str:
+    """현재 사건과 관련 높은 교훈을 예산 안에서 골라 프롬프트용 문자열로 반환합니다."""
+    return format_lessons(rank_lessons(redis_client, db_key_prefix, query, top_k=top_k, token_budget=token_budget))
@@ -0,0 +1,159 @@
+import math
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from typing import Dict, Iterable, List, Set, Tuple
+
+_TOKEN_PATTERN = re.compile(r"[가-힣]+|[0-9]+|[a-z]+")
+
+
+def extract_ngrams(text: str) -> Set[str]:
+    """
+    한국어 어절은 음절 bigram으로, 숫자(청구 금액 등)와 영문은 토큰 그대로 색인합니다.
+    형태소 분석기 없이도 '투자금', '부동산' 같은 반복 용어를 안정적으로 잡아냅니다.
+    """
+    normalized = unicodedata.normalize("NFC", text).lower()
+    grams: Set[str] = set()
+    for token in _TOKEN_PATTERN.findall(normalized):
+        if not ("가" <= token[0] <= "힣"):
+            grams.add(token)
+        elif len(token) == 1:
+            grams.add(token)
+        else:
+            grams.update(token[i:i + 2] for i in range(len(token) - 1))
+    return grams
+
+
+class LexicalIndex:
+    """
+    사건 아카이브와 함께 유지되는 n-gram 역색인(SQLite)입니다.
+    dense 검색 전에 후보 문서를 좁히는 prefilter로 사용합니다.
+    문서 비율 max_df_ratio를 넘게 등장하는 흔한 n-gram(청구취지, 청구원인 등)은 질의 시 제외하고,
+    남은 n-gram 중 드문 것부터 최대 max_query_grams개를 IDF 가중치로 점수를 매깁니다.
+    제외된 n-gram 수는 stats()로 확인할 수 있습니다.
+    """
+
+    def __init__(self, path: str, max_df_ratio: float = 0.3, max_query_grams: int = 64):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.max_df_ratio = max_df_ratio
+        self.max_query_grams = max_query_grams
+        self._lock = threading.Lock()
+        self._stats = {"queries": 0, "query_grams": 0, "common_grams": 0, "truncated_grams": 0, "empty_queries": 0}
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS docs (doc_id TEXT PRIMARY KEY);
+            CREATE TABLE IF NOT EXISTS postings (
+                gram TEXT NOT NULL,
+                doc_id TEXT NOT NULL,
+                PRIMARY KEY (gram, doc_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS ix_postings_doc_id ON postings (doc_id);
+            CREATE TABLE IF NOT EXISTS grams (gram TEXT PRIMARY KEY, df INTEGER NOT NULL) WITHOUT ROWID;
+            """
+        )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT count(*) FROM docs").fetchone()[0]
+
+    def _remove_locked(self, doc_ids: List[str]) -> None:
+        for doc_id in doc_ids:
+            grams = [row[0] for row in self._db.execute("SELECT gram FROM postings WHERE doc_id = ?", (doc_id,))]
+            if grams:
+                self._db.executemany("UPDATE grams SET df = df - 1 WHERE gram = ?", [(g,) for g in grams])
+                self._db.execute("DELETE FROM postings WHERE doc_id = ?", (doc_id,))
+            self._db.execute("DELETE FROM docs WHERE doc_id = ?", (doc_id,))
+
+    def add(self, items: Iterable[Tuple[str, str]]) -> None:
+        """(문서 id, 텍스트) 목록을 색인합니다. 이미 있는 id는 새 텍스트로 교체합니다."""
+        items = list(items)
+        if not items:
+            return
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                self._remove_locked([doc_id for doc_id, _ in items])
+                for doc_id, text in items:
+                    grams = extract_ngrams(text)
+                    self._db.execute("INSERT INTO docs (doc_id) VALUES (?)", (doc_id,))
+                    self._db.executemany(
+                        "INSERT INTO postings (gram, doc_id) VALUES (?, ?)",
+                        [(gram, doc_id) for gram in grams],
+                    )
+                    self._db.executemany(
+                        "INSERT INTO grams (gram, df) VALUES (?, 1) "
+                        "ON CONFLICT(gram) DO UPDATE SET df = df + 1",
+                        [(gram,) for gram in grams],
+                    )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def remove(self, doc_ids: Iterable[str]) -> None:
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                self._remove_locked(list(doc_ids))
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.executescript("DELETE FROM postings; DELETE FROM grams; DELETE FROM docs;")
+
+    def candidates(self, text: str, limit: int) -> List[str]:
+        """질의 텍스트와 드문 n-gram을 많이 공유하는 문서 id를 점수 순으로 최대 limit개 반환합니다."""
+        query_grams = list(extract_ngrams(text))
+        if not query_grams:
+            return []
+
+        with self._lock:
+            total_docs = self._db.execute("SELECT count(*) FROM docs").fetchone()[0]
+            if total_docs == 0:
+                return []
+
+            df: Dict[str, int] = {}
+            for start in range(0, len(query_grams), 500):
+                chunk = query_grams[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                df.update(self._db.execute(
+                    f"SELECT gram, df FROM grams WHERE gram IN ({placeholders}) AND df > 0", chunk
+                ).fetchall())
+
+            max_df = max(1, int(total_docs * self.max_df_ratio))
+            selected = sorted((g for g, d in df.items() if d <= max_df), key=lambda g: df[g])
+            self._stats["queries"] += 1
+            self._stats["query_grams"] += len(df)
+            self._stats["common_grams"] += len(df) - len(selected)
+            self._stats["truncated_grams"] += max(0, len(selected) - self.max_query_grams)
+            selected = selected[:self.max_query_grams]
+            if not selected:
+                self._stats["empty_queries"] += 1
+                return []
+
+            weights = {gram: math.log(1 + total_docs / df[gram]) for gram in selected}
+            placeholders = ",".join("?" * len(selected))
+            scores: Dict[str, float] = {}
+            for gram, doc_id in self._db.execute(
+                f"SELECT gram, doc_id FROM postings WHERE gram IN ({placeholders})", selected
+            ):
+                scores[doc_id] = scores.get(doc_id, 0.0) + weights[gram]
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return [doc_id for doc_id, _ in ranked[:limit]]
+
+    def stats(self) -> Dict[str, int]:
+        """
+        질의 통계. query_grams는 색인에 있는 질의 n-gram 수, common_grams는 max_df_ratio를 넘어 제외된 수,
+        truncated_grams는 max_query_grams를 넘어 잘린 수, empty_queries는 남은 n-gram이 없어 후보를 못 낸 질의 수입니다.
+        """
+        with self._lock:
+            return dict(self._stats)
@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+from langchain_core.caches import BaseCache
+from langchain_core.messages import message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, Generation
+
+
+# 캐시에서 꺼낸 응답의 generation_info에 표시하는 키 (노드별 계측에서 실제 호출로 세지 않기 위해 사용)
+FROM_CACHE_KEY = "from_cache"
+
+
+def _dump_generations(generations: Sequence[Generation]) -> str:
+    items: List[Dict[str, Any]] = []
+    for generation in generations:
+        if isinstance(generation, ChatGeneration):
+            items.append({"message": message_to_dict(generation.message),
+                          "generation_info": generation.generation_info})
+        else:
+            items.append({"text": generation.text, "generation_info": generation.generation_info})
+    return json.dumps(items, ensure_ascii=False)
+
+
+def _load_generations(payload: str) -> List[Generation]:
+    generations: List[Generation] = []
+    for item in json.loads(payload):
+        if "message" in item:
+            message = messages_from_dict([item["message"]])[0]
+            generations.append(ChatGeneration(message=message, generation_info=item.get("generation_info")))
+        else:
+            generations.append(Generation(text=item["text"], generation_info=item.get("generation_info")))
+    return generations
+
+
+class SQLiteLLMCache(BaseCache):
+    """
+    LLM 응답을 SQLite 파일에 저장하는 LangChain 캐시입니다.
+    키는 렌더링된 프롬프트와 llm_string(제공자, 모델 이름, temperature 등 호출 파라미터)의 SHA-256 해시이며,
+    전체 크기가 max_bytes를 넘으면 가장 오래 사용하지 않은 응답부터 삭제합니다.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 256 * 1024 * 1024):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS llm_responses (
+                key TEXT PRIMARY KEY,
+                llm_string TEXT NOT NULL,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS ix_llm_responses_last_access ON llm_responses (last_access)")
+        self._total_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM llm_responses").fetchone()[0]
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def cache_key(prompt: str, llm_string: str) -> str:
+        return hashlib.sha256(f"{llm_string}\x00{prompt}".encode("utf-8")).hexdigest()
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Generation]]:
+        key = self.cache_key(prompt, llm_string)
+        with self._lock:
+            row = self._db.execute("SELECT response FROM llm_responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._db.execute("UPDATE llm_responses SET last_access = ? WHERE key = ?", (time.time(), key))
+        generations = _load_generations(row[0])
+        for generation in generations:
+            generation.generation_info = {**(generation.generation_info or {}), FROM_CACHE_KEY: True}
+        return generations
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Generation]) -> None:
+        key = self.cache_key(prompt, llm_string)
+        payload = _dump_generations(return_val)
+        size = len(payload.encode("utf-8"))
+        with self._lock:
+            previous = self._db.execute("SELECT size FROM llm_responses WHERE key = ?", (key,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO llm_responses (key, llm_string, response, size, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, llm_string, payload, size, time.time()),
+            )
+            self._total_bytes += size - (previous[0] if previous else 0)
+            if self._total_bytes > self.max_bytes:
+                self._evict_locked()
+
+    def _evict_locked(self) -> None:
+        """전체 크기가 max_bytes의 90% 아래로 내려갈 때까지 오래된 응답부터 지웁니다."""
+        target = int(self.max_bytes * 0.9)
+        rows = self._db.execute("SELECT key, size FROM llm_responses ORDER BY last_access").fetchall()
+        doomed = []
+        for key, size in rows:
+            if self._total_bytes <= target:
+                break
+            doomed.append((key,))
+            self._total_bytes -= size
+        self._db.executemany("DELETE FROM llm_responses WHERE key = ?", doomed)
+        self.evictions += len(doomed)
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM llm_responses")
+            self._total_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._db.execute("SELECT count(*) FROM llm_responses").fetchone()[0]
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": entries,
+                "bytes": self._total_bytes,
+            }
@@ -0,0 +1,268 @@
+import json
+import os
+import shutil
+import threading
+import uuid
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+
+class LocalVectorStore:
+    """
+    PGVector 대신 사용할 수 있는 인프로세스 벡터 저장소입니다.
+    임베딩은 memory-mapped float32 행렬(vectors.f32)에, 문서와 메타데이터는
+    옆의 metadata.jsonl 파일에 저장합니다. 검색은 행렬-벡터 곱 한 번과 argpartition으로 끝납니다.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        collection_name: str,
+        root_dir: str,
+        embedding_length: int,
+    ):
+        self.embeddings = embeddings
+        self.collection_name = collection_name
+        self.embedding_length = embedding_length
+        self.collection_dir = os.path.join(root_dir, collection_name)
+        self._vectors_path = os.path.join(self.collection_dir, "vectors.f32")
+        self._metadata_path = os.path.join(self.collection_dir, "metadata.jsonl")
+        self._lock = threading.RLock()
+        self._matrix: Optional[np.ndarray] = None
+        self._records: List[Dict[str, Any]] = []
+        self._row_by_id: Dict[str, int] = {}
+        self._stamp: Optional[Tuple[int, int]] = None
+        self._needs_repair = False
+
+    # ------------------- 컬렉션 관리 -------------------
+    def create_collection(self) -> None:
+        with self._lock:
+            os.makedirs(self.collection_dir, exist_ok=True)
+            for path in (self._vectors_path, self._metadata_path):
+                if not os.path.exists(path):
+                    open(path, "ab").close()
+
+    def delete_collection(self) -> None:
+        with self._lock:
+            shutil.rmtree(self.collection_dir, ignore_errors=True)
+            self._matrix = None
+            self._records = []
+            self._row_by_id = {}
+            self._stamp = None
+            self._needs_repair = False
+
+    # ------------------- 내부 로딩 -------------------
+    def _row_count_on_disk(self) -> int:
+        if not os.path.exists(self._vectors_path):
+            return 0
+        return os.path.getsize(self._vectors_path) // (4 * self.embedding_length)
+
+    def _disk_stamp(self) -> Tuple[int, int]:
+        mtime = os.stat(self._metadata_path).st_mtime_ns if os.path.exists(self._metadata_path) else 0
+        return self._row_count_on_disk(), mtime
+
+    def _read_records(self) -> Tuple[List[Dict[str, Any]], bool]:
+        """메타데이터를 읽습니다. 쓰기 도중 잘린 마지막 줄은 버리고, 버린 줄이 있었는지 함께 반환합니다."""
+        records: List[Dict[str, Any]] = []
+        if not os.path.exists(self._metadata_path):
+            return records, False
+        with open(self._metadata_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    return records, True
+        return records, False
+
+    def _load(self) -> Tuple[Optional[np.ndarray], List[Dict[str, Any]]]:
+        """디스크의 행 수나 메타데이터 파일이 바뀌었을 때만 memmap과 메타데이터를 다시 읽습니다."""
+        with self._lock:
+            stamp = self._disk_stamp()
+            if self._matrix is not None and self._stamp == stamp:
+                return self._matrix, self._records
+            records, torn = self._read_records()
+
+            # 쓰기 도중 중단된 경우를 대비해 벡터와 메타데이터가 모두 있는 행까지만 사용합니다.
+            # 짝이 없는 행이 남아 있으면 다음 쓰기 전에 _repair()로 두 파일을 이 행 수에 맞춰 자릅니다.
+            rows = min(stamp[0], len(records))
+            vector_bytes = os.path.getsize(self._vectors_path) if os.path.exists(self._vectors_path) else 0
+            self._needs_repair = torn or len(records) != rows or vector_bytes != rows * 4 * self.embedding_length
+            self._stamp = stamp
+            self._records = records[:rows]
+            self._row_by_id = {record["id"]: row for row, record in enumerate(self._records)}
+            if rows == 0:
+                self._matrix = None
+            else:
+                self._matrix = np.memmap(
+                    self._vectors_path,
+                    dtype=np.float32,
+                    mode="r",
+                    shape=(rows, self.embedding_length),
+                )
+            return self._matrix, self._records
+
+    # ------------------- 쓰기 -------------------
+    @staticmethod
+    def _record(id_: str, text: str, metadata: Optional[dict]) -> Dict[str, Any]:
+        return {"id": id_, "document": text, "metadata": metadata or {}}
+
+    def _repair(self) -> None:
+        """중단된 쓰기가 남긴 짝 없는 벡터 행(잘린 행 포함)과 메타데이터 줄을 지워 두 파일의 행 수를 맞춥니다."""
+        rows = len(self._records)
+        with open(self._vectors_path, "r+b") as f:
+            f.truncate(rows * 4 * self.embedding_length)
+        self._write_metadata(self._records)
+        self._matrix = None
+        self._needs_repair = False
+
+    def _write_metadata(self, records: List[Dict[str, Any]]) -> None:
+        tmp_path = self._metadata_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, self._metadata_path)
+
+    def add_embeddings(
+        self,
+        texts: Sequence[str],
+        embeddings: List[List[float]],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        """
+        임베딩을 저장합니다. PGVector와 동일하게 이미 있는 id는 새 내용으로 덮어씁니다(upsert).
+        """
+        ids_ = [id_ or str(uuid.uuid4()) for id_ in (ids or [None] * len(texts))]
+        metadatas = metadatas or [{} for _ in texts]
+
+        matrix = np.asarray(embeddings, dtype=np.float32).reshape(len(texts), self.embedding_length)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = matrix / np.where(norms == 0, 1, norms)
+
+        # 같은 id가 여러 번 들어오면 마지막 값을 사용합니다.
+        latest: Dict[str, int] = {}
+        for i, id_ in enumerate(ids_):
+            latest[id_] = i
+
+        with self._lock:
+            self.create_collection()
+            _, records = self._load()
+            if self._needs_repair:
+                # 이어 쓰기 전에 잘라 두지 않으면 새 벡터가 남아 있던 행 뒤에 붙어 메타데이터와 어긋납니다.
+                self._repair()
+            row_by_id = self._row_by_id
+            updates = [(row_by_id[id_], i) for id_, i in latest.items() if id_ in row_by_id]
+            appends = [i for id_, i in latest.items() if id_ not in row_by_id]
+
+            row_bytes = 4 * self.embedding_length
+            if updates:
+                with open(self._vectors_path, "r+b") as f:
+                    for row, i in updates:
+                        f.seek(row * row_bytes)
+                        f.write(matrix[i].tobytes())
+            if appends:
+                with open(self._vectors_path, "ab") as f:
+                    f.write(matrix[appends].tobytes())
+
+            new_records = [self._record(ids_[i], texts[i], metadatas[i]) for i in appends]
+            if updates:
+                records = list(records)
+                for row, i in updates:
+                    records[row] = self._record(ids_[i], texts[i], metadatas[i])
+                self._write_metadata(records + new_records)
+            elif new_records:
+                with open(self._metadata_path, "a", encoding="utf-8") as f:
+                    for record in new_records:
+                        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._matrix = None
+        return ids_
+
+    def compact(self, keep: Dict[str, str]) -> int:
+        """
+        keep에 있는 id의 행만 남기고 파일을 다시 씁니다. keep은 {기존 id: 새 id} 형태이며
+        중복 정리 후 id를 바꿀 때 사용합니다. 남은 행 수를 반환합니다.
+        """
+        with self._lock:
+            matrix, records = self._load()
+            if matrix is None:
+                return 0
+            rows = [row for row, record in enumerate(records) if record["id"] in keep]
+            kept_matrix = np.asarray(matrix[rows], dtype=np.float32)
+            kept_records = [
+                {**records[row], "id": keep[records[row]["id"]]}
+                for row in rows
+            ]
+            self._matrix = None
+
+            tmp_path = self._vectors_path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(kept_matrix.tobytes())
+            os.replace(tmp_path, self._vectors_path)
+            self._write_metadata(kept_records)
+            return len(kept_records)
+
+    def add_documents(self, documents: List[Document], ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        texts = [doc.page_content for doc in documents]
+        vectors = self.embeddings.embed_documents(texts)
+        return self.add_embeddings(texts, vectors, [doc.metadata for doc in documents], ids)
+
+    # ------------------- 검색 -------------------
+    @staticmethod
+    def _top_k(
+        matrix: np.ndarray, rows: np.ndarray, records: List[Dict[str, Any]], embedding: List[float], k: int
+    ) -> List[Tuple[Document, float]]:
+        query = np.asarray(embedding, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        scores = matrix @ query
+
+        k = min(k, scores.shape[0])
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        # PGVector와 동일하게 코사인 거리(1 - 유사도)를 점수로 반환합니다.
+        return [
+            (
+                Document(page_content=records[rows[i]]["document"], metadata=records[rows[i]]["metadata"]),
+                float(1.0 - scores[i]),
+            )
+            for i in top
+        ]
+
+    def similarity_search_with_score_by_vector(
+        self, embedding: List[float], k: int = 4, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        matrix, records = self._load()
+        if matrix is None or k <= 0:
+            return []
+        return self._top_k(matrix, np.arange(matrix.shape[0]), records, embedding, k)
+
+    def similarity_search_with_score_by_ids(
+        self, embedding: List[float], ids: Sequence[str], k: int = 4
+    ) -> List[Tuple[Document, float]]:
+        """주어진 id의 문서들만 dense 점수로 정렬합니다 (하이브리드 검색의 후보 재정렬용)."""
+        with self._lock:
+            matrix, records = self._load()
+            row_by_id = self._row_by_id
+        if matrix is None or k <= 0:
+            return []
+        rows = np.asarray([row_by_id[id_] for id_ in ids if id_ in row_by_id], dtype=np.int64)
+        if rows.size == 0:
+            return []
+        return self._top_k(matrix[rows], rows, records, embedding, k)
+
+    def iter_documents(self) -> Iterator[Tuple[str, str, Dict[str, Any]]]:
+        """저장된 (id, 문서, 메타데이터)를 순서대로 반환합니다."""
+        with self._lock:
+            _, records = self._load()
+            records = list(records)
+        for record in records:
+            yield record["id"], record["document"], record["metadata"]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(self.embeddings.embed_query(query), k=k)
@@ -0,0 +1,266 @@
+import contextvars
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from src.llm_cache import FROM_CACHE_KEY
+
+# 재판 단위 계측
+# - benchmark.py가 재판마다 track_trial()로 TrialMetrics를 열고, 그래프의 각 노드는 instrument_node()로 감싸져
+#   실행 중인 노드 이름을 contextvar에 남깁니다.
+# - LLM(콜백), 임베딩, Redis, PostgreSQL 호출은 record()/timed()로 "현재 재판의 현재 노드"에 시간을 더합니다.
+#   재판 밖(main.py 등)에서는 아무것도 기록하지 않습니다.
+# - 동시 실행(asyncio 태스크, 스레드 풀)에서도 contextvar가 복사되므로 재판별로 섞이지 않습니다.
+
+# 노드별/재판별로 집계하는 값 (시간은 밀리초)
+METRIC_FIELDS = (
+    "wall_ms",
+    "llm_ms",
+    "llm_wait_ms",
+    "llm_calls",
+    "prompt_tokens",
+    "completion_tokens",
+    "cost_usd",
+    "embedding_ms",
+    "redis_ms",
+    "postgres_ms",
+)
+
+# 토큰 단가 (USD / 1K 토큰). 0이면 비용은 0으로 기록됩니다.
+LLM_PROMPT_PRICE_PER_1K = float(os.getenv("LLM_PROMPT_PRICE_PER_1K", "0"))
+LLM_COMPLETION_PRICE_PER_1K = float(os.getenv("LLM_COMPLETION_PRICE_PER_1K", "0"))
+
+# 노드 밖(그래프 실행 전후)에서 발생한 호출은 이 이름으로 집계합니다.
+OUTSIDE_NODE = "(trial)"
+
+
+class TrialMetrics:
+    """재판 한 건의 노드별 계측값입니다. 같은 노드가 여러 번 실행되면(변론 턴 등) 합산합니다."""
+
+    def __init__(self, case_id: Optional[str] = None):
+        self.case_id = case_id
+        self._lock = threading.Lock()
+        self.nodes: Dict[str, Dict[str, float]] = {}
+        self.node_runs: Dict[str, int] = {}
+        self.wall_ms = 0.0
+
+    def add(self, node: str, field: str, value: float) -> None:
+        with self._lock:
+            values = self.nodes.setdefault(node, dict.fromkeys(METRIC_FIELDS, 0))
+            values[field] += value
+
+    def count_run(self, node: str) -> None:
+        with self._lock:
+            self.node_runs[node] = self.node_runs.get(node, 0) + 1
+
+    def totals(self) -> Dict[str, float]:
+        """노드 합계. wall_ms는 노드 합이 아니라 재판 전체의 경과 시간입니다."""
+        with self._lock:
+            totals = dict.fromkeys(METRIC_FIELDS, 0)
+            for values in self.nodes.values():
+                for field in METRIC_FIELDS:
+                    totals[field] += values[field]
+        totals["wall_ms"] = self.wall_ms
+        return totals
+
+    def to_record(self) -> Dict[str, Any]:
+        """JSONL 트레이스 한 줄 (재판 합계 + 노드별 값)."""
+        with self._lock:
+            nodes = {
+                name: {"runs": self.node_runs.get(name, 0), **_rounded(values)}
+                for name, values in self.nodes.items()
+            }
+        return {"case_id": self.case_id, "total": _rounded(self.totals()), "nodes": nodes}
+
+
+def _rounded(values: Dict[str, float]) -> Dict[str, float]:
+    return {field: round(value, 6 if field == "cost_usd" else 1) for field, value in values.items()}
+
+
+_current_trial: contextvars.ContextVar[Optional[TrialMetrics]] = contextvars.ContextVar("trial_metrics", default=None)
+_current_node: contextvars.ContextVar[str] = contextvars.ContextVar("trial_node", default=OUTSIDE_NODE)
+
+# LLM 호출(run_id)별로 llm_ms에서 뺄 시간 (속도 제한 대기, 재시도 백오프)
+_excluded_lock = threading.Lock()
+_excluded_ms: Dict[UUID, float] = {}
+
+
+@contextmanager
+def track_trial(case_id: Optional[str] = None) -> Iterator[TrialMetrics]:
+    """이 블록 안에서 실행되는 재판의 계측값을 모읍니다."""
+    trial = TrialMetrics(case_id)
+    token = _current_trial.set(trial)
+    start = time.perf_counter()
+    try:
+        yield trial
+    finally:
+        trial.wall_ms = (time.perf_counter() - start) * 1000
+        _current_trial.reset(token)
+
+
+def record(field: str, value: float) -> None:
+    """현재 재판의 현재 노드에 값을 더합니다 (재판 밖이면 무시)."""
+    trial = _current_trial.get()
+    if trial is not None:
+        trial.add(_current_node.get(), field, value)
+
+
+@contextmanager
+def timed(field: str) -> Iterator[None]:
+    """블록 실행 시간을 밀리초로 record합니다."""
+    if _current_trial.get() is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(field, (time.perf_counter() - start) * 1000)
+
+
+def exclude_llm_time(run_id: Optional[UUID], ms: float) -> None:
+    """LLM 호출 run_id의 llm_ms에서 뺄 시간을 더합니다 (RateLimitedChatModel이 대기/백오프 시간을 알립니다)."""
+    if run_id is None or _current_trial.get() is None:
+        return
+    with _excluded_lock:
+        _excluded_ms[run_id] = _excluded_ms.get(run_id, 0.0) + ms
+
+
+def instrument_node(name: str, func):
+    """노드 함수(동기/비동기)를 감싸 실행 중인 노드 이름과 벽시계 시간을 기록합니다."""
+    if func is None:
+        return None
+
+    def _enter():
+        trial = _current_trial.get()
+        if trial is not None:
+            trial.count_run(name)
+        return _current_node.set(name), time.perf_counter()
+
+    def _exit(token, start):
+        record("wall_ms", (time.perf_counter() - start) * 1000)
+        _current_node.reset(token)
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            token, start = _enter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                _exit(token, start)
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        token, start = _enter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _exit(token, start)
+    return wrapper
+
+
+def _from_cache(response: LLMResult) -> bool:
+    """응답 캐시(src.llm_cache)에서 꺼낸 응답인지 확인합니다."""
+    generations = [generation for batch in response.generations for generation in batch]
+    return bool(generations) and all(
+        (generation.generation_info or {}).get(FROM_CACHE_KEY) for generation in generations
+    )
+
+
+def _token_usage(response: LLMResult) -> Dict[str, int]:
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                return {"prompt_tokens": usage.get("input_tokens", 0), "completion_tokens": usage.get("output_tokens", 0)}
+    usage = (response.llm_output or {}).get("token_usage") or {}
+    return {"prompt_tokens": usage.get("prompt_tokens", 0), "completion_tokens": usage.get("completion_tokens", 0)}
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """
+    LLM 호출마다 소요 시간과 토큰 사용량을 호출이 시작된 재판/노드에 기록합니다.
+    llm_ms에서는 속도 제한 대기와 재시도 백오프(llm_wait_ms)를 빼고, 캐시 적중은 호출로 세지 않습니다.
+    """
+
+    run_inline = True
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._starts: Dict[UUID, tuple] = {}
+
+    def _start(self, run_id: UUID) -> None:
+        trial = _current_trial.get()
+        if trial is None:
+            return
+        with self._lock:
+            self._starts[run_id] = (trial, _current_node.get(), time.perf_counter())
+
+    def _finish(self, run_id: UUID, usage: Optional[Dict[str, int]], cached: bool = False) -> None:
+        with self._lock:
+            started = self._starts.pop(run_id, None)
+        with _excluded_lock:
+            excluded = _excluded_ms.pop(run_id, 0.0)
+        if started is None or cached:
+            return
+        trial, node, start = started
+        trial.add(node, "llm_ms", max(0.0, (time.perf_counter() - start) * 1000 - excluded))
+        trial.add(node, "llm_calls", 1)
+        if usage:
+            trial.add(node, "prompt_tokens", usage["prompt_tokens"])
+            trial.add(node, "completion_tokens", usage["completion_tokens"])
+            trial.add(node, "cost_usd", (
+                usage["prompt_tokens"] * LLM_PROMPT_PRICE_PER_1K
+                + usage["completion_tokens"] * LLM_COMPLETION_PRICE_PER_1K
+            ) / 1000)
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], *, run_id: UUID, **kwargs: Any) -> None:
+        self._start(run_id)
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], *, run_id: UUID, **kwargs: Any) -> None:
+        self._start(run_id)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish(run_id, _token_usage(response), _from_cache(response))
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish(run_id, None)
+
+
+def summarize_nodes(trials: Iterable[TrialMetrics]) -> Dict[str, Dict[str, float]]:
+    """여러 재판의 노드별 계측값을 합산합니다 (runs 포함)."""
+    summary: Dict[str, Dict[str, float]] = {}
+    for trial in trials:
+        for name, values in trial.to_record()["nodes"].items():
+            target = summary.setdefault(name, dict.fromkeys(("runs",) + METRIC_FIELDS, 0))
+            for field, value in values.items():
+                target[field] += value
+    return summary
+
+
+class MetricsTraceWriter:
+    """재판별 계측값을 JSONL 파일에 한 줄씩 씁니다."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "w", encoding="utf-8")
+
+    def write(self, trial: TrialMetrics) -> None:
+        with self._lock:
+            self._file.write(json.dumps(trial.to_record(), ensure_ascii=False) + "\n")
+            self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
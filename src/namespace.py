@@ -0,0 +1,92 @@
+import os
+import re
+from typing import Callable, List
+
+# 실험 네임스페이스
+# EXPERIMENT_ID(또는 각 스크립트의 --experiment)를 지정하면 Redis 키 앞에 `{실험 id}:`가 붙고
+# 사건 아카이브도 실험 전용 컬렉션(`agent_court_cases__{실험 id}`)을 사용합니다.
+# 지정하지 않으면 기존과 같은 키/컬렉션(기본 네임스페이스)을 그대로 사용합니다.
+_EXPERIMENT_PATTERN = re.compile(r"^[A-Za-z0-9_]{1,48}$")
+# 기본 네임스페이스의 Redis 키 패턴 (초기화 시 이 패턴만 삭제합니다)
+DEFAULT_NAMESPACE_PATTERNS = ("plaintiff_lawyer:*", "defendant_lawyer:*")
+# 기본 네임스페이스의 키 접두사와 같은 실험 id는 기본 네임스페이스와 키가 겹치므로 쓸 수 없습니다.
+# ("default"는 기본 네임스페이스의 재판 체크포인트 thread_id 접두사입니다.)
+RESERVED_EXPERIMENT_IDS = tuple(pattern.split(":")[0] for pattern in DEFAULT_NAMESPACE_PATTERNS) + ("default",)
+
+_experiment_id = ""
+_listeners: List[Callable[[], None]] = []
+
+
+def _validate(experiment_id: str) -> str:
+    if experiment_id and not _EXPERIMENT_PATTERN.match(experiment_id):
+        raise ValueError("실험 id는 영문, 숫자, '_'로 된 48자 이하 문자열이어야 합니다.")
+    if experiment_id.lower() in RESERVED_EXPERIMENT_IDS:
+        raise ValueError(
+            f"실험 id '{experiment_id}'는 기본 네임스페이스의 키와 겹치므로 쓸 수 없습니다 "
+            f"(사용할 수 없는 id: {', '.join(RESERVED_EXPERIMENT_IDS)})."
+        )
+    return experiment_id
+
+
+def experiment_id() -> str:
+    return _experiment_id
+
+
+def set_experiment(experiment_id: str) -> None:
+    """
+    현재 프로세스의 실험 네임스페이스를 바꿉니다.
+    컬렉션에 묶인 클라이언트(벡터 저장소, n-gram 역색인 등)는 다음 사용 시 새 네임스페이스로 다시 만들어집니다.
+    """
+    global _experiment_id
+    experiment_id = _validate(experiment_id or "")
+    if experiment_id == _experiment_id:
+        return
+    _experiment_id = experiment_id
+    for listener in _listeners:
+        listener()
+
+
+def on_change(listener: Callable[[], None]) -> None:
+    """네임스페이스가 바뀔 때 호출할 함수를 등록합니다."""
+    _listeners.append(listener)
+
+
+def add_experiment_argument(parser) -> None:
+    """스크립트의 argparse에 --experiment 옵션을 추가합니다 (기본값: EXPERIMENT_ID)."""
+    parser.add_argument(
+        "--experiment",
+        default=os.getenv("EXPERIMENT_ID", ""),
+        help="실험 네임스페이스 id. Redis 키와 사건 아카이브 컬렉션을 실험별로 분리합니다.",
+    )
+
+
+def redis_key(key: str) -> str:
+    """현재 네임스페이스가 적용된 Redis 키를 반환합니다."""
+    return f"{_experiment_id}:{key}" if _experiment_id else key
+
+
+def collection_name(base: str) -> str:
+    """현재 네임스페이스의 사건 아카이브 컬렉션 이름을 반환합니다."""
+    return f"{base}__{_experiment_id}" if _experiment_id else base
+
+
+def delete_redis_namespace(redis_client, batch_size: int = 500) -> int:
+    """
+    현재 네임스페이스의 Redis 키만 SCAN으로 찾아 UNLINK로 지웁니다 (flushall 대신 사용).
+    다른 실험의 키는 건드리지 않습니다. 삭제한 키 수를 반환합니다.
+    """
+    patterns = [f"{_experiment_id}:*"] if _experiment_id else list(DEFAULT_NAMESPACE_PATTERNS)
+    deleted = 0
+    for pattern in patterns:
+        batch: List[str] = []
+        for key in redis_client.scan_iter(match=pattern, count=batch_size):
+            batch.append(key)
+            if len(batch) >= batch_size:
+                deleted += redis_client.unlink(*batch)
+                batch = []
+        if batch:
+            deleted += redis_client.unlink(*batch)
+    return deleted
+
+
+set_experiment(os.getenv("EXPERIMENT_ID", ""))
@@ -1,176 +1,342 @@
+import asyncio
+import os
 import random
-from typing import Any, Dict, Optional
+from functools import partial
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.runnables import RunnableConfig
 
 from src.state import TrialState
 import src.console as console
-from src.agents import (
-    redis_client,
-    JUDGE_PERSONALITY_POOL,
-    lawyer_chain,
-    judge_chain,
-    presiding_judge_chain,
-    evaluation_chain,
-    reflection_chain,
-    critic_chain,
-    CRITIQUE_CRITERIA
+# LLM/Redis 클라이언트는 노드가 실행될 때 지연 생성되도록 모듈 단위로 참조합니다.
+import src.agents as agents
+from src.agents import JUDGE_PERSONALITY_POOL, CRITIQUE_CRITERIA
+from src.lesson_store import record_lesson
+from src.transcript import (
+    append_speech,
+    fold_summary,
+    new_transcript,
+    render_transcript,
+    summary_inputs,
+    turns_to_summarize,
 )
-from src.vector_db import add_case_to_db, search_similar_cases
+from src.trial_context import get_trial_context, trial_context_cache
+from src.vector_db import aadd_case_to_db, add_case_to_db
+from src.verdict_analysis import VerdictAnalysis, aanalyze_verdict, analyze_verdict, opposite_outcome
+
+# 서브 판사 심의를 동시에 요청할 최대 개수 (1이면 순차 실행과 같습니다)
+JUDGE_MAX_CONCURRENCY = int(os.getenv("JUDGE_MAX_CONCURRENCY", "3"))
+# 변호사 토론 턴 수 (원고/피고가 번갈아 발언)
+DEBATE_MAX_TURNS = int(os.getenv("DEBATE_MAX_TURNS", "4"))
+
+# 각 노드는 동기 버전(app.stream/invoke)과 비동기 버전(app.astream/ainvoke)을 함께 제공합니다.
+# 입력 준비와 결과 기록은 공통 함수로 두고, LLM/DB 호출 부분만 동기/비동기로 나뉩니다.
+
+
+def _transcript_str(state: TrialState) -> str:
+    # 매 호출마다 전체 기록을 다시 잇지 않고, 발언마다 갱신해 둔 요약본 + 최근 턴을 사용합니다.
+    return render_transcript(state['transcript'])
+
+
+def _chunk_text(chunk) -> str:
+    return chunk.content if isinstance(chunk.content, str) else ""
+
+
+def _generate_text(chain_name: str, inputs: Dict[str, str], stream_panel, print_panel) -> str:
+    """
+    체인의 응답 텍스트를 만들고 콘솔에 표시합니다.
+    스트리밍이 켜져 있으면 토큰이 도착하는 대로 Live 패널에 그리고, 꺼져 있으면 완성된 응답을 한 번에 출력합니다.
+    (스트리밍 호출은 LLM 응답 캐시를 거치지 않으므로 대화형 실행에서만 켭니다.)
+    """
+    chain = agents.get_chain(chain_name)
+    if console.streaming:
+        return stream_panel(_chunk_text(chunk) for chunk in chain.stream(inputs))
+    text = chain.invoke(inputs).content
+    print_panel(text)
+    return text
+
+
+async def _agenerate_text(chain_name: str, inputs: Dict[str, str], astream_panel, print_panel) -> str:
+    chain = agents.get_chain(chain_name)
+    if console.streaming:
+        return await astream_panel(_chunk_text(chunk) async for chunk in chain.astream(inputs))
+    text = (await chain.ainvoke(inputs)).content
+    print_panel(text)
+    return text
+
 
 def start_trial(state: TrialState):
     """재판 시작: 초기 설정 및 서브 판사 3명 무작위 선택"""
     console.print_header("모의 법정 시뮬레이션을 시작합니다")
-    state['max_turns'] = 4
+    state['max_turns'] = DEBATE_MAX_TURNS
     state['turn_count'] = 0
     state['debate_transcript'] = []
-    
+    state['transcript'] = new_transcript()
+    # 다른 프로세스가 그 사이 기록했을 수 있으므로 재판마다 검색 결과를 새로 만듭니다.
+    trial_context_cache.invalidate(state['case_file'])
+
     selected_judges = random.sample(JUDGE_PERSONALITY_POOL, 3)
     state['selected_judges'] = selected_judges
-    
+
     console.print_judge_panel(selected_judges)
     return state
 
-def lawyer_debate_node(state: TrialState):
-    """변호사 토론: 유사 사건 검색 및 개인 DB를 바탕으로 변론"""
+# ------------------- 변호사 토론 -------------------
+def _begin_debate_turn(state: TrialState) -> Tuple[str, str, str]:
+    """이번 턴의 (발언자, 의뢰인 구분, 개인 DB 키 접두어)를 정합니다."""
     turn = state['turn_count'] + 1
     console.print_turn_header(turn)
-    
-    transcript_str = "\n".join(
-        [f"{msg['agent_name']}: {msg['speech']}" for msg in state['debate_transcript']]
-    )
 
     if state['turn_count'] % 2 == 0:
-        speaker_name = state['plaintiff_lawyer']
-        client_type = "원고"
-        db_key_prefix = "plaintiff_lawyer"
-    else:
-        speaker_name = state['defendant_lawyer']
-        client_type = "피고"
-        db_key_prefix = "defendant_lawyer"
-    
-    similar_cases_str = search_similar_cases(state['case_file'])
-    
-    successful_lessons = "\n".join(redis_client.lrange(f"{db_key_prefix}:successful_strategies", 0, -1))
-    failed_lessons = "\n".join(redis_client.lrange(f"{db_key_prefix}:failed_strategies", 0, -1))
-    past_lessons_str = f"성공 전략:\n{successful_lessons}\n\n실패 전략:\n{failed_lessons}"
-    
-    if not successful_lessons and not failed_lessons:
-        past_lessons_str = "아직 재판 경험이 없습니다."
-        
-    response_ai = lawyer_chain.invoke({
+        return state['plaintiff_lawyer'], "원고", "plaintiff_lawyer"
+    return state['defendant_lawyer'], "피고", "defendant_lawyer"
+
+
+def _lawyer_inputs(state: TrialState, client_type: str, db_key_prefix: str, context) -> Dict[str, str]:
+    return {
         "client_type": client_type,
         "case_file": state['case_file'],
-        "transcript": transcript_str,
-        "past_lessons": past_lessons_str,
-        "similar_cases": similar_cases_str
-    })
-    response = response_ai.content
-        
-    console.print_speech(speaker_name, response)
+        "transcript": _transcript_str(state),
+        "past_lessons": context.lessons[db_key_prefix],
+        "similar_cases": context.similar_cases
+    }
+
+
+def _record_speech(state: TrialState, speaker_name: str, response: str) -> TrialState:
     state['debate_transcript'].append({"agent_name": speaker_name, "speech": response})
+    append_speech(state['transcript'], speaker_name, response)
     state['turn_count'] += 1
     return state
 
-def associate_judge_deliberation_node(state: TrialState):
-    """서브 판사 심의: 실제 LLM을 호출하여 페르소나 기반 판결"""
-    console.print_verdict_header("서브 판사 심의")
-    
-    transcript_str = "\n".join(
-        [f"{msg['agent_name']}: {msg['speech']}" for msg in state['debate_transcript']]
+
+def _summarize_transcript(state: TrialState) -> TrialState:
+    """원문 턴이 토큰 임계치를 넘으면 오래된 턴을 요약본에 접어 넣습니다. 요약본은 다음 노드들이 재사용합니다."""
+    count = turns_to_summarize(state['transcript'])
+    if count:
+        response_ai = agents.get_chain("transcript_summary_chain").invoke(summary_inputs(state['transcript'], count))
+        fold_summary(state['transcript'], count, response_ai.content.strip())
+    return state
+
+
+async def _asummarize_transcript(state: TrialState) -> TrialState:
+    count = turns_to_summarize(state['transcript'])
+    if count:
+        response_ai = await agents.get_chain("transcript_summary_chain").ainvoke(
+            summary_inputs(state['transcript'], count)
+        )
+        fold_summary(state['transcript'], count, response_ai.content.strip())
+    return state
+
+
+def lawyer_debate_node(state: TrialState):
+    """변호사 토론: 유사 사건 검색 및 개인 DB를 바탕으로 변론"""
+    speaker_name, client_type, db_key_prefix = _begin_debate_turn(state)
+
+    # 유사 사건과 양측 교훈은 재판 중 바뀌지 않으므로 첫 턴에 한 번만 조회하고 이후 턴은 재사용합니다.
+    # 교훈은 쌓인 전체가 아니라 현재 사건과 관련 높은 것만 토큰 예산 안에서 고릅니다.
+    context = get_trial_context(agents.get_redis_client(), state['case_file'])
+
+    speech = _generate_text(
+        "lawyer_chain",
+        _lawyer_inputs(state, client_type, db_key_prefix, context),
+        partial(console.stream_speech, speaker_name),
+        partial(console.print_speech, speaker_name),
     )
-    
-    verdicts = []
-    for i, judge_info in enumerate(state['selected_judges']):
-        judge_name = judge_info['name']
-        judge_description = judge_info['description']
-        
-        response_ai = judge_chain.invoke({
-            "judge_name": judge_name,
-            "judge_description": judge_description,
+    return _summarize_transcript(_record_speech(state, speaker_name, speech))
+
+
+async def alawyer_debate_node(state: TrialState):
+    """lawyer_debate_node의 비동기 버전입니다."""
+    speaker_name, client_type, db_key_prefix = _begin_debate_turn(state)
+    context = await asyncio.to_thread(get_trial_context, agents.get_redis_client(), state['case_file'])
+
+    speech = await _agenerate_text(
+        "lawyer_chain",
+        _lawyer_inputs(state, client_type, db_key_prefix, context),
+        partial(console.astream_speech, speaker_name),
+        partial(console.print_speech, speaker_name),
+    )
+    return await _asummarize_transcript(_record_speech(state, speaker_name, speech))
+
+# ------------------- 서브 판사 심의 -------------------
+def _judge_inputs(state: TrialState) -> List[Dict[str, str]]:
+    console.print_verdict_header("서브 판사 심의")
+    transcript_str = _transcript_str(state)
+    return [
+        {
+            "judge_name": judge_info['name'],
+            "judge_description": judge_info['description'],
             "transcript": transcript_str
-        })
+        }
+        for judge_info in state['selected_judges']
+    ]
+
+
+def _record_judge_verdicts(state: TrialState, judge_inputs: List[Dict[str, str]], responses) -> TrialState:
+    verdicts = []
+    for judge_input, response_ai in zip(judge_inputs, responses):
+        judge_name = judge_input['judge_name']
         verdict = response_ai.content
-        
+
         console.print_speech(judge_name, verdict)
         verdicts.append({"agent_name": judge_name, "speech": verdict})
-    
+
     state['associate_judge_verdicts'] = verdicts
     return state
 
-def final_judgment_node(state: TrialState):
-    """최종 판결: 재판장 LLM이 모든 내용을 종합하여 판결문 생성"""
-    console.print_verdict_header("최종 판결 선고")
-    
-    transcript_str = "\n".join(
-        [f"{msg['agent_name']}: {msg['speech']}" for msg in state['debate_transcript']]
+
+def associate_judge_deliberation_node(state: TrialState):
+    """서브 판사 심의: 실제 LLM을 호출하여 페르소나 기반 판결"""
+    # 서브 판사들의 심의는 서로 독립적이므로 동시에 요청하고, 출력은 선정 순서대로 합니다.
+    judge_inputs = _judge_inputs(state)
+    responses = agents.get_chain("judge_chain").batch(
+        judge_inputs, config={"max_concurrency": JUDGE_MAX_CONCURRENCY}
     )
+    return _record_judge_verdicts(state, judge_inputs, responses)
+
+
+async def aassociate_judge_deliberation_node(state: TrialState):
+    """associate_judge_deliberation_node의 비동기 버전입니다."""
+    judge_inputs = _judge_inputs(state)
+    responses = await agents.get_chain("judge_chain").abatch(
+        judge_inputs, config={"max_concurrency": JUDGE_MAX_CONCURRENCY}
+    )
+    return _record_judge_verdicts(state, judge_inputs, responses)
+
+# ------------------- 최종 판결 -------------------
+def _final_judgment_inputs(state: TrialState) -> Dict[str, str]:
+    console.print_verdict_header("최종 판결 선고")
     judge_verdicts_str = "\n\n".join(
         [f"[{msg['agent_name']}의 의견]\n{msg['speech']}" for msg in state['associate_judge_verdicts']]
     )
-    
-    response_ai = presiding_judge_chain.invoke({
-        "transcript": transcript_str,
+    return {
+        "transcript": _transcript_str(state),
         "judge_verdicts": judge_verdicts_str
-    })
-    final_verdict = response_ai.content
-    
-    console.print_final_verdict(final_verdict)
+    }
+
+
+def _record_final_verdict(state: TrialState, final_verdict: str) -> TrialState:
     state['final_verdict'] = final_verdict
     return state
 
-def update_knowledge_base_node(state: TrialState):
-    """변호사 DB 업데이트 및 이번 사건을 벡터 DB에 저장"""
-    console.print_update_header()
-    
-    evaluation_response = evaluation_chain.invoke({"final_verdict": state['final_verdict']})
-    plaintiff_outcome = evaluation_response.content.strip()
-    state['plaintiff_outcome'] = plaintiff_outcome
-    console.console.print(f"분석 결과: 원고측 '{plaintiff_outcome}'\n")
+
+def final_judgment_node(state: TrialState):
+    """최종 판결: 재판장 LLM이 모든 내용을 종합하여 판결문 생성"""
+    final_verdict = _generate_text(
+        "presiding_judge_chain",
+        _final_judgment_inputs(state),
+        console.stream_final_verdict,
+        console.print_final_verdict,
+    )
+    return _record_final_verdict(state, final_verdict)
+
+
+async def afinal_judgment_node(state: TrialState):
+    """final_judgment_node의 비동기 버전입니다."""
+    final_verdict = await _agenerate_text(
+        "presiding_judge_chain",
+        _final_judgment_inputs(state),
+        console.astream_final_verdict,
+        console.print_final_verdict,
+    )
+    return _record_final_verdict(state, final_verdict)
+
+# ------------------- 지식 베이스 업데이트 -------------------
+def _lawyer_speeches(state: TrialState, lawyer_name: str) -> str:
+    return "\n".join([s['speech'] for s in state['debate_transcript'] if s['agent_name'] == lawyer_name])
+
+
+def _analysis_inputs(state: TrialState) -> Tuple[str, str, str]:
+    return (
+        state['final_verdict'],
+        _lawyer_speeches(state, state['plaintiff_lawyer']),
+        _lawyer_speeches(state, state['defendant_lawyer']),
+    )
+
+
+def _record_analysis(state: TrialState, analysis: VerdictAnalysis) -> Dict[str, Dict[str, str]]:
+    """원고측 결과를 기록하고 양측 변호사의 (결과, DB 키 접두어, 교훈) 정보를 만듭니다."""
+    state['plaintiff_outcome'] = analysis.plaintiff_outcome
+    console.console.print(f"분석 결과: 원고측 '{analysis.plaintiff_outcome}'\n")
 
     outcomes = {
-        state['plaintiff_lawyer']: {"outcome": plaintiff_outcome, "db_key_prefix": "plaintiff_lawyer"},
+        state['plaintiff_lawyer']: {
+            "outcome": analysis.plaintiff_outcome,
+            "db_key_prefix": "plaintiff_lawyer",
+            "lesson": analysis.plaintiff_lesson,
+        },
         state['defendant_lawyer']: {
-            "outcome": "승리" if plaintiff_outcome == "패배" else ("패배" if plaintiff_outcome == "승리" else "무승부"),
-            "db_key_prefix": "defendant_lawyer"
-        }
+            "outcome": opposite_outcome(analysis.plaintiff_outcome),
+            "db_key_prefix": "defendant_lawyer",
+            "lesson": analysis.defendant_lesson,
+        },
     }
-
-    lessons = {}
     for lawyer_name, info in outcomes.items():
-        outcome = info['outcome']
-        db_key_prefix = info['db_key_prefix']
-        
-        my_speeches = "\n".join(
-            [s['speech'] for s in state['debate_transcript'] if s['agent_name'] == lawyer_name]
+        console.print_lesson(lawyer_name, info['outcome'], info['lesson'])
+    return outcomes
+
+
+def _archive_kwargs(state: TrialState, outcomes: Dict[str, Dict[str, str]]) -> Dict[str, Any]:
+    lessons = {info['db_key_prefix']: info['lesson'] for info in outcomes.values()}
+    return {
+        "case_summary": state['case_file'],
+        "verdict": state['final_verdict'],
+        "plaintiff_lesson": lessons.get("plaintiff_lawyer", "N/A"),
+        "defendant_lesson": lessons.get("defendant_lawyer", "N/A"),
+        "case_id": state.get("case_id"),
+        "plaintiff_outcome": state.get("plaintiff_outcome"),
+    }
+
+
+def _trial_id(config: Optional[RunnableConfig]) -> Optional[str]:
+    """체크포인트 설정으로 실행 중인 재판의 thread_id. 체크포인트를 쓰지 않으면 None입니다."""
+    return ((config or {}).get("configurable") or {}).get("thread_id")
+
+
+def update_knowledge_base_node(state: TrialState, config: RunnableConfig):
+    """변호사 DB 업데이트 및 이번 사건을 벡터 DB에 저장"""
+    console.print_update_header()
+
+    # 승패와 양측 교훈을 post_verdict_chain 한 번으로 받습니다 (실패 시 evaluation/reflection 개별 호출).
+    outcomes = _record_analysis(state, analyze_verdict(*_analysis_inputs(state)))
+
+    redis_client = agents.get_redis_client()
+    for info in outcomes.values():
+        # 체크포인트 재판(thread_id)별로 한 번만 기록하므로 이 노드를 다시 실행해도 교훈이 중복되지 않습니다.
+        record_lesson(redis_client, info['db_key_prefix'], info['outcome'], info['lesson'], trial_id=_trial_id(config))
+
+    add_case_to_db(**_archive_kwargs(state, outcomes))
+
+    return state
+
+
+async def aupdate_knowledge_base_node(state: TrialState, config: RunnableConfig):
+    """update_knowledge_base_node의 비동기 버전입니다."""
+    console.print_update_header()
+
+    outcomes = _record_analysis(state, await aanalyze_verdict(*_analysis_inputs(state)))
+
+    redis_client = agents.get_redis_client()
+    for info in outcomes.values():
+        await asyncio.to_thread(
+            record_lesson, redis_client, info['db_key_prefix'], info['outcome'], info['lesson'],
+            trial_id=_trial_id(config),
         )
-        
-        reflection_response = reflection_chain.invoke({"outcome": outcome, "my_speeches": my_speeches})
-        lesson = reflection_response.content.strip()
-        lessons[db_key_prefix] = lesson
-        
-        console.print_lesson(lawyer_name, outcome, lesson)
-
-        if outcome == "승리":
-            redis_client.rpush(f"{db_key_prefix}:successful_strategies", lesson)
-        elif outcome == "패배":
-            redis_client.rpush(f"{db_key_prefix}:failed_strategies", lesson)
-
-    add_case_to_db(
-        case_summary=state['case_file'],
-        verdict=state['final_verdict'],
-        plaintiff_lesson=lessons.get("plaintiff_lawyer", "N/A"),
-        defendant_lesson=lessons.get("defendant_lawyer", "N/A")
-    )
-    
+
+    await aadd_case_to_db(**_archive_kwargs(state, outcomes))
     return state
 
-def critique_node(state: TrialState):
-    """비평가 에이전트가 최종 판결을 평가하고 점수를 State에 기록합니다."""
+# ------------------- 판결 품질 평가 -------------------
+def _critique_inputs(state: TrialState) -> Dict[str, str]:
     console.print_verdict_header("판결 품질 평가 (벤치마크 점수)")
+    return {
+        "transcript": _transcript_str(state),
+        "final_verdict": state['final_verdict']
+    }
 
-    transcript_str = "\n".join(
-        [f"{msg['agent_name']}: {msg['speech']}" for msg in state['debate_transcript']]
-    )
 
+def _record_critique(state: TrialState, critique_response: Any, failure_reason: Optional[str]) -> TrialState:
+    """비평 응답(또는 실패 사유)을 기준별 점수로 정리해 State에 기록합니다."""
     default_scores: Dict[str, Dict[str, Any]] = {
         criteria: {
             "criteria": criteria,
@@ -179,16 +345,12 @@ def critique_node(state: TrialState):
         }
         for criteria in CRITIQUE_CRITERIA
     }
-    failure_reason: Optional[str] = None
     structured_dump: Optional[Dict[str, Any]] = None
 
     try:
-        critique_response = critic_chain.invoke({
-            "transcript": transcript_str,
-            "final_verdict": state['final_verdict']
-        })
-
-        if hasattr(critique_response, "model_dump"):
+        if critique_response is None:
+            evaluations = []
+        elif hasattr(critique_response, "model_dump"):
             structured_dump = critique_response.model_dump()  # type: ignore[assignment]
             evaluations = structured_dump.get("evaluations", [])
         elif isinstance(critique_response, dict):
@@ -252,3 +414,25 @@ def critique_node(state: TrialState):
     state['critique_scores'] = list(default_scores.values())
 
     return state
+
+
+def critique_node(state: TrialState):
+    """비평가 에이전트가 최종 판결을 평가하고 점수를 State에 기록합니다."""
+    critique_response, failure_reason = None, None
+    try:
+        critique_response = agents.get_chain("critic_chain").invoke(_critique_inputs(state))
+    except Exception as error:
+        failure_reason = str(error)
+        console.console.print(f"\n[bold yellow]품질 평가 생성 중 오류:[/bold yellow] {failure_reason}")
+    return _record_critique(state, critique_response, failure_reason)
+
+
+async def acritique_node(state: TrialState):
+    """critique_node의 비동기 버전입니다."""
+    critique_response, failure_reason = None, None
+    try:
+        critique_response = await agents.get_chain("critic_chain").ainvoke(_critique_inputs(state))
+    except Exception as error:
+        failure_reason = str(error)
+        console.console.print(f"\n[bold yellow]품질 평가 생성 중 오류:[/bold yellow] {failure_reason}")
+    return _record_critique(state, critique_response, failure_reason)
@@ -0,0 +1,261 @@
+import asyncio
+import os
+import re
+import threading
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+import src.agents as agents
+from src.lazy import Lazy
+
+# 원고 입장의 승패 라벨 (evaluation_chain의 답변과 같은 값)
+OUTCOMES: Tuple[str, ...] = ("승리", "패배", "무승부")
+
+outcome_classifier_enabled = os.getenv("OUTCOME_CLASSIFIER", "true").lower() in ("1", "true", "yes", "on")
+_project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+outcome_classifier_path = os.getenv(
+    "OUTCOME_CLASSIFIER_PATH", os.path.join(_project_root, ".cache", "outcome_classifier.npz")
+)
+# 분류기 확신도가 이 값보다 낮으면 evaluation_chain(LLM)으로 판단합니다.
+outcome_classifier_threshold = float(os.getenv("OUTCOME_CLASSIFIER_THRESHOLD", "0.8"))
+
+# ------------------- 주문 규칙 -------------------
+_ORDER_PATTERN = re.compile(r"주\s*문\s*[:：]?(.*?)(?:이\s*유\s*[:：]|\n\s*\n|$)", re.S)
+
+# (특징 이름, 정규식, 가리키는 결과). 학습 모델에는 각 규칙의 일치 여부가 추가 특징으로 들어갑니다.
+RULES: Tuple[Tuple[str, "re.Pattern", Optional[str]], ...] = (
+    ("partial", re.compile(r"일부\s*(인용|승소|기각)|나머지\s*(청구|부분)|절반"), "무승부"),
+    ("dismiss", re.compile(r"(청구|소)(를|들을|는)?\s*(모두\s*|전부\s*)?(기각|각하)"), "패배"),
+    ("order_pay", re.compile(r"지급하라|이행하라|인도하라|중단하라|철거하라|제거하라|말소|명한다"), "승리"),
+    ("accept", re.compile(r"(청구|소)(를|는)?\s*(모두\s*|전부\s*)?인용"), "승리"),
+    ("cost_plaintiff", re.compile(r"소송\s*비용은\s*원고(가|의)?\s*부담"), "패배"),
+    ("cost_defendant", re.compile(r"소송\s*비용은\s*피고(가|의|들이)?\s*부담"), "승리"),
+    ("cost_shared", re.compile(r"소송\s*비용은\s*(각자|나누어|분담|\S+\s*분의)"), "무승부"),
+    ("settlement", re.compile(r"조정|화해"), "무승부"),
+)
+# "원고(반소피고)는 피고에게 … 지급하라"처럼 원고에게 내린 이행 명령 (반소 인용 등). 원고 승리의 근거가 아닙니다.
+_PLAINTIFF_ORDER_PATTERN = re.compile(r"원\s*고\s*(\([^)]*\))?\s*(는|은|가|들은|들이)\s*피\s*고\s*(\([^)]*\))?\s*(에게|들에게)")
+
+
+def extract_order_clause(verdict: str) -> str:
+    """판결문에서 '주문:' 부분만 잘라냅니다. 주문이 없으면 판결문 앞부분을 사용합니다."""
+    match = _ORDER_PATTERN.search(verdict)
+    clause = match.group(1) if match and match.group(1).strip() else verdict[:300]
+    return clause.strip()
+
+
+def rule_features(clause: str) -> np.ndarray:
+    return np.asarray([1.0 if pattern.search(clause) else 0.0 for _, pattern, _ in RULES], dtype=np.float32)
+
+
+def rule_outcome(clause: str) -> Tuple[Optional[str], float]:
+    """
+    주문 문구 규칙만으로 결과를 정합니다.
+    '일부 인용'처럼 부분 승소를 뜻하는 문구는 지급 명령보다 우선하며, 서로 다른 결과를 가리키는 문구가
+    섞여 있으면 판단하지 않습니다(None). 원고에게 내린 이행 명령은 원고 승리로 세지 않습니다.
+    규칙 하나만 맞으면 기본 임계치(0.8)보다 낮은 확신도를 주어 LLM이 다시 판단하게 합니다.
+    """
+    votes = {name: outcome for name, pattern, outcome in RULES if outcome and pattern.search(clause)}
+    if "order_pay" in votes and _PLAINTIFF_ORDER_PATTERN.search(clause):
+        del votes["order_pay"]
+    if not votes:
+        return None, 0.0
+    if "partial" in votes:
+        return "무승부", 0.9
+    outcomes = set(votes.values())
+    if len(outcomes) == 1:
+        return outcomes.pop(), 0.9 if len(votes) > 1 else 0.7
+    return None, 0.0
+
+
+# ------------------- 학습 모델 -------------------
+class OutcomeModel:
+    """
+    주문 임베딩 + 규칙 특징을 입력으로 하는 다항 로지스틱 회귀입니다 (NumPy만 사용).
+    가중치는 npz 한 파일에 저장하며 임베딩 모델 이름이 다르면 불러오지 않습니다.
+    학습에 쓴 caseId도 함께 저장해 평가 사건과 겹치는지 확인할 수 있게 합니다.
+    """
+
+    def __init__(self, weights: np.ndarray, bias: np.ndarray, embedding_model: str,
+                 case_ids: Sequence[str] = ()):
+        self.weights = weights
+        self.bias = bias
+        self.embedding_model = embedding_model
+        self.case_ids = list(case_ids)
+
+    @staticmethod
+    def features(embeddings: np.ndarray, clauses: Sequence[str]) -> np.ndarray:
+        rules = np.stack([rule_features(clause) for clause in clauses]) if clauses else np.zeros((0, len(RULES)))
+        return np.hstack([np.asarray(embeddings, dtype=np.float32), rules.astype(np.float32)])
+
+    @classmethod
+    def fit(cls, X: np.ndarray, labels: Sequence[str], embedding_model: str, case_ids: Sequence[str] = (),
+            l2: float = 1e-3, epochs: int = 500, learning_rate: float = 0.5) -> "OutcomeModel":
+        y = np.zeros((len(labels), len(OUTCOMES)), dtype=np.float32)
+        y[np.arange(len(labels)), [OUTCOMES.index(label) for label in labels]] = 1.0
+        # 라벨 불균형(대부분 승리 등)을 줄이기 위해 클래스 빈도의 역수로 가중합니다.
+        class_weight = len(labels) / (len(OUTCOMES) * np.maximum(y.sum(axis=0), 1.0))
+        sample_weight = (y * class_weight).sum(axis=1, keepdims=True)
+
+        weights = np.zeros((X.shape[1], len(OUTCOMES)), dtype=np.float32)
+        bias = np.zeros(len(OUTCOMES), dtype=np.float32)
+        for _ in range(epochs):
+            probs = _softmax(X @ weights + bias)
+            grad = (probs - y) * sample_weight / len(labels)
+            weights -= learning_rate * (X.T @ grad + l2 * weights)
+            bias -= learning_rate * grad.sum(axis=0)
+        return cls(weights, bias, embedding_model, case_ids)
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        return _softmax(X @ self.weights + self.bias)
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        np.savez(path, weights=self.weights, bias=self.bias, embedding_model=np.asarray(self.embedding_model),
+                 case_ids=np.asarray(self.case_ids, dtype=str))
+
+    @classmethod
+    def load(cls, path: str) -> Optional["OutcomeModel"]:
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            case_ids = data["case_ids"].tolist() if "case_ids" in data.files else []
+            return cls(data["weights"], data["bias"], str(data["embedding_model"]), case_ids)
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    logits = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(logits)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+def _load_model() -> Optional[OutcomeModel]:
+    from src.vector_db import model_name
+
+    model = OutcomeModel.load(outcome_classifier_path)
+    if model is not None and model.embedding_model != model_name:
+        print(f"⚠️ 승패 분류기가 다른 임베딩 모델({model.embedding_model})로 학습되어 규칙만 사용합니다.")
+        return None
+    return model
+
+
+_model: Lazy[Optional[OutcomeModel]] = Lazy(_load_model)
+
+
+def reload_model() -> None:
+    _model.reset()
+
+
+# ------------------- 분류 -------------------
+class OutcomePrediction(NamedTuple):
+    outcome: Optional[str]
+    confidence: float
+    source: str  # "rule", "model" 또는 "llm"
+
+
+def classify_locally(verdict: str) -> OutcomePrediction:
+    """
+    LLM 없이 판결문의 원고측 승패를 추정합니다.
+    학습된 모델이 있으면 모델의 확률을, 없으면 주문 규칙의 확신도를 사용합니다.
+    """
+    clause = extract_order_clause(verdict)
+    model = _model.get()
+    if model is None:
+        outcome, confidence = rule_outcome(clause)
+        return OutcomePrediction(outcome, confidence, "rule")
+
+    from src.vector_db import get_embeddings
+
+    embedding = np.asarray([get_embeddings().embed_query(clause)], dtype=np.float32)
+    probs = model.predict_proba(OutcomeModel.features(embedding, [clause]))[0]
+    best = int(np.argmax(probs))
+    return OutcomePrediction(OUTCOMES[best], float(probs[best]), "model")
+
+
+_stats_lock = threading.Lock()
+_stats: Dict[str, int] = {"rule": 0, "model": 0, "llm": 0}
+
+
+def _count(source: str) -> None:
+    with _stats_lock:
+        _stats[source] += 1
+
+
+def outcome_stats() -> Dict[str, int]:
+    """로컬 분류기(rule/model)와 LLM이 각각 승패를 판단한 횟수를 반환합니다."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _llm_outcome(response) -> OutcomePrediction:
+    return OutcomePrediction(response.content.strip(), 1.0, "llm")
+
+
+def local_outcome(verdict: str) -> Optional[OutcomePrediction]:
+    """로컬 분류기의 확신도가 임계치 이상일 때만 그 판단을 반환합니다 (아니면 None)."""
+    if not outcome_classifier_enabled:
+        return None
+    prediction = classify_locally(verdict)
+    if prediction.outcome is None or prediction.confidence < outcome_classifier_threshold:
+        return None
+    _count(prediction.source)
+    return prediction
+
+
+def record_llm_outcome() -> None:
+    """다른 체인의 응답에서 LLM이 승패를 판단한 경우 통계에 반영합니다."""
+    _count("llm")
+
+
+def evaluate_outcome(verdict: str) -> OutcomePrediction:
+    """
+    판결문의 원고측 승패를 판단합니다. 로컬 분류기의 확신도가 임계치 이상이면 그 결과를 쓰고,
+    아니면 evaluation_chain을 호출합니다.
+    """
+    prediction = local_outcome(verdict)
+    if prediction is not None:
+        return prediction
+    _count("llm")
+    return _llm_outcome(agents.get_chain("evaluation_chain").invoke({"final_verdict": verdict}))
+
+
+async def aevaluate_outcome(verdict: str) -> OutcomePrediction:
+    """evaluate_outcome의 비동기 버전입니다."""
+    prediction = await asyncio.to_thread(local_outcome, verdict)
+    if prediction is not None:
+        return prediction
+    _count("llm")
+    return _llm_outcome(await agents.get_chain("evaluation_chain").ainvoke({"final_verdict": verdict}))
+
+
+def collect_training_data(labels: Dict[str, str],
+                          exclude: Sequence[str] = ()) -> Tuple[List[str], List[str], List[str]]:
+    """
+    사건 아카이브의 판결문, 라벨, caseId를 모읍니다. 라벨은 labels(caseId → expected_outcome)를 우선하고,
+    없으면 저장 당시 기록된 원고측 승패(plaintiff_outcome)를 사용합니다. exclude의 caseId는 제외합니다.
+    """
+    from src.vector_db import iter_archive_documents
+
+    excluded = set(exclude)
+    verdicts: List[str] = []
+    targets: List[str] = []
+    case_ids: List[str] = []
+    for _, _, metadata in iter_archive_documents():
+        case_id = metadata.get("case_id")
+        if case_id in excluded:
+            continue
+        label = labels.get(case_id) or metadata.get("plaintiff_outcome")
+        if label in OUTCOMES and metadata.get("verdict"):
+            verdicts.append(metadata["verdict"])
+            targets.append(label)
+            case_ids.append(case_id or "")
+    return verdicts, targets, case_ids
+
+
+def train_model(verdicts: Sequence[str], labels: Sequence[str], case_ids: Sequence[str] = ()) -> OutcomeModel:
+    from src.vector_db import get_embeddings, model_name
+
+    clauses = [extract_order_clause(verdict) for verdict in verdicts]
+    embeddings = np.asarray(get_embeddings().embed_documents(clauses), dtype=np.float32)
+    return OutcomeModel.fit(OutcomeModel.features(embeddings, clauses), labels, model_name, case_ids)
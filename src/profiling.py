@@ -0,0 +1,264 @@
+import asyncio.events
+import concurrent.futures.thread
+import contextvars
+import cProfile
+import functools
+import inspect
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# --profile 실행 모드
+# - 샘플링: 백그라운드 스레드가 PROFILE_SAMPLE_INTERVAL_MS마다 모든 스레드의 파이썬 스택을 수집합니다.
+#   대기 중인 스레드(락/큐/이벤트 루프 select)는 제외하며, 스택에 run_stage/arun_stage 프레임이 있으면
+#   그 단계(그래프 노드, batch_learn 단계 등) 이름을 스택 맨 앞에 붙입니다. 단계 안에서 만들어진 asyncio 태스크나
+#   스레드 작업(to_thread 등)은 이벤트 루프 핸들/작업 항목이 들고 있는 contextvars 컨텍스트에서 단계를 찾으므로,
+#   동시 재판에서도 단계가 섞이지 않습니다.
+# - cProfile: 메인 스레드 전체를 결정적으로 프로파일링해 .pstats로 저장합니다 (snakeviz 등으로 확인).
+# - tracemalloc: 단계별 메모리 피크(단계 시작 시점 대비 증가량)와 전체 피크, 할당 상위 위치를 기록합니다.
+#   단계가 동시에 실행되면(--concurrency > 1) 단계별 피크는 근사치입니다.
+# 결과는 PROFILE_DIR/<스크립트>_<시각>.{collapsed,pstats}로 저장되고 종료 시 상위 N개 요약이 출력됩니다.
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5"))
+PROFILE_TRACEMALLOC_FRAMES = int(os.getenv("PROFILE_TRACEMALLOC_FRAMES", "1"))
+
+# 이 모듈/함수가 스택 맨 안쪽이면 대기 중인 스레드로 보고 샘플에서 제외합니다.
+_IDLE_MODULES = {"threading", "queue", "selectors", "asyncio.base_events", "concurrent.futures.thread"}
+_IDLE_FUNCTIONS = {"wait", "get", "select", "_worker", "_run_once", "acquire"}
+
+_session: Optional["ProfileSession"] = None
+_current_stage: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("profile_stage", default=None)
+
+
+def add_profile_argument(parser) -> None:
+    """스크립트의 argparse에 --profile / --profile-top 옵션을 추가합니다."""
+    parser.add_argument("--profile", action="store_true",
+                        help="CPU 샘플링/cProfile/tracemalloc 프로파일링 후 결과를 PROFILE_DIR에 저장")
+    parser.add_argument("--profile-top", type=int, default=20, help="프로파일 요약에 출력할 상위 항목 수")
+
+
+# ------------------- 단계 표시 -------------------
+def run_stage(name: str, func, *args, **kwargs):
+    """func를 단계 name으로 실행합니다. 프로파일링 중이 아니면 그대로 호출합니다."""
+    session = _session
+    if session is None:
+        return func(*args, **kwargs)
+    mark = session.stage_started()
+    token = _current_stage.set(name)
+    try:
+        return func(*args, **kwargs)
+    finally:
+        _current_stage.reset(token)
+        session.stage_finished(name, mark)
+
+
+async def arun_stage(name: str, func, *args, **kwargs):
+    """run_stage의 비동기 버전입니다."""
+    session = _session
+    if session is None:
+        return await func(*args, **kwargs)
+    mark = session.stage_started()
+    token = _current_stage.set(name)
+    try:
+        return await func(*args, **kwargs)
+    finally:
+        _current_stage.reset(token)
+        session.stage_finished(name, mark)
+
+
+_STAGE_CODES = {run_stage.__code__, arun_stage.__code__}
+_CONTEXT_CODES = {asyncio.events.Handle._run.__code__, concurrent.futures.thread._WorkItem.run.__code__}
+
+
+def stage_function(name: str, func):
+    """func(동기/비동기)를 호출할 때마다 단계 name으로 실행하는 래퍼를 만듭니다."""
+    if func is None:
+        return None
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            return await arun_stage(name, func, *args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        return run_stage(name, func, *args, **kwargs)
+    return wrapper
+
+
+# ------------------- 샘플링 -------------------
+def _frame_label(frame) -> str:
+    return f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_qualname}"
+
+
+def _context_stage(frame) -> Optional[str]:
+    """이벤트 루프 핸들(Handle._run)이나 ctx.run으로 감싼 스레드 작업(_WorkItem.run) 프레임의 컨텍스트에 기록된 단계 이름입니다."""
+    owner = frame.f_locals.get("self")
+    context = getattr(owner, "_context", None)
+    if context is None:
+        fn = getattr(owner, "fn", None)
+        context = getattr(getattr(fn, "func", None), "__self__", None)
+    return context.get(_current_stage) if isinstance(context, contextvars.Context) else None
+
+
+class _Sampler(threading.Thread):
+    def __init__(self, interval: float):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == self.ident:
+                    continue
+                stack = self._stack(frame)
+                if stack is not None:
+                    self.stacks[stack] += 1
+                    self.samples += 1
+
+    @staticmethod
+    def _stack(frame) -> Optional[Tuple[str, ...]]:
+        module, function = frame.f_globals.get("__name__", "?"), frame.f_code.co_name
+        if module in _IDLE_MODULES and function in _IDLE_FUNCTIONS:
+            return None
+        labels: List[str] = []
+        stage = None
+        while frame is not None:
+            if stage is None and frame.f_code in _STAGE_CODES:
+                stage = frame.f_locals.get("name")
+            elif stage is None and frame.f_code in _CONTEXT_CODES:
+                stage = _context_stage(frame)
+            labels.append(_frame_label(frame))
+            frame = frame.f_back
+        labels.append(str(stage or "(기타)"))
+        return tuple(reversed(labels))
+
+
+# ------------------- 세션 -------------------
+class ProfileSession:
+    """--profile 실행 한 번의 샘플/프로파일/메모리 기록입니다."""
+
+    def __init__(self, label: str, top: int = 20):
+        self.label = label
+        self.top = top
+        self.base_path = os.path.join(PROFILE_DIR, f"{label}_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+        self._lock = threading.Lock()
+        self.stage_runs: Counter = Counter()
+        self.stage_seconds: Dict[str, float] = {}
+        self.stage_peaks: Dict[str, int] = {}
+        self.peak = 0
+        self.elapsed = 0.0
+        self._sampler = _Sampler(PROFILE_SAMPLE_INTERVAL_MS / 1000)
+        self._profiler = cProfile.Profile()
+        self._snapshot: Optional[tracemalloc.Snapshot] = None
+
+    def start(self) -> None:
+        tracemalloc.start(PROFILE_TRACEMALLOC_FRAMES)
+        self._started = time.perf_counter()
+        self._sampler.start()
+        self._profiler.enable()
+
+    def stop(self) -> None:
+        self._profiler.disable()
+        self._sampler.stop()
+        self.elapsed = time.perf_counter() - self._started
+        self.peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+        self._snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+
+    def stage_started(self) -> Tuple[float, int]:
+        with self._lock:
+            current, peak = tracemalloc.get_traced_memory()
+            self.peak = max(self.peak, peak)
+            tracemalloc.reset_peak()
+        return time.perf_counter(), current
+
+    def stage_finished(self, name: str, mark: Tuple[float, int]) -> None:
+        started, memory_at_start = mark
+        with self._lock:
+            peak = tracemalloc.get_traced_memory()[1]
+            self.peak = max(self.peak, peak)
+            self.stage_runs[name] += 1
+            self.stage_seconds[name] = self.stage_seconds.get(name, 0.0) + time.perf_counter() - started
+            self.stage_peaks[name] = max(self.stage_peaks.get(name, 0), peak - memory_at_start)
+
+    def write(self) -> Dict[str, str]:
+        """collapsed stack(플레임그래프용)과 cProfile 결과를 저장하고 경로를 반환합니다."""
+        os.makedirs(os.path.dirname(os.path.abspath(self.base_path)), exist_ok=True)
+        paths = {"collapsed": self.base_path + ".collapsed", "pstats": self.base_path + ".pstats"}
+        with open(paths["collapsed"], "w", encoding="utf-8") as f:
+            for stack, count in self._sampler.stacks.most_common():
+                f.write(f"{';'.join(stack)} {count}\n")
+        self._profiler.dump_stats(paths["pstats"])
+        return paths
+
+    def report(self) -> Dict[str, Any]:
+        """단계별/함수별/패키지별 샘플 수와 메모리 요약입니다."""
+        stacks = self._sampler.stacks
+        stage_samples: Counter = Counter()
+        self_samples: Counter = Counter()
+        total_samples: Counter = Counter()
+        package_samples: Counter = Counter()
+        for stack, count in stacks.items():
+            stage_samples[stack[0]] += count
+            self_samples[stack[-1]] += count
+            package_samples[stack[-1].split(":", 1)[0].split(".", 1)[0]] += count
+            for label in set(stack[1:]):
+                total_samples[label] += count
+
+        stages = [
+            (name, self.stage_runs.get(name, 0), self.stage_seconds.get(name, 0.0),
+             stage_samples.get(name, 0), self.stage_peaks.get(name, 0))
+            for name in dict.fromkeys(list(self.stage_runs) + [name for name, _ in stage_samples.most_common()])
+        ]
+        allocations = []
+        if self._snapshot is not None:
+            for stat in self._snapshot.statistics("lineno")[:self.top]:
+                frame = stat.traceback[0]
+                allocations.append((f"{frame.filename}:{frame.lineno}", stat.size, stat.count))
+        return {
+            "label": self.label,
+            "elapsed": self.elapsed,
+            "samples": self._sampler.samples,
+            "interval_ms": PROFILE_SAMPLE_INTERVAL_MS,
+            "stages": stages,
+            "hotspots": [(label, count, total_samples[label]) for label, count in self_samples.most_common(self.top)],
+            "packages": package_samples.most_common(self.top),
+            "peak": self.peak,
+            "allocations": allocations,
+        }
+
+
+@contextmanager
+def profile_run(enabled: bool, label: str, top: int = 20) -> Iterator[Optional[ProfileSession]]:
+    """enabled이면 블록 실행을 프로파일링하고, 끝나면 결과 파일을 저장하고 요약을 출력합니다."""
+    global _session
+    if not enabled:
+        yield None
+        return
+
+    import src.console as console
+
+    session = ProfileSession(label, top)
+    _session = session
+    session.start()
+    try:
+        yield session
+    finally:
+        session.stop()
+        _session = None
+        paths = session.write()
+        console.print_profile_report(session.report(), paths)
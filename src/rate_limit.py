@@ -0,0 +1,433 @@
+import asyncio
+import collections
+import itertools
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Sequence
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableBinding, RunnableSequence
+
+import src.metrics as metrics
+from src.tokens import estimate_tokens
+
+# 재시도할 HTTP 상태 코드 (요청 시간 초과, 충돌, 속도 제한, 서버 오류)
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_rate_limit_error(exc: BaseException) -> bool:
+    return _status_code(exc) == 429 or "RateLimit" in type(exc).__name__
+
+
+def is_retryable_error(exc: BaseException) -> bool:
+    """
+    공급자 SDK에 의존하지 않고 예외의 상태 코드와 이름으로 재시도 여부를 판단합니다.
+    (openai.RateLimitError, APITimeoutError, APIConnectionError, httpx.ReadTimeout 등)
+    """
+    if is_rate_limit_error(exc) or _status_code(exc) in RETRYABLE_STATUS_CODES:
+        return True
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    name = type(exc).__name__
+    return "Timeout" in name or "Connection" in name
+
+
+def _retry_after_seconds(exc: BaseException) -> Optional[float]:
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        value = headers.get("retry-after")
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class _TokenBucket:
+    """
+    분당 한도를 초당 속도로 채우는 토큰 버킷입니다. 예약은 잔량을 음수(부채)로 만들 수 있고,
+    호출자는 반환된 시간만큼 기다린 뒤 요청합니다. 덕분에 동기/비동기 호출자가 같은 버킷을 공유합니다.
+    """
+
+    def __init__(self, per_minute: float):
+        self.per_minute = per_minute
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+
+    def reserve(self, amount: float, rate_factor: float) -> float:
+        now = time.monotonic()
+        rate = self.per_minute * rate_factor / 60.0
+        self.tokens = min(self.per_minute, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+        self.tokens -= amount
+        return max(0.0, -self.tokens / rate) if rate > 0 else 0.0
+
+    def refund(self, amount: float) -> None:
+        self.tokens = min(self.per_minute, self.tokens + amount)
+
+
+class _FairSlots:
+    """
+    동시 요청 슬롯입니다. 동기(스레드)와 비동기(이벤트 루프) 대기자를 한 줄로 세워 도착 순서대로 슬롯을 넘깁니다.
+    비동기 대기자는 future로 기다리므로 폴링 없이 이벤트 루프를 양보합니다.
+    """
+
+    def __init__(self, limit: int):
+        self._lock = threading.Lock()
+        self._free = limit
+        self._waiters: collections.deque = collections.deque()
+
+    def acquire(self) -> None:
+        with self._lock:
+            if self._free > 0 and not self._waiters:
+                self._free -= 1
+                return
+            event = threading.Event()
+            self._waiters.append(event)
+        event.wait()
+
+    async def aacquire(self) -> None:
+        with self._lock:
+            if self._free > 0 and not self._waiters:
+                self._free -= 1
+                return
+            future = asyncio.get_running_loop().create_future()
+            self._waiters.append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                if future in self._waiters:
+                    self._waiters.remove(future)
+                    raise
+            # 슬롯을 이미 넘겨받은 뒤 취소되었다면 돌려줍니다 (future가 취소되었으면 _grant가 돌려줍니다).
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def _grant(self, future: asyncio.Future) -> None:
+        if future.cancelled():
+            self.release()
+        else:
+            future.set_result(None)
+
+    def release(self) -> None:
+        with self._lock:
+            while self._waiters:
+                waiter = self._waiters.popleft()
+                if isinstance(waiter, threading.Event):
+                    waiter.set()
+                    return
+                try:
+                    waiter.get_loop().call_soon_threadsafe(self._grant, waiter)
+                    return
+                except RuntimeError:
+                    continue  # 이벤트 루프가 이미 닫힌 대기자는 건너뜁니다.
+            self._free += 1
+
+
+class AdaptiveRateLimiter:
+    """
+    LLM 호출 전체가 공유하는 클라이언트 측 속도 제한기입니다.
+    - 분당 요청 수(RPM)와 분당 토큰 수(TPM) 토큰 버킷, 동시 요청 수 상한을 함께 적용합니다.
+    - 429 응답을 받으면 설정된 한도를 절반으로 줄이고, 이후 성공할 때마다 조금씩 설정값까지 되돌립니다(AIMD).
+      한도를 설정하지 않았다면 429는 재시도 백오프로만 흡수합니다.
+    """
+
+    def __init__(self, requests_per_minute: float = 0, tokens_per_minute: float = 0,
+                 max_concurrency: int = 0, min_rate_factor: float = 0.1):
+        self._lock = threading.Lock()
+        self._requests = _TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self._tokens = _TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self._slots = _FairSlots(max_concurrency) if max_concurrency > 0 else None
+        self.max_concurrency = max_concurrency
+        self.min_rate_factor = min_rate_factor
+        self.rate_factor = 1.0
+        self._stats = {"requests": 0, "retries": 0, "rate_limited": 0, "wait_seconds": 0.0, "in_flight": 0}
+
+    @classmethod
+    def from_env(cls) -> "AdaptiveRateLimiter":
+        return cls(
+            requests_per_minute=float(os.getenv("LLM_REQUESTS_PER_MINUTE", "0")),
+            tokens_per_minute=float(os.getenv("LLM_TOKENS_PER_MINUTE", "0")),
+            max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "0")),
+        )
+
+    # ------------------- 예약/해제 -------------------
+    def _reserve(self, tokens: int) -> float:
+        with self._lock:
+            wait = 0.0
+            if self._requests is not None:
+                wait = max(wait, self._requests.reserve(1, self.rate_factor))
+            if self._tokens is not None:
+                wait = max(wait, self._tokens.reserve(tokens, self.rate_factor))
+            self._stats["requests"] += 1
+            self._stats["wait_seconds"] += wait
+            return wait
+
+    def _enter(self) -> None:
+        with self._lock:
+            self._stats["in_flight"] += 1
+
+    def release(self, estimated_tokens: int, actual_tokens: Optional[int]) -> None:
+        """요청이 끝나면 동시 요청 슬롯을 돌려주고, 실제 사용 토큰으로 TPM 버킷을 보정합니다."""
+        with self._lock:
+            self._stats["in_flight"] -= 1
+            if self._tokens is not None and actual_tokens is not None:
+                self._tokens.refund(estimated_tokens - actual_tokens)
+        if self._slots is not None:
+            self._slots.release()
+
+    def acquire(self, tokens: int) -> None:
+        with metrics.timed("llm_wait_ms"):
+            if self._slots is not None:
+                self._slots.acquire()
+            wait = self._reserve(tokens)
+            if wait > 0:
+                time.sleep(wait)
+        self._enter()
+
+    async def aacquire(self, tokens: int) -> None:
+        with metrics.timed("llm_wait_ms"):
+            if self._slots is not None:
+                await self._slots.aacquire()
+            wait = self._reserve(tokens)
+            if wait > 0:
+                await asyncio.sleep(wait)
+        self._enter()
+
+    # ------------------- 적응 -------------------
+    def on_success(self) -> None:
+        with self._lock:
+            if self.rate_factor < 1.0:
+                self.rate_factor = min(1.0, self.rate_factor + 0.05)
+
+    def on_retry(self, exc: BaseException) -> None:
+        with self._lock:
+            self._stats["retries"] += 1
+            if not is_rate_limit_error(exc):
+                return
+            self._stats["rate_limited"] += 1
+            self.rate_factor = max(self.min_rate_factor, self.rate_factor * 0.5)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["wait_seconds"] = round(stats["wait_seconds"], 2)
+            stats["effective_rpm"] = (
+                round(self._requests.per_minute * self.rate_factor, 1) if self._requests is not None else None
+            )
+            stats["effective_tpm"] = (
+                round(self._tokens.per_minute * self.rate_factor) if self._tokens is not None else None
+            )
+            return stats
+
+
+class RetryPolicy:
+    """지수 백오프 + full jitter 재시도 정책입니다. Retry-After 헤더가 있으면 그 이상 기다립니다."""
+
+    def __init__(self, max_retries: int = 6, base_delay: float = 1.0, max_delay: float = 60.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    @classmethod
+    def from_env(cls) -> "RetryPolicy":
+        return cls(
+            max_retries=int(os.getenv("LLM_MAX_RETRIES", "6")),
+            base_delay=float(os.getenv("LLM_RETRY_BASE_SECONDS", "1")),
+            max_delay=float(os.getenv("LLM_RETRY_MAX_SECONDS", "60")),
+        )
+
+    def delay(self, attempt: int, exc: BaseException) -> float:
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        retry_after = _retry_after_seconds(exc)
+        return max(backoff, retry_after) if retry_after is not None else backoff
+
+
+def _prompt_tokens(messages: Sequence[BaseMessage]) -> int:
+    return sum(estimate_tokens(m.content if isinstance(m.content, str) else str(m.content)) for m in messages)
+
+
+def _chunk_text(chunk: ChatGenerationChunk) -> str:
+    return chunk.message.content if isinstance(chunk.message.content, str) else ""
+
+
+def _usage_tokens(result: ChatResult) -> Optional[int]:
+    usage = getattr(result.generations[0].message, "usage_metadata", None) if result.generations else None
+    return usage.get("total_tokens") if usage else None
+
+
+@contextmanager
+def _waiting(run_manager: Any) -> Iterator[None]:
+    """블록(한도 대기, 재시도 백오프) 시간을 이 LLM 호출의 llm_ms에서 빼도록 계측 모듈에 알립니다."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.exclude_llm_time(getattr(run_manager, "run_id", None), (time.perf_counter() - start) * 1000)
+
+
+class RateLimitedChatModel(BaseChatModel):
+    """
+    실제 채팅 모델(inner)을 감싸 모든 호출에 속도 제한과 재시도를 적용합니다.
+    응답 캐시와 기록 콜백은 이 모델에 붙이므로 캐시 적중 시에는 한도를 소모하지 않습니다.
+    """
+
+    inner: BaseChatModel
+    limiter: Any
+    retry: Any
+    expected_output_tokens: int = 512
+
+    @property
+    def _llm_type(self) -> str:
+        return self.inner._llm_type
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return self.inner._identifying_params
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any):
+        # 도구 형식 변환은 실제 모델에 맡기고, 변환된 호출 인자만 이 모델에 바인딩합니다.
+        bound = self.inner.bind_tools(tools, **kwargs)
+        return self.bind(**bound.kwargs)
+
+    def with_structured_output(self, schema: Any, **kwargs: Any):
+        # 구조화 출력 방식(ChatOpenAI 기본값 json_schema 등)도 실제 모델의 것을 그대로 씁니다.
+        # 실제 모델이 만든 "모델 바인딩 | 파서"에서 바인딩만 이 모델로 바꿔 속도 제한/캐시를 거치게 합니다.
+        structured = self.inner.with_structured_output(schema, **kwargs)
+        steps = structured.steps if isinstance(structured, RunnableSequence) else []
+        if steps and isinstance(steps[0], RunnableBinding) and steps[0].bound is self.inner:
+            return RunnableSequence(self.bind(**steps[0].kwargs), *steps[1:])
+        return super().with_structured_output(schema, **kwargs)
+
+    def _estimate(self, messages: Sequence[BaseMessage]) -> int:
+        return _prompt_tokens(messages) + self.expected_output_tokens
+
+    def _call_with_retry(self, messages: List[BaseMessage], call: Callable[[], ChatResult],
+                         run_manager: Any = None) -> ChatResult:
+        estimated = self._estimate(messages)
+        for attempt in range(self.retry.max_retries + 1):
+            with _waiting(run_manager):
+                self.limiter.acquire(estimated)
+            try:
+                result = call()
+            except Exception as exc:
+                self.limiter.release(estimated, None)
+                if attempt >= self.retry.max_retries or not is_retryable_error(exc):
+                    raise
+                self.limiter.on_retry(exc)
+                with _waiting(run_manager), metrics.timed("llm_wait_ms"):
+                    time.sleep(self.retry.delay(attempt, exc))
+                continue
+            self.limiter.release(estimated, _usage_tokens(result))
+            self.limiter.on_success()
+            return result
+        raise AssertionError("unreachable")
+
+    async def _acall_with_retry(self, messages: List[BaseMessage], call, run_manager: Any = None) -> ChatResult:
+        estimated = self._estimate(messages)
+        for attempt in range(self.retry.max_retries + 1):
+            with _waiting(run_manager):
+                await self.limiter.aacquire(estimated)
+            try:
+                result = await call()
+            except Exception as exc:
+                self.limiter.release(estimated, None)
+                if attempt >= self.retry.max_retries or not is_retryable_error(exc):
+                    raise
+                self.limiter.on_retry(exc)
+                with _waiting(run_manager), metrics.timed("llm_wait_ms"):
+                    await asyncio.sleep(self.retry.delay(attempt, exc))
+                continue
+            self.limiter.release(estimated, _usage_tokens(result))
+            self.limiter.on_success()
+            return result
+        raise AssertionError("unreachable")
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        return self._call_with_retry(messages, lambda: self.inner._generate(messages, stop=stop, **kwargs), run_manager)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        return await self._acall_with_retry(
+            messages, lambda: self.inner._agenerate(messages, stop=stop, **kwargs), run_manager
+        )
+
+    # 스트리밍은 첫 조각을 받기 전까지만 재시도합니다 (이미 화면에 출력된 조각은 되돌릴 수 없으므로).
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Any = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        estimated = self._estimate(messages)
+        for attempt in range(self.retry.max_retries + 1):
+            with _waiting(run_manager):
+                self.limiter.acquire(estimated)
+            stream = self.inner._stream(messages, stop=stop, **kwargs)
+            try:
+                first = next(stream)
+            except StopIteration:
+                self.limiter.release(estimated, None)
+                return
+            except Exception as exc:
+                self.limiter.release(estimated, None)
+                if attempt >= self.retry.max_retries or not is_retryable_error(exc):
+                    raise
+                self.limiter.on_retry(exc)
+                with _waiting(run_manager), metrics.timed("llm_wait_ms"):
+                    time.sleep(self.retry.delay(attempt, exc))
+                continue
+            try:
+                for chunk in itertools.chain([first], stream):
+                    if run_manager:
+                        run_manager.on_llm_new_token(_chunk_text(chunk))
+                    yield chunk
+            finally:
+                self.limiter.release(estimated, None)
+            self.limiter.on_success()
+            return
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Any = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        estimated = self._estimate(messages)
+        for attempt in range(self.retry.max_retries + 1):
+            with _waiting(run_manager):
+                await self.limiter.aacquire(estimated)
+            stream = self.inner._astream(messages, stop=stop, **kwargs)
+            try:
+                first = await stream.__anext__()
+            except StopAsyncIteration:
+                self.limiter.release(estimated, None)
+                return
+            except Exception as exc:
+                self.limiter.release(estimated, None)
+                if attempt >= self.retry.max_retries or not is_retryable_error(exc):
+                    raise
+                self.limiter.on_retry(exc)
+                with _waiting(run_manager), metrics.timed("llm_wait_ms"):
+                    await asyncio.sleep(self.retry.delay(attempt, exc))
+                continue
+            try:
+                chunk = first
+                while True:
+                    if run_manager:
+                        await run_manager.on_llm_new_token(_chunk_text(chunk))
+                    yield chunk
+                    try:
+                        chunk = await stream.__anext__()
+                    except StopAsyncIteration:
+                        break
+            finally:
+                self.limiter.release(estimated, None)
+            self.limiter.on_success()
+            return
+
@@ -0,0 +1,95 @@
+import argparse
+import re
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import src.agents as agents
+import src.vector_db as vector_db
+
+
+def _warmup_tasks() -> Dict[str, Callable[[], object]]:
+    return {
+        "llm": agents.get_llm,
+        "redis": lambda: agents.get_redis_client().ping(),
+        "embedding_model": vector_db.load_embedding_model,
+        "vector_store": vector_db.get_vector_store,
+    }
+
+
+def warmup(include: Optional[Sequence[str]] = None) -> Dict[str, float]:
+    """
+    LLM, Redis, 임베딩 모델, 벡터 저장소를 병렬로 미리 초기화합니다.
+    항목별 소요 시간(초)을 반환하며, 실패한 항목은 예외를 그대로 전달합니다.
+    """
+    tasks = _warmup_tasks()
+    if include is not None:
+        tasks = {name: task for name, task in tasks.items() if name in include}
+
+    def _timed(task: Callable[[], object]) -> float:
+        start = time.perf_counter()
+        task()
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=max(1, len(tasks))) as executor:
+        futures = {name: executor.submit(_timed, task) for name, task in tasks.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+
+_IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+\d+\s+\|\s*(\S+)")
+
+
+def import_time_report(module: str = "src.graph", top: int = 15) -> List[Tuple[str, float, int]]:
+    """
+    `python -X importtime`으로 module을 import 하고, 최상위 패키지별로
+    자체 import 시간을 합산하여 (패키지, 합계 ms, 모듈 수) 목록을 큰 순서대로 반환합니다.
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+    )
+    totals: Dict[str, float] = {}
+    counts: Dict[str, int] = {}
+    for line in completed.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        self_us, name = match.groups()
+        package = name.split(".")[0]
+        totals[package] = totals.get(package, 0.0) + int(self_us) / 1000
+        counts[package] = counts.get(package, 0) + 1
+
+    ranked = sorted(totals.items(), key=lambda item: item[1], reverse=True)[:top]
+    return [(package, total_ms, counts[package]) for package, total_ms in ranked]
+
+
+if __name__ == "__main__":
+    from rich.table import Table
+
+    import src.console as console
+
+    parser = argparse.ArgumentParser(description="시작 시간 분석 및 사전 초기화 도구")
+    parser.add_argument("--import-report", action="store_true", help="import 시간 상위 모듈을 출력합니다.")
+    parser.add_argument("--module", default="src.graph", help="import 시간을 측정할 모듈")
+    parser.add_argument("--warmup", action="store_true", help="모델/클라이언트를 병렬 초기화하고 소요 시간을 출력합니다.")
+    args = parser.parse_args()
+
+    if args.import_report:
+        table = Table(title=f"import 시간 ({args.module})")
+        table.add_column("패키지", style="cyan")
+        table.add_column("import 시간 (ms)", justify="right")
+        table.add_column("모듈 수", justify="right")
+        for package, total_ms, count in import_time_report(args.module):
+            table.add_row(package, f"{total_ms:.1f}", str(count))
+        console.console.print(table)
+
+    if args.warmup:
+        table = Table(title="warmup 소요 시간")
+        table.add_column("항목", style="cyan")
+        table.add_column("초", justify="right")
+        for name, seconds in warmup().items():
+            table.add_row(name, f"{seconds:.2f}")
+        console.console.print(table)
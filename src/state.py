@@ -1,5 +1,7 @@
 from typing import List, TypedDict, Optional
 
+from src.transcript import TranscriptStore
+
 class AgentSpeech(TypedDict):
     """에이전트의 발언을 저장하는 형식"""
     agent_name: str
@@ -8,10 +10,12 @@ class AgentSpeech(TypedDict):
 class TrialState(TypedDict):
     """재판 전체의 상태를 관리하는 형식"""
     case_file: str
+    case_id: Optional[str]  # 데이터셋의 caseId (사건 아카이브의 결정적 문서 id에 사용)
     plaintiff_lawyer: str
     defendant_lawyer: str
     selected_judges: List[dict]
     debate_transcript: List[AgentSpeech]
+    transcript: TranscriptStore  # 프롬프트용 토론 기록 (오래된 턴은 요약본으로 대체)
     turn_count: int
     max_turns: int
     associate_judge_verdicts: List[AgentSpeech]
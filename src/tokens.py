@@ -0,0 +1,14 @@
+import re
+
+_HANGUL = re.compile(r"[가-힣]")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    프롬프트 예산 계산용 토큰 수 추정치입니다. 토크나이저 없이 동작하도록
+    한글 음절은 1토큰, 그 밖의 문자는 4글자당 1토큰으로 셉니다.
+    """
+    if not text:
+        return 0
+    hangul = len(_HANGUL.findall(text))
+    return hangul + (len(text) - hangul + 3) // 4
@@ -0,0 +1,64 @@
+import os
+from typing import List, TypedDict
+
+from src.tokens import estimate_tokens
+
+# 토론 기록 중 원문으로 남긴 부분이 이 토큰 수를 넘으면 오래된 턴을 요약본으로 접습니다.
+TRANSCRIPT_SUMMARY_THRESHOLD = int(os.getenv("TRANSCRIPT_SUMMARY_THRESHOLD", "3000"))
+# 요약할 때도 원문 그대로 남겨 둘 최근 턴 수 (직전 발언을 정확히 반박할 수 있도록)
+TRANSCRIPT_KEEP_RECENT_TURNS = int(os.getenv("TRANSCRIPT_KEEP_RECENT_TURNS", "2"))
+
+
+class TranscriptStore(TypedDict):
+    """
+    프롬프트에 넣을 토론 기록입니다. 발언은 한 줄씩 덧붙이고(recent),
+    토큰 임계치를 넘으면 오래된 줄을 요약본(summary)에 접어 넣습니다.
+    전체 원문은 State의 debate_transcript에 그대로 남아 있습니다.
+    """
+    summary: str
+    summarized_turns: int
+    recent: List[str]
+    recent_tokens: List[int]
+
+
+def new_transcript() -> TranscriptStore:
+    return {"summary": "", "summarized_turns": 0, "recent": [], "recent_tokens": []}
+
+
+def append_speech(transcript: TranscriptStore, agent_name: str, speech: str) -> None:
+    line = f"{agent_name}: {speech}"
+    transcript['recent'].append(line)
+    transcript['recent_tokens'].append(estimate_tokens(line))
+
+
+def render_transcript(transcript: TranscriptStore) -> str:
+    """요약본(있다면)과 최근 원문 턴을 이어 프롬프트용 문자열을 만듭니다."""
+    recent = "\n".join(transcript['recent'])
+    if not transcript['summary']:
+        return recent
+    return (
+        f"[1~{transcript['summarized_turns']}턴 요약]\n{transcript['summary']}\n\n"
+        f"[최근 발언]\n{recent}"
+    )
+
+
+def turns_to_summarize(transcript: TranscriptStore) -> int:
+    """요약본으로 접어야 할 오래된 턴 수를 반환합니다. 임계치 이하라면 0입니다."""
+    if sum(transcript['recent_tokens']) <= TRANSCRIPT_SUMMARY_THRESHOLD:
+        return 0
+    return max(0, len(transcript['recent']) - TRANSCRIPT_KEEP_RECENT_TURNS)
+
+
+def summary_inputs(transcript: TranscriptStore, count: int) -> dict:
+    return {
+        "previous_summary": transcript['summary'] or "(없음)",
+        "new_turns": "\n".join(transcript['recent'][:count]),
+    }
+
+
+def fold_summary(transcript: TranscriptStore, count: int, summary: str) -> None:
+    """앞의 count개 턴을 새 요약본으로 대체합니다."""
+    transcript['summary'] = summary
+    transcript['summarized_turns'] += count
+    del transcript['recent'][:count]
+    del transcript['recent_tokens'][:count]
@@ -0,0 +1,88 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Sequence, Tuple
+
+import src.lesson_store as lesson_store
+import src.vector_db as vector_db
+from src.lesson_store import LAWYER_KEY_PREFIXES
+
+
+class TrialContext(NamedTuple):
+    """한 재판 동안 변하지 않는 검색 결과 (유사 사건, 변호사별 교훈 프롬프트)."""
+    similar_cases: str
+    lessons: Dict[str, str]
+
+
+class TrialContextCache:
+    """
+    사건 파일별로 유사 사건 검색과 양측 교훈 조회 결과를 한 번만 계산해 재사용합니다.
+    사건 아카이브나 교훈이 새로 기록되면(세대 번호 변경) 다음 조회 때 다시 계산합니다.
+    """
+
+    def __init__(self, max_entries: int = 32):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[Tuple[int, int], TrialContext]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(case_file: str) -> str:
+        return hashlib.sha256(case_file.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _generation() -> Tuple[int, int]:
+        return vector_db.archive_generation(), lesson_store.lesson_generation()
+
+    def get(self, redis_client, case_file: str,
+            db_key_prefixes: Sequence[str] = LAWYER_KEY_PREFIXES) -> TrialContext:
+        key = self._key(case_file)
+        generation = self._generation()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == generation:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        context = self._build(redis_client, case_file, db_key_prefixes)
+        with self._lock:
+            self._entries[key] = (generation, context)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return context
+
+    @staticmethod
+    def _build(redis_client, case_file: str, db_key_prefixes: Sequence[str]) -> TrialContext:
+        similar_cases = vector_db.search_similar_cases(case_file)
+        # 양측 변호사의 교훈 리스트와 임베딩을 파이프라인 한 번으로 읽습니다.
+        raw = lesson_store.fetch_raw_lessons(redis_client, db_key_prefixes)
+        lessons = {
+            prefix: lesson_store.format_lessons(
+                lesson_store.rank_lessons(redis_client, prefix, case_file, raw=raw[prefix])
+            )
+            for prefix in db_key_prefixes
+        }
+        return TrialContext(similar_cases=similar_cases, lessons=lessons)
+
+    def invalidate(self, case_file: Optional[str] = None) -> None:
+        with self._lock:
+            if case_file is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(self._key(case_file), None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+
+trial_context_cache = TrialContextCache()
+
+
+def get_trial_context(redis_client, case_file: str) -> TrialContext:
+    """현재 사건의 유사 사건/교훈 검색 결과를 반환합니다 (재판 중에는 캐시 재사용)."""
+    return trial_context_cache.get(redis_client, case_file)
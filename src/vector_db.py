@@ -1,17 +1,39 @@
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_postgres import PGVector
-from langchain.docstore.document import Document
+import asyncio
+import hashlib
 import os
+import re
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+
+from src.embedding_backends import SentenceTransformerEmbeddings, embedding_model_id, embedding_settings
+from src.embedding_cache import CachedEmbeddings, normalize_text
+import src.metrics as metrics
+import src.namespace as namespace
+from src.lazy import Lazy
+from src.lexical_index import LexicalIndex
+
+# 모델/DB 클라이언트는 import 시점이 아니라 처음 사용할 때 생성합니다.
+# (get_embeddings / get_engine / get_vector_store 참고)
 
 # 사용할 임베딩 모델 설정 (이전과 동일)
 model_name = "jhgan/ko-sbert-nli"
 model_kwargs = {'device': 'cpu'}
 encode_kwargs = {'normalize_embeddings': True}
-embeddings = HuggingFaceEmbeddings(
-    model_name=model_name,
-    model_kwargs=model_kwargs,
-    encode_kwargs=encode_kwargs
-)
+# 배치 크기, 스레드 수, 최대 시퀀스 길이, int8 양자화/ONNX 실행 여부 (EMBEDDING_* 환경 변수)
+embedding_config = embedding_settings()
+
+# 동일한 사건 텍스트를 반복 인코딩하지 않도록 임베딩 캐시를 씌웁니다.
+# EMBEDDING_CACHE=off 이면 디스크 캐시를 끄고 메모리 LRU만 사용합니다.
+_project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+embedding_cache_dir = None
+if os.getenv("EMBEDDING_CACHE", "on").lower() not in ("0", "off", "false", "no"):
+    embedding_cache_dir = os.getenv(
+        "EMBEDDING_CACHE_DIR", os.path.join(_project_root, ".cache", "embeddings")
+    )
 
 # PostgreSQL 연결 정보
 # docker-compose.yml에 설정한 값과 동일해야 합니다.
@@ -25,76 +47,733 @@ connection_string = (
     f"postgresql+psycopg2://{postgres_user}:{postgres_password}"
     f"@{postgres_host}:{postgres_port}/{postgres_db}"
 )
-collection_name = "agent_court_cases"
-
-# PGVector 스토어 객체 생성
-# 이 객체를 통해 DB에 접속하고 데이터를 관리합니다.
-vector_store = PGVector(
-    embeddings=embeddings,
-    collection_name=collection_name,
-    connection=connection_string,
-    use_jsonb=True,
+# 비동기 접근(asearch_similar_cases 등)에는 psycopg 3 드라이버를 사용합니다.
+async_connection_string = (
+    f"postgresql+psycopg://{postgres_user}:{postgres_password}"
+    f"@{postgres_host}:{postgres_port}/{postgres_db}"
 )
 
+# 커넥션 풀 설정 (동기/비동기 엔진 각각에 적용)
+pool_size = int(os.getenv("POSTGRES_POOL_SIZE", "5"))
+pool_max_overflow = int(os.getenv("POSTGRES_MAX_OVERFLOW", "10"))
+pool_timeout = float(os.getenv("POSTGRES_POOL_TIMEOUT", "30"))
+pool_recycle = int(os.getenv("POSTGRES_POOL_RECYCLE", "1800"))
+pool_pre_ping = os.getenv("POSTGRES_POOL_PRE_PING", "true").lower() in ("1", "true", "yes", "on")
+# 실험 네임스페이스(EXPERIMENT_ID)가 지정되면 get_collection_name()이 실험 전용 컬렉션 이름을 반환합니다.
+base_collection_name = "agent_court_cases"
+
+# ANN 인덱스 설정
+# ko-sbert 임베딩 차원을 고정해야 pgvector가 HNSW/IVFFlat 인덱스를 만들 수 있습니다.
+embedding_dimension = int(os.getenv("EMBEDDING_DIMENSION", "768"))
+ann_index_type = os.getenv("PGVECTOR_INDEX_TYPE", "hnsw").lower()
+hnsw_m = int(os.getenv("PGVECTOR_HNSW_M", "16"))
+hnsw_ef_construction = int(os.getenv("PGVECTOR_HNSW_EF_CONSTRUCTION", "64"))
+hnsw_ef_search = os.getenv("PGVECTOR_HNSW_EF_SEARCH")
+ivfflat_lists = int(os.getenv("PGVECTOR_IVFFLAT_LISTS", "100"))
+ivfflat_probes = os.getenv("PGVECTOR_IVFFLAT_PROBES")
+
+# 일괄 저장 시 한 번에 임베딩/INSERT 할 사건 수
+archive_batch_size = int(os.getenv("ARCHIVE_BATCH_SIZE", "64"))
+
+# 벡터 저장소 백엔드 선택
+# - pgvector (기본값): docker-compose의 PostgreSQL + pgvector
+# - local: Postgres 없이 동작하는 인프로세스 NumPy 저장소 (단일 노드 실험/CI용)
+vector_backend = os.getenv("VECTOR_BACKEND", "pgvector").lower()
+local_vector_dir = os.getenv("LOCAL_VECTOR_DIR", os.path.join(_project_root, ".cache", "vector_store"))
+
+# 유사 사건 검색 방식
+# - dense (기본값): 컬렉션 전체를 임베딩 유사도로 검색
+# - hybrid: n-gram 역색인으로 후보를 좁힌 뒤 후보만 임베딩 유사도로 정렬
+retrieval_mode = os.getenv("RETRIEVAL_MODE", "dense").lower()
+lexical_candidates = int(os.getenv("LEXICAL_CANDIDATES", "200"))
+# 문서의 이 비율보다 많이 등장하는 n-gram은 질의에서 제외합니다.
+# 학습 데이터에서 소장 서식 문구는 50% 이상, 분쟁 유형 용어(손해, 배상, 위반 등)는 20~30%의 사건에 나오므로 30%로 자릅니다.
+lexical_max_df_ratio = float(os.getenv("LEXICAL_MAX_DF_RATIO", "0.3"))
+lexical_max_query_grams = int(os.getenv("LEXICAL_MAX_QUERY_GRAMS", "64"))
+lexical_index_dir = os.getenv("LEXICAL_INDEX_DIR", os.path.join(_project_root, ".cache", "lexical_index"))
+
+if vector_backend not in ("pgvector", "local"):
+    raise ValueError("지원하지 않는 VECTOR_BACKEND 값입니다. pgvector 또는 local 중 하나를 사용해주세요.")
+
+
+def _init_base_embeddings():
+    return SentenceTransformerEmbeddings(
+        model_name=model_name,
+        device=model_kwargs['device'],
+        normalize_embeddings=encode_kwargs['normalize_embeddings'],
+        **embedding_config,
+    )
+
+
+def _init_embeddings() -> CachedEmbeddings:
+    return CachedEmbeddings(
+        _base_embeddings,
+        model_name=embedding_model_id(model_name, embedding_config),
+        cache_dir=embedding_cache_dir,
+        max_memory_items=int(os.getenv("EMBEDDING_CACHE_MEMORY_SIZE", "2048")),
+    )
+
+
+class PoolStats:
+    """커넥션 풀 checkout 횟수와 대기 시간을 누적합니다."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, wait: float) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "total_wait_s": self.total_wait,
+                "avg_wait_ms": (self.total_wait / self.checkouts * 1000) if self.checkouts else 0.0,
+                "max_wait_ms": self.max_wait * 1000,
+            }
+
+
+_pool_stats = {"sync": PoolStats(), "async": PoolStats()}
+
+
+def _instrumented_pool(base_class, stats: PoolStats):
+    """풀에서 커넥션을 꺼낼 때 걸린 시간(대기 + 신규 연결)을 기록하는 풀 클래스를 만듭니다."""
+
+    class InstrumentedPool(base_class):
+        def _do_get(self):
+            start = time.perf_counter()
+            try:
+                return super()._do_get()
+            finally:
+                stats.record(time.perf_counter() - start)
+
+    return InstrumentedPool
+
+
+def _pool_kwargs() -> Dict[str, Any]:
+    return {
+        "pool_size": pool_size,
+        "max_overflow": pool_max_overflow,
+        "pool_timeout": pool_timeout,
+        "pool_recycle": pool_recycle,
+        "pool_pre_ping": pool_pre_ping,
+    }
+
+
+def _apply_ann_search_settings(dbapi_connection, connection_record):
+    """새 커넥션마다 ANN 검색 파라미터(ef_search / probes)를 적용합니다."""
+    cursor = dbapi_connection.cursor()
+    if hnsw_ef_search:
+        cursor.execute(f"SET hnsw.ef_search = {int(hnsw_ef_search)}")
+    if ivfflat_probes:
+        cursor.execute(f"SET ivfflat.probes = {int(ivfflat_probes)}")
+    cursor.close()
+
+
+# 시작 시각은 실행 컨텍스트(문장 한 번 실행)마다 따로 둡니다. 커넥션에 스택으로 쌓으면
+# 실패한 문장(after_cursor_execute가 호출되지 않음)의 시각이 남아 다음 쿼리가 잘못된 값을 꺼냅니다.
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._query_start = time.perf_counter()
+
+
+def _stop_query_timer(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, "_query_start", None)
+    if start is not None:
+        metrics.record("postgres_ms", (time.perf_counter() - start) * 1000)
+
+
+def _instrument_queries(engine) -> None:
+    """SQL 실행 시간을 현재 재판의 노드 계측값(postgres_ms)에 더합니다."""
+    from sqlalchemy import event
+
+    event.listen(engine, "before_cursor_execute", _start_query_timer)
+    event.listen(engine, "after_cursor_execute", _stop_query_timer)
+
+
+def _init_engine():
+    from sqlalchemy import create_engine, event
+    from sqlalchemy.pool import QueuePool
+
+    engine = create_engine(
+        connection_string,
+        poolclass=_instrumented_pool(QueuePool, _pool_stats["sync"]),
+        **_pool_kwargs(),
+    )
+    event.listen(engine, "connect", _apply_ann_search_settings)
+    _instrument_queries(engine)
+    return engine
+
+
+def _init_async_engine():
+    from sqlalchemy import event
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+    async_engine = create_async_engine(
+        async_connection_string,
+        poolclass=_instrumented_pool(AsyncAdaptedQueuePool, _pool_stats["async"]),
+        **_pool_kwargs(),
+    )
+    event.listen(async_engine.sync_engine, "connect", _apply_ann_search_settings)
+    _instrument_queries(async_engine.sync_engine)
+    return async_engine
+
+
+def get_collection_name() -> str:
+    """현재 실험 네임스페이스의 사건 아카이브 컬렉션 이름을 반환합니다."""
+    return namespace.collection_name(base_collection_name)
+
+
+def _init_vector_store():
+    if vector_backend == "local":
+        from src.local_vector_store import LocalVectorStore
+
+        store = LocalVectorStore(
+            embeddings=get_embeddings(),
+            collection_name=get_collection_name(),
+            root_dir=local_vector_dir,
+            embedding_length=embedding_dimension,
+        )
+    else:
+        from langchain_postgres import PGVector
+
+        # PGVector 스토어 객체 생성
+        # 이 객체를 통해 DB에 접속하고 데이터를 관리합니다.
+        store = PGVector(
+            embeddings=get_embeddings(),
+            collection_name=get_collection_name(),
+            connection=get_engine(),
+            embedding_length=embedding_dimension,
+            use_jsonb=True,
+        )
+
+    try:
+        store.create_collection()
+    except Exception as e:
+        if not _is_existing_collection_error(e):
+            raise
+    return store
+
+
+def _init_async_vector_store():
+    from langchain_postgres import PGVector
+
+    # async_mode 스토어는 첫 비동기 호출 때 테이블/컬렉션을 준비합니다.
+    return PGVector(
+        embeddings=get_embeddings(),
+        collection_name=get_collection_name(),
+        connection=get_async_engine(),
+        embedding_length=embedding_dimension,
+        use_jsonb=True,
+        async_mode=True,
+    )
+
+
+_base_embeddings: Lazy = Lazy(_init_base_embeddings)
+_embeddings: Lazy[CachedEmbeddings] = Lazy(_init_embeddings)
+_engine: Lazy = Lazy(_init_engine)
+_async_engine: Lazy = Lazy(_init_async_engine)
+_vector_store: Lazy = Lazy(_init_vector_store)
+_async_vector_store: Lazy = Lazy(_init_async_vector_store)
+_lexical_index: Lazy[LexicalIndex] = Lazy(
+    lambda: LexicalIndex(
+        os.path.join(lexical_index_dir, f"{get_collection_name()}.sqlite3"),
+        max_df_ratio=lexical_max_df_ratio,
+        max_query_grams=lexical_max_query_grams,
+    )
+)
+
+
+def load_embedding_model():
+    """sentence-transformers 모델을 즉시 로드합니다 (warmup 용)."""
+    return _base_embeddings.get()
+
+
+def get_embeddings() -> CachedEmbeddings:
+    """캐시가 적용된 임베딩 객체를 반환합니다. 모델은 첫 캐시 미스 때 로드됩니다."""
+    return _embeddings.get()
+
+
+def get_engine():
+    """pgvector 백엔드의 SQLAlchemy 엔진을 반환합니다. local 백엔드에서는 None입니다."""
+    if vector_backend != "pgvector":
+        return None
+    return _engine.get()
+
+
+def get_async_engine():
+    """pgvector 백엔드의 비동기 SQLAlchemy 엔진을 반환합니다. local 백엔드에서는 None입니다."""
+    if vector_backend != "pgvector":
+        return None
+    return _async_engine.get()
+
+
+def pool_status() -> Dict[str, Dict[str, Any]]:
+    """동기/비동기 커넥션 풀의 checkout 횟수, 대기 시간, 현재 풀 상태를 반환합니다."""
+    status: Dict[str, Dict[str, Any]] = {}
+    for name, holder in (("sync", _engine), ("async", _async_engine)):
+        snapshot: Dict[str, Any] = dict(_pool_stats[name].snapshot())
+        if holder.loaded:
+            engine = holder.get()
+            pool = engine.sync_engine.pool if name == "async" else engine.pool
+            snapshot["pool"] = pool.status()
+        status[name] = snapshot
+    return status
+
+
+def get_vector_store():
+    """설정된 백엔드의 벡터 저장소를 반환합니다. 최초 호출 시 컬렉션을 생성합니다."""
+    return _vector_store.get()
+
+
+# 사건 아카이브가 바뀔 때마다 증가하는 프로세스 내 세대 번호 (재판 컨텍스트 캐시 무효화용)
+_archive_generation = 0
+_archive_generation_lock = threading.Lock()
+
+
+def archive_generation() -> int:
+    return _archive_generation
+
+
+def _bump_archive_generation() -> None:
+    global _archive_generation
+    with _archive_generation_lock:
+        _archive_generation += 1
+
+
+def _on_namespace_change() -> None:
+    # 컬렉션에 묶인 객체만 다시 만들고, 임베딩 모델과 커넥션 풀은 그대로 재사용합니다.
+    for holder in (_vector_store, _async_vector_store, _lexical_index):
+        holder.reset()
+    _bump_archive_generation()
+
+
+namespace.on_change(_on_namespace_change)
+
+
+def get_lexical_index() -> LexicalIndex:
+    """사건 아카이브와 함께 유지되는 n-gram 역색인을 반환합니다."""
+    return _lexical_index.get()
+
+
+def __getattr__(name: str) -> Any:
+    # 기존 코드의 `from src.vector_db import vector_store` 형태를 위한 지연 속성
+    if name == "embeddings":
+        return get_embeddings()
+    if name == "engine":
+        return get_engine()
+    if name == "vector_store":
+        return get_vector_store()
+    if name == "collection_name":
+        return get_collection_name()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 def _is_existing_collection_error(error: Exception) -> bool:
     message = str(error).lower()
     return "already exists" in message or "duplicate" in message
 
 
-try:
-    vector_store.create_collection()
-except Exception as e:
-    if not _is_existing_collection_error(e):
-        raise
-
-
 def ensure_collection():
     try:
-        vector_store.create_collection()
+        get_vector_store().create_collection()
     except Exception as e:
         if _is_existing_collection_error(e):
             return
         raise
 
-def add_case_to_db(case_summary: str, verdict: str, plaintiff_lesson: str, defendant_lesson: str):
+
+def reset_collection():
+    """현재 컬렉션과 n-gram 역색인을 비우고 빈 컬렉션을 다시 만듭니다."""
+    get_vector_store().delete_collection()
+    get_lexical_index().clear()
+    ensure_collection()
+    _bump_archive_generation()
+
+
+def iter_archive_documents(batch_size: int = 1000) -> Iterator[Tuple[str, str, Dict[str, Any]]]:
+    """아카이브에 저장된 (문서 id, 사건 요약, 메타데이터)를 순회합니다."""
+    if vector_backend == "local":
+        yield from get_vector_store().iter_documents()
+        return
+
+    from sqlalchemy import text
+
+    with get_engine().connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(
+            text(
+                "SELECT e.id, e.document, e.cmetadata FROM langchain_pg_embedding e "
+                "JOIN langchain_pg_collection c ON c.uuid = e.collection_id "
+                "WHERE c.name = :name ORDER BY e.id"
+            ),
+            {"name": get_collection_name()},
+        )
+        for doc_id, document, metadata in result:
+            yield doc_id, document, metadata or {}
+
+
+def rebuild_lexical_index(batch_size: int = 1000) -> int:
+    """아카이브 전체로 n-gram 역색인을 다시 만듭니다. 색인된 문서 수를 반환합니다."""
+    index = get_lexical_index()
+    index.clear()
+    total = 0
+    batch: List[Tuple[str, str]] = []
+    for doc_id, document, _ in iter_archive_documents(batch_size):
+        batch.append((doc_id, document))
+        if len(batch) >= batch_size:
+            index.add(batch)
+            total += len(batch)
+            batch = []
+    if batch:
+        index.add(batch)
+        total += len(batch)
+    return total
+
+
+def ann_index_name(index_type: Optional[str] = None) -> str:
+    index_type = index_type or ann_index_type
+    return re.sub(r"\W", "_", f"ix_{get_collection_name()}_embedding_{index_type}")
+
+
+def ensure_ann_index(index_type: Optional[str] = None):
+    """
+    embedding 컬럼의 차원을 고정하고, 현재 컬렉션에 한정된 코사인 ANN 인덱스를 생성합니다.
+    컬렉션 UUID는 실행 시점에 정해지므로 init.sql이 아닌 이 함수에서 부분 인덱스를 만듭니다.
+    """
+    from sqlalchemy import text
+
+    index_type = index_type or ann_index_type
+    engine = get_engine()
+    if engine is None:
+        raise ValueError("ANN 인덱스는 VECTOR_BACKEND=pgvector 에서만 사용할 수 있습니다.")
+    if index_type not in ("hnsw", "ivfflat"):
+        raise ValueError("PGVECTOR_INDEX_TYPE은 hnsw 또는 ivfflat 중 하나여야 합니다.")
+
+    ensure_collection()
+    with engine.begin() as conn:
+        column_type = conn.execute(text(
+            "SELECT format_type(atttypid, atttypmod) FROM pg_attribute "
+            "WHERE attrelid = 'langchain_pg_embedding'::regclass AND attname = 'embedding'"
+        )).scalar()
+        if column_type == "vector":
+            conn.execute(text(
+                f"ALTER TABLE langchain_pg_embedding "
+                f"ALTER COLUMN embedding TYPE vector({embedding_dimension})"
+            ))
+
+        collection_id = conn.execute(
+            text("SELECT uuid FROM langchain_pg_collection WHERE name = :name"),
+            {"name": get_collection_name()},
+        ).scalar()
+
+        if index_type == "hnsw":
+            method = f"hnsw (embedding vector_cosine_ops) WITH (m = {hnsw_m}, ef_construction = {hnsw_ef_construction})"
+        else:
+            method = f"ivfflat (embedding vector_cosine_ops) WITH (lists = {ivfflat_lists})"
+        conn.execute(text(
+            f"CREATE INDEX IF NOT EXISTS {ann_index_name(index_type)} "
+            f"ON langchain_pg_embedding USING {method} "
+            f"WHERE collection_id = '{collection_id}'"
+        ))
+    print(f"✅ '{get_collection_name()}' 컬렉션에 {index_type} 인덱스가 준비되었습니다.")
+
+
+# 사건 문서 id 네임스페이스. 같은 사건은 항상 같은 id로 저장되어 재실행 시 덮어쓰기(upsert) 됩니다.
+CASE_ID_NAMESPACE = uuid.UUID("6f1c5d1e-8f0a-4c55-9a53-6a3f3b7c2d10")
+
+
+def case_document_id(case_summary: str, case_id: Optional[str] = None) -> str:
+    """
+    사건 문서의 결정적 id를 만듭니다.
+    caseId가 있으면 caseId로, 없으면 정규화된 사건 요약의 해시로 uuid5를 계산합니다.
+    PGVector는 id 충돌 시 collection_id를 바꾸지 않고 덮어쓰므로, 실험 네임스페이스끼리
+    같은 사건이 서로의 문서를 덮어쓰지 않도록 컬렉션 이름도 id에 포함합니다.
+    """
+    if case_id and case_id != "N/A":
+        name = f"case:{case_id}"
+    else:
+        digest = hashlib.sha256(normalize_text(case_summary).encode("utf-8")).hexdigest()
+        name = f"content:{digest}"
+    return str(uuid.uuid5(CASE_ID_NAMESPACE, f"{get_collection_name()}:{name}"))
+
+
+def _case_metadata(verdict: str, plaintiff_lesson: str, defendant_lesson: str,
+                   case_id: Optional[str] = None, plaintiff_outcome: Optional[str] = None) -> Dict[str, Any]:
+    metadata: Dict[str, Any] = {
+        "verdict": verdict,
+        "plaintiff_lesson": plaintiff_lesson,
+        "defendant_lesson": defendant_lesson,
+    }
+    if case_id and case_id != "N/A":
+        metadata["case_id"] = case_id
+    # 원고측 승패는 판결문 승패 분류기의 학습 라벨로 사용합니다 (outcome_classifier.py train).
+    if plaintiff_outcome:
+        metadata["plaintiff_outcome"] = plaintiff_outcome
+    return metadata
+
+
+def add_case_to_db(case_summary: str, verdict: str, plaintiff_lesson: str, defendant_lesson: str,
+                   case_id: Optional[str] = None, plaintiff_outcome: Optional[str] = None):
     """
     재판이 끝난 사건의 요약과 결과를 PostgreSQL DB에 추가합니다.
+    같은 사건(caseId 또는 같은 요약)은 새로 추가되지 않고 최신 결과로 덮어씁니다.
     """
     ensure_collection()
     doc = Document(
         page_content=case_summary,
-        metadata={
-            "verdict": verdict,
-            "plaintiff_lesson": plaintiff_lesson,
-            "defendant_lesson": defendant_lesson
-        }
+        metadata=_case_metadata(verdict, plaintiff_lesson, defendant_lesson, case_id, plaintiff_outcome),
     )
-    vector_store.add_documents([doc])
+    doc_id = case_document_id(case_summary, case_id)
+    get_vector_store().add_documents([doc], ids=[doc_id])
+    get_lexical_index().add([(doc_id, case_summary)])
+    _bump_archive_generation()
     print(f"✅ PostgreSQL 벡터 DB에 '{case_summary[:20]}...' 사건이 저장되었습니다.")
 
-def search_similar_cases(query: str, k: int = 2):
+
+class CaseRecord(NamedTuple):
+    """일괄 저장에 사용하는 사건 레코드 (요약, 판결, 원고/피고 교훈, caseId, 원고측 승패)."""
+    case_summary: str
+    verdict: str
+    plaintiff_lesson: str
+    defendant_lesson: str
+    case_id: Optional[str] = None
+    plaintiff_outcome: Optional[str] = None
+
+
+def _write_case_batch(batch: List[CaseRecord]) -> int:
+    # 같은 배치 안에 같은 사건이 여러 번 있으면 마지막 것만 남깁니다.
+    # (ON CONFLICT DO UPDATE는 한 INSERT에서 같은 행을 두 번 갱신할 수 없습니다.)
+    latest: Dict[str, CaseRecord] = {}
+    for record in batch:
+        doc_id = case_document_id(record.case_summary, record.case_id)
+        latest.pop(doc_id, None)
+        latest[doc_id] = record
+
+    ids = list(latest)
+    records = list(latest.values())
+    texts = [record.case_summary for record in records]
+    vectors = get_embeddings().embed_documents(texts)
+    metadatas = [
+        _case_metadata(
+            record.verdict, record.plaintiff_lesson, record.defendant_lesson, record.case_id, record.plaintiff_outcome
+        )
+        for record in records
+    ]
+    # 배치 하나가 하나의 multi-row INSERT ... ON CONFLICT (id) DO UPDATE 트랜잭션으로 기록됩니다.
+    get_vector_store().add_embeddings(texts=texts, embeddings=vectors, metadatas=metadatas, ids=ids)
+    get_lexical_index().add(zip(ids, texts))
+    _bump_archive_generation()
+    return len(records)
+
+
+def add_cases_to_db(records: Iterable[Sequence[str]], batch_size: Optional[int] = None) -> int:
+    """
+    여러 사건을 배치 단위로 임베딩하여 PostgreSQL DB에 한꺼번에 추가합니다.
+    records의 각 항목은 (사건 요약, 판결, 원고측 교훈, 피고측 교훈[, caseId[, 원고측 승패]]) 순서입니다.
+    이미 저장된 사건은 덮어쓰며, 저장(또는 갱신)된 사건 수를 반환합니다.
+    """
+    batch_size = batch_size or archive_batch_size
+    ensure_collection()
+
+    total = 0
+    batch: List[CaseRecord] = []
+    for record in records:
+        batch.append(CaseRecord(*record))
+        if len(batch) >= batch_size:
+            total += _write_case_batch(batch)
+            batch = []
+    if batch:
+        total += _write_case_batch(batch)
+
+    if total:
+        print(f"✅ PostgreSQL 벡터 DB에 사건 {total}건이 일괄 저장되었습니다.")
+    return total
+
+
+def _pg_delete_and_rekey(delete_ids: List[str], rekey: Dict[str, str]) -> None:
+    from sqlalchemy import text
+
+    with get_engine().begin() as conn:
+        if delete_ids:
+            conn.execute(text("DELETE FROM langchain_pg_embedding WHERE id = ANY(:ids)"), {"ids": delete_ids})
+        for old_id, new_id in rekey.items():
+            conn.execute(
+                text("UPDATE langchain_pg_embedding SET id = :new_id WHERE id = :old_id"),
+                {"new_id": new_id, "old_id": old_id},
+            )
+
+
+def dedupe_archive(dry_run: bool = False) -> Dict[str, int]:
+    """
+    아카이브의 중복 사건을 하나로 합치고, 남은 문서의 id를 결정적 id로 바꿉니다.
+    같은 결정적 id(caseId 또는 요약 해시)를 갖는 문서 중 결정적 id를 이미 가진 문서,
+    없으면 가장 나중에 저장된 문서를 남깁니다. 처리 후 n-gram 역색인을 다시 만듭니다.
+    """
+    groups: Dict[str, List[str]] = {}
+    for doc_id, document, metadata in iter_archive_documents():
+        target = case_document_id(document, (metadata or {}).get("case_id"))
+        groups.setdefault(target, []).append(doc_id)
+
+    keep: Dict[str, str] = {}
+    delete_ids: List[str] = []
+    for target, doc_ids in groups.items():
+        survivor = target if target in doc_ids else doc_ids[-1]
+        keep[survivor] = target
+        delete_ids.extend(doc_id for doc_id in doc_ids if doc_id != survivor)
+
+    rekey = {old_id: new_id for old_id, new_id in keep.items() if old_id != new_id}
+    stats = {
+        "documents": sum(len(doc_ids) for doc_ids in groups.values()),
+        "unique": len(groups),
+        "removed": len(delete_ids),
+        "rekeyed": len(rekey),
+    }
+    if dry_run:
+        return stats
+
+    if vector_backend == "local":
+        get_vector_store().compact(keep)
+    else:
+        _pg_delete_and_rekey(delete_ids, rekey)
+    rebuild_lexical_index()
+    _bump_archive_generation()
+    return stats
+
+
+def _format_similar_cases(results) -> str:
+    if not results:
+        return "유사한 과거 사건을 찾지 못했습니다."
+
+    formatted_results = []
+    for doc, score in results:
+        similarity = (1 - score) * 100
+        formatted_results.append(
+            f"유사도 {similarity:.2f}% - 사건 요약: {doc.page_content}\n"
+            f"  - 최종 판결: {doc.metadata['verdict']}\n"
+            f"  - 원고측 교훈: {doc.metadata['plaintiff_lesson']}\n"
+            f"  - 피고측 교훈: {doc.metadata['defendant_lesson']}"
+        )
+
+    return "\n\n".join(formatted_results)
+
+
+def _pg_search_by_ids(embedding: List[float], ids: List[str], k: int):
+    from sqlalchemy import text
+
+    literal = "[" + ",".join(f"{value:.7f}" for value in embedding) + "]"
+    with get_engine().connect() as conn:
+        rows = conn.execute(
+            text(
+                "SELECT e.document, e.cmetadata, "
+                f"e.embedding <=> CAST(:q AS vector({embedding_dimension})) AS distance "
+                "FROM langchain_pg_embedding e "
+                "JOIN langchain_pg_collection c ON c.uuid = e.collection_id "
+                "WHERE c.name = :name AND e.id = ANY(:ids) "
+                "ORDER BY distance LIMIT :k"
+            ),
+            {"q": literal, "name": get_collection_name(), "ids": list(ids), "k": k},
+        ).fetchall()
+    return [
+        (Document(page_content=document, metadata=metadata or {}), float(distance))
+        for document, metadata, distance in rows
+    ]
+
+
+def _hybrid_search(query: str, k: int):
+    """n-gram 역색인으로 후보를 고른 뒤 후보들만 dense 점수로 정렬합니다."""
+    index = get_lexical_index()
+    # 아카이브가 후보 수보다 작으면 prefilter의 이점이 없으므로 전체 dense 검색을 합니다.
+    if len(index) <= lexical_candidates:
+        return get_vector_store().similarity_search_with_score(query, k=k)
+
+    candidate_ids = index.candidates(query, lexical_candidates)
+    if len(candidate_ids) < k:
+        return get_vector_store().similarity_search_with_score(query, k=k)
+
+    embedding = get_embeddings().embed_query(query)
+    if vector_backend == "local":
+        return get_vector_store().similarity_search_with_score_by_ids(embedding, candidate_ids, k=k)
+    return _pg_search_by_ids(embedding, candidate_ids, k)
+
+
+def search_similar_cases(query: str, k: int = 2, mode: Optional[str] = None):
     """
     현재 사건과 유사한 과거 사건을 PostgreSQL DB에서 검색합니다.
+    mode가 "hybrid"이면 n-gram prefilter 후 후보만 dense 점수로 정렬합니다. (기본값: RETRIEVAL_MODE)
     """
+    mode = mode or retrieval_mode
     try:
-        results = vector_store.similarity_search_with_score(query, k=k)
-        
-        if not results:
-            return "유사한 과거 사건을 찾지 못했습니다."
-        
-        formatted_results = []
-        for doc, score in results:
-            similarity = (1 - score) * 100
-            formatted_results.append(
-                f"유사도 {similarity:.2f}% - 사건 요약: {doc.page_content}\n"
-                f"  - 최종 판결: {doc.metadata['verdict']}\n"
-                f"  - 원고측 교훈: {doc.metadata['plaintiff_lesson']}\n"
-                f"  - 피고측 교훈: {doc.metadata['defendant_lesson']}"
-            )
-        
-        return "\n\n".join(formatted_results)
+        if mode == "hybrid":
+            results = _hybrid_search(query, k)
+        else:
+            results = get_vector_store().similarity_search_with_score(query, k=k)
+        return _format_similar_cases(results)
     except Exception as e:
         # DB에 테이블이 아직 없거나 비어있을 때 예외가 발생할 수 있습니다.
         print(f"벡터 DB 검색 중 오류 발생: {e}")
         return "아직 검색할 과거 사건 데이터가 없습니다."
+
+
+async def asearch_similar_cases(query: str, k: int = 2, mode: Optional[str] = None):
+    """
+    search_similar_cases의 비동기 버전입니다. pgvector 백엔드는 비동기 엔진의 커넥션 풀을 공유합니다.
+    """
+    mode = mode or retrieval_mode
+    if vector_backend != "pgvector" or mode == "hybrid":
+        return await asyncio.to_thread(search_similar_cases, query, k, mode)
+
+    try:
+        # 임베딩은 CPU 작업이므로 이벤트 루프를 막지 않도록 스레드에서 계산합니다.
+        embedding = await asyncio.to_thread(get_embeddings().embed_query, query)
+        results = await _async_vector_store.get().asimilarity_search_with_score_by_vector(embedding, k=k)
+        return _format_similar_cases(results)
+    except Exception as e:
+        print(f"벡터 DB 검색 중 오류 발생: {e}")
+        return "아직 검색할 과거 사건 데이터가 없습니다."
+
+
+async def aadd_case_to_db(case_summary: str, verdict: str, plaintiff_lesson: str, defendant_lesson: str,
+                          case_id: Optional[str] = None, plaintiff_outcome: Optional[str] = None):
+    """
+    add_case_to_db의 비동기 버전입니다.
+    """
+    if vector_backend != "pgvector":
+        await asyncio.to_thread(
+            add_case_to_db, case_summary, verdict, plaintiff_lesson, defendant_lesson, case_id, plaintiff_outcome
+        )
+        return
+
+    store = _async_vector_store.get()
+    try:
+        await store.acreate_collection()
+    except Exception as e:
+        if not _is_existing_collection_error(e):
+            raise
+    vectors = await asyncio.to_thread(get_embeddings().embed_documents, [case_summary])
+    doc_id = case_document_id(case_summary, case_id)
+    await store.aadd_embeddings(
+        ids=[doc_id],
+        texts=[case_summary],
+        embeddings=vectors,
+        metadatas=[_case_metadata(verdict, plaintiff_lesson, defendant_lesson, case_id, plaintiff_outcome)],
+    )
+    await asyncio.to_thread(get_lexical_index().add, [(doc_id, case_summary)])
+    _bump_archive_generation()
+    print(f"✅ PostgreSQL 벡터 DB에 '{case_summary[:20]}...' 사건이 저장되었습니다.")
+
+
+def embedding_cache_stats() -> dict:
+    """임베딩 캐시의 적중/미스 통계를 반환합니다."""
+    return get_embeddings().stats()
+
+
+def lexical_index_stats() -> dict:
+    """하이브리드 검색 질의에서 제외/절단된 n-gram 통계를 반환합니다."""
+    return get_lexical_index().stats()
@@ -0,0 +1,116 @@
+import asyncio
+import os
+from typing import Any, Dict, NamedTuple, Optional
+
+import src.agents as agents
+import src.console as console
+from src.outcome_classifier import (
+    OUTCOMES,
+    aevaluate_outcome,
+    evaluate_outcome,
+    local_outcome,
+    record_llm_outcome,
+)
+
+# 판결 이후 분석 (원고측 승패 + 양측 교훈)
+# - 기본은 post_verdict_chain 한 번의 구조화 호출로 처리합니다.
+# - 로컬 승패 분류기가 확신하면 그 결과를 프롬프트에 넣어 교훈만 받고, 아니면 승패도 LLM이 판단합니다.
+# - 응답이 스키마 검증에 실패하거나 호출이 실패하면 evaluation_chain + reflection_chain 2회(기존 방식)로 대체합니다.
+POST_VERDICT_SINGLE_CALL = os.getenv("POST_VERDICT_SINGLE_CALL", "true").lower() in ("1", "true", "yes", "on")
+
+_OUTCOME_FROM_VERDICT = f"판결문을 근거로 {', '.join(OUTCOMES)} 중 하나를 고르세요. (전부 또는 대부분 인용: 승리, 전부 또는 대부분 기각: 패배, 일부 인용/조정 등: 무승부)"
+
+
+class VerdictAnalysis(NamedTuple):
+    plaintiff_outcome: str
+    plaintiff_lesson: str
+    defendant_lesson: str
+    source: str  # "single" 또는 "fallback"
+
+
+def opposite_outcome(outcome: str) -> str:
+    """원고측 승패를 피고측 승패로 바꿉니다."""
+    return "승리" if outcome == "패배" else ("패배" if outcome == "승리" else "무승부")
+
+
+def _post_verdict_inputs(verdict: str, plaintiff_speeches: str, defendant_speeches: str,
+                         known_outcome: Optional[str]) -> Dict[str, str]:
+    return {
+        "final_verdict": verdict,
+        "plaintiff_speeches": plaintiff_speeches,
+        "defendant_speeches": defendant_speeches,
+        "outcome_instruction": (
+            f"이 재판의 원고측 결과는 '{known_outcome}'(으)로 이미 판정되었으니 그대로 적으세요."
+            if known_outcome else _OUTCOME_FROM_VERDICT
+        ),
+    }
+
+
+def _single_call_result(response: Any, known_outcome: Optional[str]) -> VerdictAnalysis:
+    if response is None:
+        raise ValueError("구조화된 응답이 비어 있습니다.")
+    if known_outcome is None:
+        record_llm_outcome()
+    return VerdictAnalysis(
+        known_outcome or response.plaintiff_outcome,
+        response.plaintiff_lesson.strip(),
+        response.defendant_lesson.strip(),
+        "single",
+    )
+
+
+def _reflection_inputs(plaintiff_outcome: str, plaintiff_speeches: str, defendant_speeches: str):
+    return [
+        {"outcome": plaintiff_outcome, "my_speeches": plaintiff_speeches},
+        {"outcome": opposite_outcome(plaintiff_outcome), "my_speeches": defendant_speeches},
+    ]
+
+
+def _print_fallback(error: Exception) -> None:
+    console.console.print(f"[bold yellow]사후 분석 단일 호출 실패, 개별 호출로 대체합니다:[/bold yellow] {error}")
+
+
+def analyze_verdict(verdict: str, plaintiff_speeches: str, defendant_speeches: str) -> VerdictAnalysis:
+    """판결문과 양측 변론으로 원고측 승패와 양측 교훈을 구합니다."""
+    known = local_outcome(verdict)
+    known_outcome = known.outcome if known else None
+    if POST_VERDICT_SINGLE_CALL:
+        try:
+            response = agents.get_chain("post_verdict_chain").invoke(
+                _post_verdict_inputs(verdict, plaintiff_speeches, defendant_speeches, known_outcome)
+            )
+            return _single_call_result(response, known_outcome)
+        except Exception as error:
+            _print_fallback(error)
+
+    plaintiff_outcome = known_outcome or evaluate_outcome(verdict).outcome
+    plaintiff_lesson, defendant_lesson = (
+        response.content.strip()
+        for response in agents.get_chain("reflection_chain").batch(
+            _reflection_inputs(plaintiff_outcome, plaintiff_speeches, defendant_speeches)
+        )
+    )
+    return VerdictAnalysis(plaintiff_outcome, plaintiff_lesson, defendant_lesson, "fallback")
+
+
+async def aanalyze_verdict(verdict: str, plaintiff_speeches: str, defendant_speeches: str) -> VerdictAnalysis:
+    """analyze_verdict의 비동기 버전입니다."""
+    known = await asyncio.to_thread(local_outcome, verdict)
+    known_outcome = known.outcome if known else None
+    if POST_VERDICT_SINGLE_CALL:
+        try:
+            response = await agents.get_chain("post_verdict_chain").ainvoke(
+                _post_verdict_inputs(verdict, plaintiff_speeches, defendant_speeches, known_outcome)
+            )
+            return _single_call_result(response, known_outcome)
+        except Exception as error:
+            _print_fallback(error)
+
+    plaintiff_outcome = known_outcome or (await aevaluate_outcome(verdict)).outcome
+    plaintiff_lesson, defendant_lesson = (
+        response.content.strip()
+        for response in await agents.get_chain("reflection_chain").abatch(
+            _reflection_inputs(plaintiff_outcome, plaintiff_speeches, defendant_speeches)
+        )
+    )
+    return VerdictAnalysis(plaintiff_outcome, plaintiff_lesson, defendant_lesson, "fallback")
@@ -0,0 +1,59 @@
+import json
+from typing import Any, List, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import RunnableLambda
+from pydantic import BaseModel, Field
+
+from src.fake_llm import FakeCourtChatModel, ReplayChatModel, TraceRecorder
+
+
+class Critique(BaseModel):
+    score: int = Field(ge=0, le=1)
+    reason: str
+
+
+class JsonSchemaChatModel(FakeCourtChatModel):
+    """ChatOpenAI의 기본 구조화 출력(json_schema)처럼 response_format을 보내고 본문 JSON을 돌려주는 모델."""
+
+    def with_structured_output(self, schema: Any, **kwargs: Any):
+        bound = self.bind(
+            response_format=schema,
+            ls_structured_output_format={"kwargs": {"method": "json_schema"}, "schema": schema.model_json_schema()},
+        )
+        return bound | RunnableLambda(lambda message: schema.model_validate_json(message.content))
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        schema = kwargs.get("response_format")
+        content = json.dumps({"score": 1, "reason": "기록된 이유"}, ensure_ascii=False) if schema else "기록된 응답"
+        message = AIMessage(content=content)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+MESSAGES = [SystemMessage(content="당신은 법률 분석가입니다."), HumanMessage(content="판결문을 평가하세요.")]
+
+
+def test_replay_serves_structured_calls_recorded_with_json_schema(tmp_path):
+    trace_path = str(tmp_path / "trace.jsonl")
+    recorder = JsonSchemaChatModel(callbacks=[TraceRecorder(trace_path)])
+    recorded = recorder.with_structured_output(Critique).invoke(MESSAGES)
+
+    with open(trace_path, encoding="utf-8") as f:
+        record = json.loads(f.readline())
+    assert record["tools"] == ["Critique"]
+
+    replay = ReplayChatModel(trace_path=trace_path, miss_policy="error")
+    assert replay.with_structured_output(Critique).invoke(MESSAGES) == recorded
+
+
+def test_replay_keeps_plain_text_calls_apart_from_structured_calls(tmp_path):
+    trace_path = str(tmp_path / "trace.jsonl")
+    recorder = JsonSchemaChatModel(callbacks=[TraceRecorder(trace_path)])
+    recorder.invoke(MESSAGES)
+    recorder.with_structured_output(Critique).invoke(MESSAGES)
+
+    replay = ReplayChatModel(trace_path=trace_path, miss_policy="error")
+    assert replay.invoke(MESSAGES).content == "기록된 응답"
+    assert replay.with_structured_output(Critique).invoke(MESSAGES).score == 1
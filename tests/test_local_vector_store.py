@@ -0,0 +1,61 @@
+import json
+import os
+
+import numpy as np
+
+from src.local_vector_store import LocalVectorStore
+
+DIM = 4
+
+
+def _vector(i: int):
+    vector = [0.0] * DIM
+    vector[i] = 1.0
+    return vector
+
+
+def _store(tmp_path) -> LocalVectorStore:
+    store = LocalVectorStore(embeddings=None, collection_name="cases", root_dir=str(tmp_path), embedding_length=DIM)
+    store.create_collection()
+    return store
+
+
+def _nearest(store: LocalVectorStore, i: int) -> str:
+    document, _ = store.similarity_search_with_score_by_vector(_vector(i), k=1)[0]
+    return document.page_content
+
+
+def test_append_after_interrupted_vector_write(tmp_path):
+    store = _store(tmp_path)
+    store.add_embeddings(["a", "b"], [_vector(0), _vector(1)], ids=["a", "b"])
+
+    # 벡터는 썼지만 메타데이터를 쓰기 전에 멈춘 쓰기: 짝 없는 행 하나와 잘린 행 하나가 남습니다.
+    with open(store._vectors_path, "ab") as f:
+        f.write(np.asarray(_vector(3), dtype=np.float32).tobytes())
+        f.write(np.asarray(_vector(3), dtype=np.float32).tobytes()[:6])
+
+    store = _store(tmp_path)
+    assert [record_id for record_id, _, _ in store.iter_documents()] == ["a", "b"]
+    store.add_embeddings(["c"], [_vector(2)], ids=["c"])
+
+    assert os.path.getsize(store._vectors_path) == 3 * DIM * 4
+    assert [_nearest(store, i) for i in range(3)] == ["a", "b", "c"]
+
+
+def test_append_after_interrupted_metadata_write(tmp_path):
+    store = _store(tmp_path)
+    store.add_embeddings(["a"], [_vector(0)], ids=["a"])
+
+    # 두 행의 벡터와 첫 메타데이터 줄만 쓰고, 두 번째 줄은 중간에 잘렸습니다.
+    with open(store._vectors_path, "ab") as f:
+        f.write(np.asarray([_vector(1), _vector(3)], dtype=np.float32).tobytes())
+    with open(store._metadata_path, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"id": "b", "document": "b", "metadata": {}}) + "\n")
+        f.write('{"id": "x", "docu')
+
+    store = _store(tmp_path)
+    store.add_embeddings(["c"], [_vector(2)], ids=["c"])
+
+    with open(store._metadata_path, encoding="utf-8") as f:
+        assert [json.loads(line)["id"] for line in f] == ["a", "b", "c"]
+    assert [_nearest(store, i) for i in range(3)] == ["a", "b", "c"]